@@ -0,0 +1,290 @@
+# ====================================================================== #
+#                        Batch Billing Engine                            #
+#      Vectorized end-of-day totals for many orders at once (paisa)      #
+# ====================================================================== #
+
+import operator
+from array import array
+from itertools import chain
+
+from pricing_rules import DEFAULT_TAX_RATE
+from restaurant_backend import entry_amounts
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; fall back to the array module
+    np = None
+
+
+# --------------------------- Helpers --------------------------- #
+AMOUNT_FIELDS = ("subtotal", "promotion_amount", "discount_amount", "discounted_subtotal",
+                 "tax_amount", "tip", "total")
+
+
+def to_paisa(amount):
+    """Convert a rupee amount from calculate_total into integer paisa."""
+    return round(amount * 100)
+
+
+def amounts_to_paisa(amounts):
+    """Convert every field of a calculate_total result into integer paisa."""
+    return {field: to_paisa(amounts.get(field, 0)) for field in AMOUNT_FIELDS}
+
+
+def _per_order(values, count, name):
+    """Expand a scalar or sequence of discounts/tips to one value per order."""
+    if isinstance(values, (int, float)):
+        return [values] * count
+    values = list(values)
+    if len(values) != count:
+        raise ValueError(f"Expected {count} {name} values, got {len(values)}")
+    return values
+
+
+def _as_int64(values):
+    """Return an int64 NumPy view of an array('q') buffer, or a converted copy."""
+    if isinstance(values, array) and values.typecode == "q":
+        return np.frombuffer(values, dtype=np.int64)
+    return np.asarray(values, dtype=np.int64)
+
+
+# --------------------------- Batch Biller --------------------------- #
+class BatchBiller:
+    """Compute subtotal, promotions, discount, tax, tip and total for many orders at once.
+
+    Orders are turned into a quantity matrix (orders x menu items) and
+    multiplied by the menu price vector. The arithmetic after the subtotal
+    repeats compute_amounts step by step in float64, so every result matches
+    RestaurantManager.calculate_total exactly once converted to paisa.
+    Results are int64 NumPy arrays, or ``array('q')`` buffers computed in
+    pure Python when NumPy is not installed.
+
+    ``pricing`` is a PricingPlan compiled for ``menu_index`` (the manager's
+    ``pricing_plan``); orders are then repriced with it after the vectorized
+    pass, as calculate_total does. OpenOrders use the plan they carry.
+    """
+
+    def __init__(self, menu_index, max_cells=1 << 22, pricing=None):
+        self.menu_index = menu_index
+        self.pricing = pricing
+        self.prices = array("q", menu_index.prices())
+        self.max_cells = max_cells
+        self._key_ids = {record.key: record.item_id for record in menu_index}
+        self._np_prices = np.asarray(self.prices, dtype=np.int64) if np is not None else None
+
+    # --------------------------- Input Normalization --------------------------- #
+    def _flatten(self, orders):
+        """Flatten order dicts into (lines per order, item IDs, quantities) sequences."""
+        # NumPy wraps array('q') buffers without copying
+        lengths = array("q", map(len, orders))
+        keys = list(chain.from_iterable(orders))
+        if keys and not isinstance(keys[0], int):  # history "category:item" keys
+            keys = list(map(self._key_ids.__getitem__, keys))
+        ids = array("q", keys)
+        qtys = array("q", list(chain.from_iterable(map(dict.values, orders))))
+        return lengths, ids, qtys
+
+    # --------------------------- Public API --------------------------- #
+    def compute(self, orders, discounts=0, tips=0):
+        """Return {field: paisa per order} for the given orders.
+
+        ``orders`` may hold {item_id: qty} dicts, history-style
+        {"category:item": qty} dicts or OpenOrder objects. ``discounts`` and
+        ``tips`` are scalars or one value per order. With a pricing plan the
+        results match calculate_total under that plan.
+        """
+        orders = orders if isinstance(orders, list) else list(orders)
+        if orders and hasattr(orders[0], "counts"):  # OpenOrder from the order book
+            plans = [order.pricing for order in orders]
+            orders = [order.items() for order in orders]
+        else:
+            plans = [self.pricing] * len(orders)
+        lengths, ids, qtys = self._flatten(orders)
+        discounts = _per_order(discounts, len(lengths), "discount")
+        tips = _per_order(tips, len(lengths), "tip")
+        result = self._compute_lines(lengths, ids, qtys, discounts, tips)
+        if any(plan is not None for plan in plans):
+            self._reprice(result, orders, plans, discounts, tips)
+        return result
+
+    def _reprice(self, result, orders, plans, discounts, tips):
+        """Replace the amounts of rule-priced orders with their plan's pricing."""
+        for k, (order, plan) in enumerate(zip(orders, plans)):
+            if plan is None:
+                continue
+            if order and not isinstance(next(iter(order)), int):
+                order = {self._key_ids[key]: qty for key, qty in order.items()}
+            subtotal = int(result["subtotal"][k]) // 100
+            amounts = plan.amounts(order, subtotal, tips[k], discounts[k])
+            for field, value in amounts_to_paisa(amounts).items():
+                result[field][k] = value
+
+    def compute_history(self, entries, discounts=None, tips=None):
+        """Compute totals for saved order history entries.
+
+        Each entry is billed at the prices it was saved with (menu prices for
+        entries saved before prices were recorded) and with its own discount
+        and tip unless ``discounts``/``tips`` are given. Entries priced by
+        pricing rules replay their recorded promotions and taxes through
+        entry_amounts; the rest are billed in one vectorized pass.
+        """
+        entries = entries if isinstance(entries, list) else list(entries)
+        if discounts is None:
+            discounts = [entry.get("discount", 0) for entry in entries]
+        if tips is None:
+            tips = [entry.get("tip", 0) for entry in entries]
+        discounts = _per_order(discounts, len(entries), "discount")
+        tips = _per_order(tips, len(entries), "tip")
+        subtotals = array("q", map(self._entry_subtotal, entries))
+        result = self._amounts(subtotals, discounts, tips)
+        for k, entry in enumerate(entries):
+            if "promotions" in entry or "taxes" in entry:
+                priced = dict(entry, discount=discounts[k], tip=tips[k])
+                for field, value in amounts_to_paisa(entry_amounts(priced, self.menu_index)[1]).items():
+                    result[field][k] = value
+        return result
+
+    def _entry_subtotal(self, entry):
+        saved = entry.get("prices") or {}
+        subtotal = 0
+        for key, qty in entry.get("items", {}).items():
+            price = saved.get(key)
+            if price is None:
+                item_id = self._key_ids.get(key)
+                price = self.prices[item_id] if item_id is not None else 0
+            subtotal += price * qty
+        return subtotal
+
+    def _amounts(self, subtotals, discounts, tips):
+        """Apply discount, tax and tip to per-order subtotals (in rupees)."""
+        if np is not None:
+            return self._amounts_numpy(_as_int64(subtotals), discounts, tips)
+        return self._amounts_python(subtotals, discounts, tips)
+
+    def compute_lines(self, lengths, item_ids, quantities, discounts=0, tips=0, line_prices=None):
+        """Compute totals from flat order lines.
+
+        ``lengths[k]`` is the number of lines of order ``k``; its lines are the
+        next ``lengths[k]`` entries of ``item_ids``/``quantities``. Lines are
+        priced from the menu, so every item id must be on it. This is the
+        layout of the columnar history export: pass its ``line_price`` column
+        (paisa) as ``line_prices`` to bill exported orders at the prices they
+        were saved with, including retired items (item id RETIRED_ITEM_ID).
+        Pricing rules are not applied here; use compute() for rule-priced
+        orders.
+        """
+        if self.pricing is not None:
+            raise ValueError("compute_lines does not apply pricing rules; use compute()")
+        discounts = _per_order(discounts, len(lengths), "discount")
+        tips = _per_order(tips, len(lengths), "tip")
+        return self._compute_lines(lengths, item_ids, quantities, discounts, tips, line_prices)
+
+    def _compute_lines(self, lengths, item_ids, quantities, discounts, tips, line_prices=None):
+        if line_prices is not None:
+            return self._compute_priced(lengths, quantities, line_prices, discounts, tips)
+        if np is not None:
+            return self._compute_numpy(lengths, item_ids, quantities, discounts, tips)
+        return self._compute_python(lengths, item_ids, quantities, discounts, tips)
+
+    def _check_ids(self, low, high):
+        # A negative id would silently index from the end of the price vector
+        if low < 0 or high >= len(self.prices):
+            raise ValueError("Item ids must be on the menu; bill exported lines with line_prices")
+
+    def _compute_priced(self, lengths, quantities, line_prices, discounts, tips):
+        """Bill lines at their own prices (paisa of whole rupees, as exported)."""
+        if np is not None:
+            lengths = _as_int64(lengths)
+            rows = np.repeat(np.arange(len(lengths), dtype=np.intp), lengths)
+            subtotal = np.zeros(len(lengths), dtype=np.int64)
+            np.add.at(subtotal, rows, _as_int64(line_prices) * _as_int64(quantities))
+            return self._amounts_numpy(subtotal // 100, discounts, tips)
+        subtotals = array("q")
+        position = 0
+        for count in lengths:
+            end = position + count
+            subtotals.append(sum(map(operator.mul, line_prices[position:end],
+                                     quantities[position:end])) // 100)
+            position = end
+        return self._amounts_python(subtotals, discounts, tips)
+
+    # --------------------------- NumPy Path --------------------------- #
+    def _compute_numpy(self, lengths, item_ids, quantities, discounts, tips):
+        n_orders, n_items = len(lengths), len(self.prices)
+        lengths = _as_int64(lengths)
+        item_ids = _as_int64(item_ids).astype(np.intp, copy=False)
+        if item_ids.size:
+            self._check_ids(item_ids.min(), item_ids.max())
+        quantities = _as_int64(quantities)
+        rows = np.repeat(np.arange(n_orders, dtype=np.intp), lengths)
+        offsets = np.concatenate(([0], np.cumsum(lengths)))
+
+        # Quantity matrix x price vector, in chunks that bound the matrix size
+        chunk = max(1, self.max_cells // max(1, n_items))
+        subtotal = np.empty(n_orders, dtype=np.int64)
+        for start in range(0, n_orders, chunk):
+            stop = min(start + chunk, n_orders)
+            first, last = offsets[start], offsets[stop]
+            matrix = np.zeros((stop - start, n_items), dtype=np.int64)
+            # add.at sums an item repeated within one order instead of overwriting it
+            np.add.at(matrix, (rows[first:last] - start, item_ids[first:last]), quantities[first:last])
+            subtotal[start:stop] = matrix @ self._np_prices
+        return self._amounts_numpy(subtotal, discounts, tips)
+
+    @staticmethod
+    def _amounts_numpy(subtotal, discounts, tips):
+        discount = np.asarray(discounts, dtype=np.float64)
+        tip = np.asarray(tips, dtype=np.float64)
+
+        # Same operation order as compute_amounts
+        sub = subtotal.astype(np.float64)
+        discount_amount = (sub * discount) / 100
+        discounted_subtotal = sub - discount_amount
+        tax_amount = (discounted_subtotal * DEFAULT_TAX_RATE) / 100
+        total = discounted_subtotal + tax_amount + tip
+
+        def paisa(values):
+            return np.rint(values * 100).astype(np.int64)
+
+        return {
+            "subtotal": subtotal * 100,
+            "promotion_amount": np.zeros(len(subtotal), dtype=np.int64),
+            "discount_amount": paisa(discount_amount),
+            "discounted_subtotal": paisa(discounted_subtotal),
+            "tax_amount": paisa(tax_amount),
+            "tip": paisa(tip),
+            "total": paisa(total),
+        }
+
+    # --------------------------- Pure Python Path --------------------------- #
+    def _compute_python(self, lengths, item_ids, quantities, discounts, tips):
+        if len(item_ids):
+            self._check_ids(min(item_ids), max(item_ids))
+        line_prices = list(map(self.prices.__getitem__, item_ids))
+        subtotals = array("q")
+        position = 0
+        for count in lengths:
+            end = position + count
+            subtotals.append(sum(map(operator.mul, line_prices[position:end],
+                                     quantities[position:end])))
+            position = end
+        return self._amounts_python(subtotals, discounts, tips)
+
+    @staticmethod
+    def _amounts_python(subtotals, discounts, tips):
+        result = {field: array("q") for field in AMOUNT_FIELDS}
+        for subtotal, discount, tip in zip(subtotals, discounts, tips):
+            # Same operation order as compute_amounts
+            discount_amount = (subtotal * discount) / 100
+            discounted_subtotal = subtotal - discount_amount
+            tax_amount = (discounted_subtotal * DEFAULT_TAX_RATE) / 100
+            total = discounted_subtotal + tax_amount + tip
+
+            result["subtotal"].append(subtotal * 100)
+            result["promotion_amount"].append(0)
+            result["discount_amount"].append(round(discount_amount * 100))
+            result["discounted_subtotal"].append(round(discounted_subtotal * 100))
+            result["tax_amount"].append(round(tax_amount * 100))
+            result["tip"].append(round(tip * 100))
+            result["total"].append(round(total * 100))
+        return result
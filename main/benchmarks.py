@@ -0,0 +1,319 @@
+# ====================================================================== #
+#                       Backend Benchmark Suite                          #
+#     Billing & persistence hot paths, JSON results, baseline checks     #
+# ====================================================================== #
+
+import argparse
+import datetime
+import gc
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+from history_segments import SegmentedHistory
+from menu_catalog import MenuCatalog, write_catalog
+from menu_index import MenuIndex
+from order_summary import HeadlessSink, SummaryRefresher
+from restaurant_backend import RestaurantManager
+from storage import JsonFileStorage, SQLiteStorage
+
+
+# --------------------------- Settings --------------------------- #
+ORDER_SIZES = (1, 10, 100, 1000)
+HISTORY_SIZES = (1_000, 100_000, 1_000_000)
+QUICK_HISTORY_SIZES = (1_000, 10_000)
+SEED = 1234
+
+
+# --------------------------- Timing --------------------------- #
+def measure(fn, number, repeat=5):
+    """Time ``number`` calls of ``fn``, ``repeat`` times, with GC paused.
+
+    Returns per-call statistics in microseconds plus calls per second
+    (from the median run).
+    """
+    runs = []
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            for _ in range(number):
+                fn()
+            runs.append((time.perf_counter() - started) / number)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    median = statistics.median(runs)
+    return {
+        "median_us": round(median * 1e6, 3),
+        "best_us": round(min(runs) * 1e6, 3),
+        "ops_per_sec": round(1 / median, 1) if median else None,
+        "number": number,
+        "repeat": repeat,
+    }
+
+
+def _calls_for(lines, budget=20000):
+    """Fewer calls for bigger orders so every case takes a similar time."""
+    return max(20, budget // max(1, lines))
+
+
+# --------------------------- Fixtures --------------------------- #
+def synthetic_menu(items=1000, categories=10):
+    """A menu large enough for 1,000-line orders."""
+    rng = random.Random(SEED)
+    per_category = -(-items // categories)
+    menu = {}
+    for c in range(categories):
+        menu[f"Category {c}"] = {f"Item {c}-{i}": rng.randint(50, 1500)
+                                 for i in range(per_category)
+                                 if c * per_category + i < items}
+    return menu
+
+
+class Workspace:
+    """Temporary directory holding a catalog, counter, history and bills."""
+
+    def __init__(self, root, name, storage="json", menu_items=1000):
+        self.directory = os.path.join(root, name)
+        os.makedirs(self.directory)
+        self.catalog_path = os.path.join(self.directory, "menu.json")
+        write_catalog(MenuIndex(synthetic_menu(menu_items)), self.catalog_path, version=1)
+        self.storage_kind = storage
+        self.storage = self._open_storage()
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _open_storage(self):
+        if self.storage_kind == "sqlite":
+            return SQLiteStorage(self.path("restaurant.db"))
+        return JsonFileStorage(
+            counter_path=self.path("order_counter.json"),
+            history=SegmentedHistory(self.path("order_history"), legacy_path=None),
+            bill_dir=self.directory)
+
+    def manager(self):
+        return RestaurantManager(self.storage, catalog=MenuCatalog(self.catalog_path))
+
+    def seed_history(self, count, template, chunk=10_000):
+        """Write ``count`` existing orders (and a matching counter) quickly."""
+        start = datetime.datetime(2024, 1, 1)
+        written = 0
+        while written < count:
+            batch = []
+            for number in range(written + 1, min(count, written + chunk) + 1):
+                entry = dict(template)
+                entry["order_number"] = number
+                entry["date"] = (start + datetime.timedelta(minutes=number)).isoformat()
+                batch.append(entry)
+            if self.storage_kind == "sqlite":
+                self.storage.import_orders(batch)
+            else:
+                self.storage.history.append_many(batch)
+            written += len(batch)
+        if self.storage_kind != "sqlite":
+            # Past days are compressed as they would be after the day closes
+            self.storage.history.seal()
+            with open(self.path("order_counter.json"), "w") as f:
+                json.dump({"last_order": count}, f)
+
+    def close(self):
+        self.storage.close()
+
+
+def fill_order(manager, lines, rng):
+    """Replace the current order with ``lines`` distinct items."""
+    manager.clear_items()
+    ids = [record.item_id for record in manager.menu_index]
+    for item_id in rng.sample(ids, lines):
+        manager.add_item_by_id(item_id, rng.randint(1, 4))
+
+
+# --------------------------- Benchmarks --------------------------- #
+def bench_billing(results, workspace):
+    """calculate_total, generate_bill and get_order_summary by order size."""
+    manager = workspace.manager()
+    rng = random.Random(SEED)
+    for lines in ORDER_SIZES:
+        fill_order(manager, lines, rng)
+        calls = _calls_for(lines)
+
+        # Alternate the tip so every call misses the totals cache
+        tips = iter(range(10 ** 9))
+        results[f"calculate_total/{lines}_lines"] = measure(
+            lambda: manager.calculate_total(tip=next(tips) & 1, discount=10), calls * 10)
+        results[f"calculate_total_cached/{lines}_lines"] = measure(
+            lambda: manager.calculate_total(tip=0, discount=10), calls * 10)
+        results[f"generate_bill/{lines}_lines"] = measure(
+            lambda: manager.generate_bill(tip=50, discount=10, customer_name="Bench"), calls)
+        results[f"get_order_summary/{lines}_lines"] = measure(manager.get_order_summary, calls)
+
+
+def bench_save_history(results, root, sizes, storage):
+    """save_order_history with a history of each size already on disk."""
+    template = None
+    for size in sizes:
+        workspace = Workspace(root, f"history_{size}", storage)
+        if template is None:
+            seed_manager = workspace.manager()
+            fill_order(seed_manager, 5, random.Random(SEED))
+            template = seed_manager.build_history_entry("Seed", tip=0, discount=0)
+        workspace.seed_history(size, template)
+        manager = workspace.manager()
+        fill_order(manager, 5, random.Random(SEED))
+        results[f"save_order_history/{size}_existing"] = measure(
+            lambda: manager.save_order_history(customer_name="Bench", tip=20, discount=5), 200, repeat=3)
+        workspace.close()
+
+
+def bench_order_numbers(results, root, storage):
+    """get_next_order_number, single-threaded and with four threads."""
+    workspace = Workspace(root, "order_numbers", storage)
+    manager = workspace.manager()
+    results["get_next_order_number/1_thread"] = measure(manager.get_next_order_number, 2000)
+
+    def contended():
+        threads = [threading.Thread(target=lambda: [manager.get_next_order_number()
+                                                    for _ in range(250)])
+                   for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    stats = measure(contended, 1, repeat=5)
+    # One call above allocated 1,000 numbers; report per number
+    stats["median_us"] = round(stats["median_us"] / 1000, 3)
+    stats["best_us"] = round(stats["best_us"] / 1000, 3)
+    stats["ops_per_sec"] = round(stats["ops_per_sec"] * 1000, 1)
+    stats["number"] = 1000
+    results["get_next_order_number/4_threads"] = stats
+    workspace.close()
+
+
+def bench_display(results, workspace):
+    """Headless update_order_display cycle: one quantity edit, then a refresh."""
+    manager = workspace.manager()
+    rng = random.Random(SEED)
+    ids = [record.item_id for record in manager.menu_index]
+    for lines in ORDER_SIZES:
+        fill_order(manager, lines, rng)
+        refresher = SummaryRefresher(manager, HeadlessSink(), pricing=lambda: (50, 10))
+        refresher.flush()
+        edits = iter([(rng.choice(list(manager.order) or ids), rng.randint(1, 9))
+                      for _ in range(200_000)])
+
+        def cycle():
+            item_id, qty = next(edits)
+            manager.set_quantity(item_id, qty)
+            refresher.request()
+            refresher.flush()
+
+        results[f"update_order_display/{lines}_lines"] = measure(cycle, _calls_for(lines, 5000))
+
+
+# --------------------------- Baseline Comparison --------------------------- #
+def compare(current, baseline, tolerance=0.25):
+    """Return [(name, baseline_us, current_us, ratio, status)] for shared benchmarks."""
+    rows = []
+    for name, stats in current["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if base is None or not base.get("median_us"):
+            rows.append((name, None, stats["median_us"], None, "new"))
+            continue
+        ratio = stats["median_us"] / base["median_us"]
+        if ratio > 1 + tolerance:
+            status = "REGRESSION"
+        elif ratio < 1 - tolerance:
+            status = "faster"
+        else:
+            status = "ok"
+        rows.append((name, base["median_us"], stats["median_us"], ratio, status))
+    return rows
+
+
+def print_comparison(rows):
+    print(f"{'benchmark':<44} {'baseline us':>12} {'current us':>12} {'ratio':>7}  status")
+    for name, base, current, ratio, status in rows:
+        base_text = f"{base:>12.3f}" if base is not None else f"{'-':>12}"
+        ratio_text = f"{ratio:>7.2f}" if ratio is not None else f"{'-':>7}"
+        print(f"{name:<44} {base_text} {current:>12.3f} {ratio_text}  {status}")
+
+
+# --------------------------- Runner --------------------------- #
+def run(history_sizes=HISTORY_SIZES, storage="json", only=None):
+    """Run the suite in a temporary directory and return the results document."""
+    results = {}
+    selected = set(only or ("billing", "history", "order_numbers", "display"))
+    with tempfile.TemporaryDirectory() as root:
+        shared = Workspace(root, "shared", storage)
+        if "billing" in selected:
+            bench_billing(results, shared)
+        if "display" in selected:
+            bench_display(results, shared)
+        shared.close()
+        if "order_numbers" in selected:
+            bench_order_numbers(results, root, storage)
+        if "history" in selected:
+            bench_save_history(results, root, history_sizes, storage)
+    return {
+        "meta": {
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "storage": storage,
+            "history_sizes": list(history_sizes),
+        },
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark RestaurantManager hot paths")
+    parser.add_argument("--output", default="benchmark_results.json",
+                        help="where to write the results JSON")
+    parser.add_argument("--baseline", default="benchmark_baseline.json",
+                        help="baseline results to compare against")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="store these results as the new baseline")
+    parser.add_argument("--storage", choices=["json", "sqlite"], default="json")
+    parser.add_argument("--quick", action="store_true",
+                        help=f"history sizes {QUICK_HISTORY_SIZES} instead of {HISTORY_SIZES}")
+    parser.add_argument("--only", action="append",
+                        choices=["billing", "history", "order_numbers", "display"],
+                        help="run only these groups (repeatable)")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed slowdown before a result counts as a regression")
+    args = parser.parse_args()
+
+    document = run(QUICK_HISTORY_SIZES if args.quick else HISTORY_SIZES, args.storage, args.only)
+    with open(args.output, "w") as f:
+        json.dump(document, f, indent=2)
+    print(f"Wrote {len(document['results'])} results to {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(document, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+        return
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            rows = compare(document, json.load(f), args.tolerance)
+        print_comparison(rows)
+        if any(status == "REGRESSION" for *_, status in rows):
+            sys.exit(1)
+    else:
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,397 @@
+# ====================================================================== #
+#                          Saved Bill Archive                            #
+#      Day-bucketed receipt containers with an order-number index        #
+# ====================================================================== #
+
+import argparse
+import bisect
+import datetime
+import glob
+import os
+import re
+import struct
+import sys
+import threading
+import zipfile
+from array import array
+
+from order_numbers import FileLock
+
+
+# --------------------------- Record Layout --------------------------- #
+# Container record: magic, order number, epoch timestamp, content length, then UTF-8 text
+_RECORD = struct.Struct("<4sQdI")
+_MAGIC = b"BILL"
+# Index record (one per bill, appended next to the container): order number, offset, length, timestamp
+_INDEX = struct.Struct("<QQId")
+
+# Packed lookup location: day ordinal in the high bits, container offset in the low 44
+_OFFSET_BITS = 44
+
+_LOOSE_BILL = re.compile(r"^bill_(\d+)_(\d{8}_\d{6})\.txt$")
+
+
+def bill_filename(order_number, timestamp):
+    """Return the standard file name of a bill (used by exports and the old loose files)."""
+    return f"bill_{order_number:04d}_{timestamp.strftime('%Y%m%d_%H%M%S')}.txt"
+
+
+# --------------------------- Bill Archive --------------------------- #
+class BillArchive:
+    """Append receipts to one container file per day instead of one file per bill.
+
+    ``YYYY-MM-DD.bills`` holds the bills of a day back to back, each behind a
+    small header, and ``YYYY-MM-DD.idx`` gets a fixed-size (order number,
+    offset, length, time) record per bill. Both are only ever appended to, so
+    saving stays one write per file however many bills exist, and several
+    tills can share the directory. get() bisects an in-memory order-number
+    index (built from the .idx files on first use) and reads one record.
+
+    Every save also appends one byte to ``generation``; get() compares its
+    size with the last one seen and only rescans the .idx files when some
+    till (or another BillArchive) saved since. Saves hold ``archive.lock``
+    shared; opening the archive takes it exclusively to cut a record torn
+    by a crash off the end of a container before anything is appended
+    after it.
+    """
+
+    def __init__(self, directory="bills"):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.lock_path = os.path.join(directory, "archive.lock")
+        self.generation_path = os.path.join(directory, "generation")
+        self._lock = threading.Lock()
+        # Lookup index, built lazily: sorted order numbers and packed locations
+        self._numbers = None
+        self._locations = None
+        self._scanned = {}      # day -> bytes of its .idx already indexed
+        self._generation = None
+        with FileLock(self.lock_path):
+            self._repair()
+
+    # --------------------------- Paths --------------------------- #
+    def _container_path(self, day):
+        return os.path.join(self.directory, f"{day}.bills")
+
+    def _index_path(self, day):
+        return os.path.join(self.directory, f"{day}.idx")
+
+    def days(self):
+        """Days with saved bills, oldest first."""
+        return sorted(name[:10] for name in os.listdir(self.directory)
+                      if name.endswith(".bills") and len(name) == 16)
+
+    # --------------------------- Writing --------------------------- #
+    def save(self, order_number, content, timestamp=None, sync=False):
+        """Append one bill and return where it was stored."""
+        return self.save_many([(order_number, content)], timestamp, sync)[0]
+
+    def save_many(self, bills, timestamp=None, sync=True):
+        """Append (order_number, content) bills with one write per file.
+
+        With ``sync`` the container and its index are fsynced once for the
+        whole batch. Returns a location string per bill.
+        """
+        timestamp = timestamp or datetime.datetime.now()
+        day = timestamp.date().isoformat()
+        epoch = timestamp.timestamp()
+        encoded = [(order_number, content.encode("utf-8")) for order_number, content in bills]
+        data = b"".join(_RECORD.pack(_MAGIC, order_number, epoch, len(body)) + body
+                        for order_number, body in encoded)
+
+        with self._lock, FileLock(self.lock_path, shared=True):
+            end = self._append(self._container_path(day), data, sync)
+            # O_APPEND leaves the file position after our write, even with other tills appending
+            offset = end - len(data)
+            index_records = []
+            for order_number, body in encoded:
+                index_records.append((order_number, offset, len(body), epoch))
+                offset += _RECORD.size + len(body)
+            index_data = b"".join(_INDEX.pack(*record) for record in index_records)
+            index_end = self._append(self._index_path(day), index_data, sync)
+            generation = self._append(self.generation_path, b"\n", False)
+            if self._numbers is not None and self._scanned.get(day, 0) == index_end - len(index_data):
+                # Nobody else appended since the last scan, so index our bills directly
+                ordinal = timestamp.toordinal()
+                for order_number, offset, _, _ in index_records:
+                    self._insert(order_number, ordinal, offset)
+                self._scanned[day] = index_end
+                if self._generation == generation - 1:
+                    self._generation = generation
+
+        path = self._container_path(day)
+        return [f"{path} ({bill_filename(order_number, timestamp)})" for order_number, _ in bills]
+
+    @staticmethod
+    def _append(path, data, sync):
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT | getattr(os, "O_BINARY", 0), 0o644)
+        try:
+            os.write(fd, data)
+            end = os.lseek(fd, 0, os.SEEK_CUR)
+            if sync:
+                os.fsync(fd)
+        finally:
+            os.close(fd)
+        return end
+
+    def _repair(self):
+        """Recover from a crash mid-save (called with archive.lock held exclusively).
+
+        Torn .idx tails are dropped, complete bills missing from the .idx are
+        indexed, and a torn record at the end of a container is truncated so
+        later saves do not land behind garbage.
+        """
+        for day in self.days():
+            index_path = self._index_path(day)
+            size = os.path.getsize(index_path) if os.path.exists(index_path) else 0
+            if size % _INDEX.size:
+                with open(index_path, "r+b") as f:
+                    f.truncate(size - size % _INDEX.size)
+            # Tills append concurrently, so the last .idx record need not be the furthest
+            indexed_end = max((offset + _RECORD.size + length
+                               for _, offset, length, _ in self._index_records(day)), default=0)
+            container_path = self._container_path(day)
+            container_size = os.path.getsize(container_path)
+            if indexed_end >= container_size:
+                continue
+            missing = [(number, offset, length, epoch) for number, epoch, offset, length
+                       in self._scan_container(day, indexed_end)]
+            if missing:
+                self._append(index_path, b"".join(_INDEX.pack(*record) for record in missing), True)
+            valid_end = missing[-1][1] + _RECORD.size + missing[-1][2] if missing else indexed_end
+            if valid_end < container_size:
+                with open(container_path, "r+b") as f:
+                    f.truncate(valid_end)
+                    f.flush()
+                    os.fsync(f.fileno())
+
+    def _index_records(self, day):
+        """Return the complete (order number, offset, length, epoch) records of a day's .idx."""
+        try:
+            with open(self._index_path(day), "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return []
+        return list(_INDEX.iter_unpack(data[:len(data) - len(data) % _INDEX.size]))
+
+    # --------------------------- Lookup Index --------------------------- #
+    def _insert(self, order_number, ordinal, offset):
+        location = (ordinal << _OFFSET_BITS) | offset
+        numbers = self._numbers
+        if not numbers or order_number >= numbers[-1]:
+            numbers.append(order_number)
+            self._locations.append(location)
+        else:
+            # bisect_right keeps a later save of the same order after the earlier one
+            position = bisect.bisect_right(numbers, order_number)
+            numbers.insert(position, order_number)
+            self._locations.insert(position, location)
+
+    def _refresh_index(self):
+        """Index records added since the last scan (including other tills' saves)."""
+        if self._numbers is None:
+            self._numbers, self._locations, self._scanned = array("Q"), array("Q"), {}
+        pending = []
+        for day in self.days():
+            index_path = self._index_path(day)
+            try:
+                size = os.path.getsize(index_path)
+            except FileNotFoundError:
+                continue
+            size -= size % _INDEX.size
+            seen = self._scanned.get(day, 0)
+            if size <= seen:
+                continue
+            with open(index_path, "rb") as f:
+                f.seek(seen)
+                data = f.read(size - seen)
+            ordinal = datetime.date.fromisoformat(day).toordinal()
+            pending.extend((number, ordinal, offset) for number, offset, _, _ in _INDEX.iter_unpack(data))
+            self._scanned[day] = size
+        if len(pending) > 1000:
+            # Bulk load: one sort instead of many inserts
+            merged = sorted(list(zip(self._numbers, self._locations))
+                            + [(number, (ordinal << _OFFSET_BITS) | offset)
+                               for number, ordinal, offset in pending])
+            self._numbers = array("Q", (number for number, _ in merged))
+            self._locations = array("Q", (location for _, location in merged))
+        else:
+            for number, ordinal, offset in pending:
+                self._insert(number, ordinal, offset)
+
+    def _locate(self, order_number):
+        numbers = self._numbers
+        position = bisect.bisect_right(numbers, order_number) - 1
+        if position < 0 or numbers[position] != order_number:
+            return None
+        return self._locations[position]
+
+    # --------------------------- Reading --------------------------- #
+    def _read_record(self, day, offset):
+        with open(self._container_path(day), "rb") as f:
+            f.seek(offset)
+            magic, order_number, epoch, length = _RECORD.unpack(f.read(_RECORD.size))
+            if magic != _MAGIC:
+                raise ValueError(f"Corrupt bill record at {day}:{offset}")
+            return order_number, epoch, f.read(length).decode("utf-8")
+
+    def _scan_container(self, day, start=0):
+        """Yield (order number, epoch, offset, length) for records from ``start`` on."""
+        with open(self._container_path(day), "rb") as f:
+            f.seek(start)
+            offset = start
+            while True:
+                header = f.read(_RECORD.size)
+                if len(header) < _RECORD.size:
+                    return
+                magic, order_number, epoch, length = _RECORD.unpack(header)
+                if magic != _MAGIC:
+                    return
+                if len(f.read(length)) < length:
+                    return
+                yield order_number, epoch, offset, length
+                offset += _RECORD.size + length
+
+    def get(self, order_number):
+        """Return the latest saved bill text for ``order_number`` or None."""
+        with self._lock:
+            # One stat: rescan the .idx files only if anyone saved since the last look
+            try:
+                generation = os.path.getsize(self.generation_path)
+            except FileNotFoundError:
+                generation = 0
+            if self._numbers is None or generation != self._generation:
+                self._refresh_index()
+                self._generation = generation
+            location = self._locate(order_number)
+        if location is None:
+            return None
+        day = datetime.date.fromordinal(location >> _OFFSET_BITS).isoformat()
+        return self._read_record(day, location & ((1 << _OFFSET_BITS) - 1))[2]
+
+    def iter_bills(self, start=None, end=None):
+        """Yield (order_number, datetime, content) for bills saved in [start, end), oldest first.
+
+        ``start``/``end`` are dates or ISO strings; only the days in range are read.
+        Records are found through the .idx and checked against their header,
+        so bytes left between records by an old crash are never parsed.
+        """
+        start = start.isoformat() if hasattr(start, "isoformat") else start
+        end = end.isoformat() if hasattr(end, "isoformat") else end
+        for day in self.days():
+            if (start and day < start[:10]) or (end and day > end[:10]):
+                continue
+            with open(self._container_path(day), "rb") as f:
+                data = f.read()
+            for order_number, offset, length, epoch in sorted(self._index_records(day),
+                                                               key=lambda record: record[1]):
+                if offset + _RECORD.size + length > len(data):
+                    continue
+                if _RECORD.unpack_from(data, offset) != (_MAGIC, order_number, epoch, length):
+                    continue
+                body = data[offset + _RECORD.size:offset + _RECORD.size + length]
+                when = datetime.datetime.fromtimestamp(epoch)
+                stamp = when.isoformat()
+                if (start and stamp < start) or (end and stamp >= end):
+                    continue
+                yield order_number, when, body.decode("utf-8")
+
+    # --------------------------- Export & Migration --------------------------- #
+    def export(self, target, start=None, end=None):
+        """Write bills in [start, end) as standard bill_*.txt files.
+
+        ``target`` is a directory or a ``.zip`` file. Returns the number exported.
+        """
+        count = 0
+        if target.endswith(".zip"):
+            with zipfile.ZipFile(target, "w", zipfile.ZIP_DEFLATED) as archive:
+                for order_number, when, content in self.iter_bills(start, end):
+                    archive.writestr(bill_filename(order_number, when), content)
+                    count += 1
+            return count
+        os.makedirs(target, exist_ok=True)
+        for order_number, when, content in self.iter_bills(start, end):
+            with open(os.path.join(target, bill_filename(order_number, when)), "w",
+                      encoding="utf-8") as f:
+                f.write(content)
+            count += 1
+        return count
+
+    def migrate(self, source=".", remove=True, batch=1000):
+        """Move loose bill_NNNN_YYYYMMDD_HHMMSS.txt files from ``source`` into the archive.
+
+        Bills keep their original timestamps. Each batch is fsynced before
+        its files are deleted (kept with ``remove=False``). Returns the
+        number migrated.
+        """
+        loose = []
+        for path in glob.glob(os.path.join(glob.escape(source), "bill_*.txt")):
+            match = _LOOSE_BILL.match(os.path.basename(path))
+            if match:
+                when = datetime.datetime.strptime(match.group(2), "%Y%m%d_%H%M%S")
+                loose.append((when, int(match.group(1)), path))
+        loose.sort()
+
+        count = 0
+        for start in range(0, len(loose), batch):
+            chunk = loose[start:start + batch]
+            for when, order_number, path in chunk:
+                with open(path, "r", encoding="utf-8") as f:
+                    content = f.read()
+                self.save(order_number, content, when)
+            # One flush per container touched makes the whole chunk durable
+            for day in {when.date().isoformat() for when, _, _ in chunk}:
+                for path in (self._container_path(day), self._index_path(day)):
+                    fd = os.open(path, os.O_RDONLY)
+                    try:
+                        os.fsync(fd)
+                    finally:
+                        os.close(fd)
+            if remove:
+                for _, _, path in chunk:
+                    os.remove(path)
+            count += len(chunk)
+        return count
+
+    def stats(self):
+        bills = sum(os.path.getsize(self._index_path(day)) // _INDEX.size for day in self.days()
+                    if os.path.exists(self._index_path(day)))
+        size = sum(os.path.getsize(os.path.join(self.directory, name))
+                   for name in os.listdir(self.directory))
+        return {"days": len(self.days()), "bills": bills, "bytes": size}
+
+
+# --------------------------- Command Line --------------------------- #
+def main():
+    parser = argparse.ArgumentParser(description="Saved bill archive")
+    parser.add_argument("command", choices=["get", "export", "migrate", "stats"])
+    parser.add_argument("target", nargs="?",
+                        help="order number for get, output directory or .zip for export, "
+                             "source directory for migrate (default: .)")
+    parser.add_argument("--archive", default="bills", help="archive directory")
+    parser.add_argument("--start", help="first date to export (YYYY-MM-DD)")
+    parser.add_argument("--end", help="day after the last date to export (YYYY-MM-DD)")
+    parser.add_argument("--keep", action="store_true", help="migrate without deleting the loose files")
+    args = parser.parse_args()
+
+    archive = BillArchive(args.archive)
+    if args.command == "get":
+        if not args.target:
+            parser.error("get needs an order number")
+        content = archive.get(int(args.target))
+        if content is None:
+            sys.exit(f"No saved bill for order #{args.target}")
+        print(content)
+    elif args.command == "export":
+        if not args.target:
+            parser.error("export needs an output directory or .zip file")
+        print(f"Exported {archive.export(args.target, args.start, args.end)} bills to {args.target}")
+    elif args.command == "migrate":
+        count = archive.migrate(args.target or ".", remove=not args.keep)
+        print(f"Migrated {count} bills into {args.archive}")
+    else:
+        print(archive.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+# ====================================================================== #
+#                       Columnar Order History Export                    #
+#        Streaming typed-column & CSV export for analytics tools         #
+# ====================================================================== #
+
+import argparse
+import csv
+import datetime
+import json
+import mmap
+import os
+import sys
+from array import array
+
+from batch_billing import to_paisa
+from restaurant_backend import entry_amounts, load_menu_index
+from storage import open_storage
+
+
+# --------------------------- Column Layout --------------------------- #
+# Column name -> array typecode, one table of orders and one of order lines;
+# money columns hold integer paisa
+ORDER_COLUMNS = {
+    "order_number": "q",
+    "timestamp": "d",        # seconds since the epoch (local time)
+    "subtotal": "q",
+    "promotion": "q",        # pricing-rule promotion credits, taken off before the discount
+    "discount": "q",
+    "tax": "q",
+    "tip": "q",
+    "total": "q",
+    "line_start": "q",       # first row of this order in the line columns
+    "line_count": "q",
+}
+LINE_COLUMNS = {
+    "order_row": "q",        # row of the owning order in the order columns
+    "item_id": "q",          # RETIRED_ITEM_ID for items no longer on the menu
+    "quantity": "q",
+    "price": "q",
+}
+MANIFEST = "manifest.json"
+
+# Typed int columns have no null: line_item_id holds this for retired items
+# (the CSV leaves item_id empty instead)
+RETIRED_ITEM_ID = -1
+
+
+# --------------------------- Column Writer --------------------------- #
+class _ColumnFile:
+    """Buffered writer appending one typed array column to its own file."""
+
+    def __init__(self, path, typecode, flush_rows):
+        self.path = path
+        self.typecode = typecode
+        self.flush_rows = flush_rows
+        self.buffer = array(typecode)
+        self.rows = 0
+        self.file = open(path, "wb")
+
+    def append(self, value):
+        self.buffer.append(value)
+        if len(self.buffer) >= self.flush_rows:
+            self.flush()
+
+    def flush(self):
+        self.buffer.tofile(self.file)
+        self.rows += len(self.buffer)
+        self.buffer = array(self.typecode)
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+class _StringColumn:
+    """UTF-8 string column: a byte blob plus int64 end offsets."""
+
+    def __init__(self, directory, name, flush_rows):
+        self.offsets = _ColumnFile(os.path.join(directory, f"{name}.offsets"), "q", flush_rows)
+        self.data = open(os.path.join(directory, f"{name}.utf8"), "wb")
+        self.position = 0
+
+    def append(self, text):
+        raw = (text or "").encode("utf-8")
+        self.data.write(raw)
+        self.position += len(raw)
+        self.offsets.append(self.position)
+
+    def close(self):
+        self.offsets.close()
+        self.data.close()
+
+
+# --------------------------- Exporter --------------------------- #
+class HistoryExporter:
+    """Stream order history into typed column files and/or CSV.
+
+    Entries are read one at a time and written through small buffers, so
+    the export never holds the whole history in memory. Each numeric column
+    is a raw native-endian array file that can be memory-mapped on its own
+    (see open_column), so scanning one field over millions of orders never
+    deserializes the rest. Lines of items no longer on the menu carry
+    RETIRED_ITEM_ID (-1) in the item_id column and an empty item_id in the
+    CSV; the manifest records the sentinel as ``retired_item_id``.
+    """
+
+    def __init__(self, menu_index=None, flush_rows=65536):
+        self.menu_index = menu_index if menu_index is not None else load_menu_index()
+        self.flush_rows = flush_rows
+
+    def export(self, entries, directory, columnar=True, csv_output=True):
+        """Export entries to ``directory``; returns the manifest dict."""
+        os.makedirs(directory, exist_ok=True)
+        by_key = self.menu_index.by_key
+
+        order_cols = line_cols = customers = None
+        if columnar:
+            order_cols = {name: _ColumnFile(os.path.join(directory, f"{name}.col"), code,
+                                            self.flush_rows)
+                          for name, code in ORDER_COLUMNS.items()}
+            line_cols = {name: _ColumnFile(os.path.join(directory, f"line_{name}.col"), code,
+                                           self.flush_rows)
+                         for name, code in LINE_COLUMNS.items()}
+            customers = _StringColumn(directory, "customer", self.flush_rows)
+
+        orders_csv = lines_csv = None
+        if csv_output:
+            orders_csv = open(os.path.join(directory, "orders.csv"), "w", newline="", encoding="utf-8")
+            lines_csv = open(os.path.join(directory, "order_lines.csv"), "w", newline="", encoding="utf-8")
+            order_writer = csv.writer(orders_csv)
+            line_writer = csv.writer(lines_csv)
+            order_writer.writerow(["order_number", "date", "customer_name", "subtotal",
+                                   "promotion", "discount", "tax", "tip", "total", "items"])
+            line_writer.writerow(["order_number", "item_id", "category", "item",
+                                  "quantity", "price"])
+
+        order_count = line_count = 0
+        try:
+            for entry in entries:
+                lines, amounts = entry_amounts(entry, self.menu_index)
+                number = entry.get("order_number", 0)
+                date = entry.get("date", "")
+                money = [to_paisa(amounts.get(field, 0)) for field in
+                         ("subtotal", "promotion_amount", "discount_amount", "tax_amount", "tip", "total")]
+
+                if columnar:
+                    try:
+                        timestamp = datetime.datetime.fromisoformat(date).timestamp()
+                    except ValueError:
+                        timestamp = float("nan")
+                    values = [number, timestamp, *money, line_count, len(lines)]
+                    for column, value in zip(order_cols.values(), values):
+                        column.append(value)
+                    customers.append(entry.get("customer_name", ""))
+
+                for key, category, qty, price in lines:
+                    record = by_key.get(key)
+                    item_id = record.item_id if record is not None else RETIRED_ITEM_ID
+                    if columnar:
+                        for column, value in zip(line_cols.values(),
+                                                 (order_count, item_id, qty, price * 100)):
+                            column.append(value)
+                    if csv_output:
+                        line_writer.writerow([number, "" if record is None else item_id, category,
+                                              key.split(":", 1)[-1], qty, price])
+
+                if csv_output:
+                    order_writer.writerow([number, date, entry.get("customer_name", ""),
+                                           *(f"{value / 100:.2f}" for value in money),
+                                           sum(qty for _, _, qty, _ in lines)])
+                order_count += 1
+                line_count += len(lines)
+        finally:
+            for group in (order_cols, line_cols):
+                for column in (group or {}).values():
+                    column.close()
+            for handle in (customers, orders_csv, lines_csv):
+                if handle is not None:
+                    handle.close()
+
+        manifest = {
+            "version": 1,
+            "byteorder": sys.byteorder,
+            "orders": order_count,
+            "lines": line_count,
+            "order_columns": ORDER_COLUMNS if columnar else {},
+            "line_columns": LINE_COLUMNS if columnar else {},
+            "string_columns": ["customer"] if columnar else [],
+            "retired_item_id": RETIRED_ITEM_ID,
+        }
+        with open(os.path.join(directory, MANIFEST), "w") as f:
+            json.dump(manifest, f, indent=2)
+        return manifest
+
+
+# --------------------------- Column Readers --------------------------- #
+def _column_path(directory, name):
+    if name in ORDER_COLUMNS:
+        return os.path.join(directory, f"{name}.col"), ORDER_COLUMNS[name]
+    if name in LINE_COLUMNS:
+        return os.path.join(directory, f"line_{name}.col"), LINE_COLUMNS[name]
+    raise KeyError(f"Unknown column {name!r}")
+
+
+def open_column(directory, name):
+    """Memory-map one numeric column and return a typed memoryview over it.
+
+    Only the pages that are actually read are loaded. Close the view with
+    ``view.release()`` and then ``view.obj.close()`` when done. Empty columns
+    return an empty array.
+    """
+    path, typecode = _column_path(directory, name)
+    if os.path.getsize(path) == 0:
+        return memoryview(array(typecode))
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return memoryview(mapped).cast(typecode)
+
+
+def read_strings(directory, name="customer"):
+    """Yield the values of a string column in row order."""
+    offsets = array("q")
+    with open(os.path.join(directory, f"{name}.offsets"), "rb") as f:
+        offsets.frombytes(f.read())
+    with open(os.path.join(directory, f"{name}.utf8"), "rb") as f:
+        start = 0
+        for end in offsets:
+            yield f.read(end - start).decode("utf-8")
+            start = end
+
+
+# --------------------------- Command Line --------------------------- #
+def main():
+    parser = argparse.ArgumentParser(description="Export order history for analytics")
+    parser.add_argument("directory", help="output directory")
+    parser.add_argument("--storage", default="json",
+                        help="storage spec, e.g. json or sqlite:restaurant.db")
+    parser.add_argument("--no-columns", action="store_true", help="skip typed column files")
+    parser.add_argument("--no-csv", action="store_true", help="skip CSV files")
+    args = parser.parse_args()
+
+    manifest = HistoryExporter().export(open_storage(args.storage).iter_orders(), args.directory,
+                                        columnar=not args.no_columns,
+                                        csv_output=not args.no_csv)
+    print(f"Exported {manifest['orders']} orders ({manifest['lines']} lines) to {args.directory}")
+
+
+if __name__ == "__main__":
+    main()
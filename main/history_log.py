@@ -0,0 +1,168 @@
+# ====================================================================== #
+#                     Append-Only Order History Log                      #
+#        JSON Lines storage with compaction, rotation & migration        #
+# ====================================================================== #
+
+import datetime
+import glob
+import json
+import os
+import threading
+
+
+# --------------------------- Helpers --------------------------- #
+def append_lines(path, data, sync=False):
+    """Append raw JSON Lines bytes to ``path``, first closing off a torn last line.
+
+    A partial line left by a crash would otherwise swallow the next record;
+    after the extra newline it is a lone bad line the readers skip. Returns
+    the bytes written.
+    """
+    with open(path, "ab+") as f:
+        end = f.seek(0, os.SEEK_END)
+        if end:
+            f.seek(end - 1)
+            if f.read(1) != b"\n":
+                data = b"\n" + data
+        f.write(data)
+        if sync:
+            f.flush()
+            os.fsync(f.fileno())
+    return len(data)
+
+
+# --------------------------- Order History Log Class --------------------------- #
+class OrderHistoryLog:
+    """Append-only, line-delimited (JSON Lines) store for saved orders.
+
+    Every saved order is one line at the end of the active log file, so saving
+    costs the same no matter how much history already exists. Old logs can be
+    rotated out and compacted, and a legacy ``order_history.json`` array is
+    migrated automatically the first time the log is opened.
+    """
+
+    # --------------------------- Initialization --------------------------- #
+    def __init__(self, path="order_history.jsonl", legacy_path="order_history.json"):
+        self.path = path
+        self.legacy_path = legacy_path
+        self._lock = threading.Lock()
+
+        # One-time upgrade from the old load-all/rewrite-all JSON array
+        if legacy_path and os.path.exists(legacy_path) and not os.path.exists(path):
+            self.migrate_from_json(legacy_path)
+
+    # --------------------------- Writing --------------------------- #
+    def append(self, entry):
+        """Append one order entry to the log and return the bytes written."""
+        data = (json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8")
+        return self._write(data)
+
+    def append_many(self, entries, sync=False):
+        """Append several entries with a single write and return the bytes written.
+
+        With ``sync`` the log is fsynced before returning, so the whole batch
+        is durable for the cost of one flush (group commit).
+        """
+        data = "".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries)
+        return self._write(data.encode("utf-8"), sync)
+
+    def _write(self, data, sync=False):
+        with self._lock:
+            return append_lines(self.path, data, sync)
+
+    # --------------------------- Reading --------------------------- #
+    def segment_paths(self):
+        """Return rotated segment paths (oldest first) followed by the active log."""
+        stem, ext = os.path.splitext(self.path)
+        rotated = sorted(glob.glob(f"{glob.escape(stem)}-*{ext}"))
+        if os.path.exists(self.path):
+            rotated.append(self.path)
+        return rotated
+
+    def iter_entries(self):
+        """Yield every saved order, oldest first, without loading the whole history."""
+        for segment in self.segment_paths():
+            yield from self._read_segment(segment)
+
+    def __iter__(self):
+        return self.iter_entries()
+
+    @staticmethod
+    def _read_segment(path):
+        """Yield entries of one segment, skipping blank or torn (half-written) lines."""
+        # A torn line can end inside a multi-byte character; let it fail as JSON instead
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # A crash mid-append can leave a partial last line behind
+                    continue
+
+    # --------------------------- Maintenance --------------------------- #
+    def rotate(self, max_bytes=50 * 1024 * 1024):
+        """Move the active log aside once it grows past ``max_bytes``.
+
+        Returns the rotated segment path, or None if no rotation was needed.
+        """
+        with self._lock:
+            if not os.path.exists(self.path) or os.path.getsize(self.path) < max_bytes:
+                return None
+            stem, ext = os.path.splitext(self.path)
+            stamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+            rotated = f"{stem}-{stamp}{ext}"
+            os.replace(self.path, rotated)
+            return rotated
+
+    def compact(self):
+        """Rewrite the active log without torn lines or duplicate order records.
+
+        When an order number appears more than once the last record wins.
+        Returns the number of entries kept.
+        """
+        with self._lock:
+            if not os.path.exists(self.path):
+                return 0
+
+            latest = {}
+            unnumbered = []
+            for entry in self._read_segment(self.path):
+                number = entry.get("order_number")
+                if number is None:
+                    unnumbered.append(entry)
+                else:
+                    latest.pop(number, None)
+                    latest[number] = entry
+
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for entry in unnumbered + list(latest.values()):
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            return len(unnumbered) + len(latest)
+
+    def migrate_from_json(self, json_path):
+        """Convert a legacy JSON-array history file into the line-delimited log.
+
+        The original file is kept as ``<name>.migrated`` so the migration runs
+        only once. Returns the number of migrated entries.
+        """
+        with open(json_path, "r", encoding="utf-8") as f:
+            history = json.load(f)
+
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for entry in history:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+        with self._lock:
+            os.replace(tmp_path, self.path)
+            os.replace(json_path, json_path + ".migrated")
+        return len(history)
@@ -0,0 +1,544 @@
+# ====================================================================== #
+#                    Daily Compressed History Segments                   #
+#      One file per day, gzip/lzma blocks & an order-number index        #
+# ====================================================================== #
+
+import argparse
+import bisect
+import datetime
+import gzip
+import json
+import lzma
+import os
+import struct
+import sys
+import threading
+from array import array
+
+from history_log import OrderHistoryLog, append_lines
+from order_numbers import FileLock
+
+
+# --------------------------- Settings --------------------------- #
+SEGMENT_MAGIC = b"PKHSEG1"
+INDEX_MAGIC = b"PKHIDX1"
+CODECS = {
+    "gzip": (b"g", lambda data: gzip.compress(data, compresslevel=6), gzip.decompress),
+    "lzma": (b"x", lambda data: lzma.compress(data, preset=6), lzma.decompress),
+}
+_DECOMPRESS = {tag: decompress for tag, _, decompress in CODECS.values()}
+
+# Orders per compressed block: a lookup decompresses one block of this many orders
+BLOCK_ENTRIES = 64
+
+_LENGTH = struct.Struct("<I")
+_BLOCK = struct.Struct("<IQI")          # day ordinal, payload offset, payload length
+_INDEX_HEADER = struct.Struct("<II")    # block count, entry count
+
+
+class SealConflict(RuntimeError):
+    """A day's JSON Lines file changed while it was being sealed."""
+
+
+def _day_of(entry):
+    """The YYYY-MM-DD segment an entry belongs to (today if it has no date)."""
+    date = entry.get("date")
+    return date[:10] if date else datetime.date.today().isoformat()
+
+
+def _parse_lines(data):
+    """Parse JSON Lines bytes, skipping blank and torn lines."""
+    for line in data.splitlines():
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            continue
+
+
+def _find_order(data, order_number):
+    """Return the last entry in JSON Lines ``data`` for ``order_number`` or None.
+
+    Only lines mentioning the number are parsed.
+    """
+    needle = f'"order_number": {order_number}'.encode()
+    found = None
+    for line in data.splitlines():
+        if needle in line:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if entry.get("order_number") == order_number:
+                found = entry
+    return found
+
+
+def _as_le(values):
+    """Return an array's bytes in little-endian order."""
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _from_le(data):
+    values = array("I")
+    values.frombytes(data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+# --------------------------- Segmented History --------------------------- #
+class SegmentedHistory:
+    """Order history split into one segment per day, older days compressed.
+
+    The current day is an ordinary JSON Lines file (``YYYY-MM-DD.jsonl``), so
+    saving and reading today's orders costs what it always did. Once the day
+    is over its file is sealed into ``YYYY-MM-DD.seg``: blocks of
+    BLOCK_ENTRIES orders, each gzip- or lzma-compressed and prefixed with its
+    length. ``index.bin`` keeps the sealed blocks and a sorted array of
+    (order number, block) pairs, so get_order() for an old order is one
+    bisect, one seek and one block decompress, and date ranges only open the
+    days they cover. It is a drop-in history for JsonFileStorage; an existing
+    ``order_history.jsonl`` (and the older JSON array) is imported on first
+    start, and an import cut short by a crash is redone on the next start.
+
+    With ``readonly`` nothing is migrated, sealed or indexed on open and
+    writes are refused, so reports can read a directory the tills are using.
+    """
+
+    def __init__(self, directory="order_history", legacy_path="order_history.jsonl",
+                 codec="gzip", block_entries=BLOCK_ENTRIES, readonly=False):
+        if codec not in CODECS:
+            raise ValueError(f"Unknown codec {codec!r}; expected one of {sorted(CODECS)}")
+        self.directory = directory
+        self.readonly = readonly
+        self.codec = codec
+        self.block_entries = max(1, int(block_entries))
+        self.index_path = os.path.join(directory, "index.bin")
+        self.lock_path = os.path.join(directory, "seal.lock")
+        self.migration_path = os.path.join(directory, "migration.pending")
+        self._lock = threading.Lock()
+        self._today = None
+
+        # Index: blocks[i] = (day, offset, length); orders/block_ids sorted together
+        self.blocks = []
+        self.orders = array("I")
+        self.block_ids = array("I")
+        self._index_stat = None
+
+        if readonly:
+            if not os.path.isdir(directory):
+                raise FileNotFoundError(f"No order history in {directory}")
+            return
+        fresh = not os.path.isdir(directory)
+        os.makedirs(directory, exist_ok=True)
+        if legacy_path and (fresh or os.path.exists(self.migration_path)):
+            self.migrate_from_log(legacy_path)
+        self._load_index()
+        self.seal()
+
+    # --------------------------- Paths --------------------------- #
+    def _active_path(self, day):
+        return os.path.join(self.directory, f"{day}.jsonl")
+
+    def _sealed_path(self, day):
+        return os.path.join(self.directory, f"{day}.seg")
+
+    def _days(self, suffix):
+        return sorted(name[:-len(suffix)] for name in os.listdir(self.directory)
+                      if name.endswith(suffix) and len(name) == 10 + len(suffix))
+
+    def active_days(self):
+        """Days still stored as uncompressed JSON Lines (normally just today)."""
+        return self._days(".jsonl")
+
+    def sealed_days(self):
+        return self._days(".seg")
+
+    # --------------------------- Writing --------------------------- #
+    def append(self, entry):
+        """Append one order to its day's segment and return the bytes written."""
+        return self.append_many([entry])
+
+    def append_many(self, entries, sync=False):
+        """Append orders with one write per day touched and return the bytes written.
+
+        The first write of a new day seals the days before it. Writes hold
+        ``seal.lock`` shared, so no till can seal (read, compress and remove)
+        a day file while another is appending to it.
+        """
+        if self.readonly:
+            raise ValueError(f"{self.directory} was opened read-only")
+        by_day = {}
+        for entry in entries:
+            by_day.setdefault(_day_of(entry), []).append(json.dumps(entry, ensure_ascii=False) + "\n")
+        written = 0
+        with self._lock, FileLock(self.lock_path, shared=True):
+            # Under the lock no seal is in progress: a day sealed meanwhile simply
+            # gets a fresh .jsonl, which the next seal merges into its segment
+            for day, lines in by_day.items():
+                written += append_lines(self._active_path(day), "".join(lines).encode("utf-8"), sync)
+        if datetime.date.today().isoformat() != self._today:
+            self.seal()
+        return written
+
+    # --------------------------- Sealing --------------------------- #
+    def seal(self, before=None):
+        """Compress every active day older than ``before`` (default: today).
+
+        Returns the list of days sealed. A day that is already sealed and has
+        late additions is merged and resealed. A day whose file changes while
+        it is compressed is left active and tried again on the next seal.
+        """
+        if self.readonly:
+            raise ValueError(f"{self.directory} was opened read-only")
+        today = datetime.date.today().isoformat()
+        before = before or today
+        self._today = today
+        sealed = []
+        with self._lock, FileLock(self.lock_path):
+            self._reload_if_changed()
+            for day in self.active_days():
+                if day < before:
+                    try:
+                        self._seal_day(day)
+                    except SealConflict:
+                        continue
+                    sealed.append(day)
+        return sealed
+
+    def _seal_day(self, day):
+        active_path, sealed_path = self._active_path(day), self._sealed_path(day)
+        entries = list(self._read_sealed_day(day)) if os.path.exists(sealed_path) else []
+        with open(active_path, "rb") as f:
+            data = f.read()
+        entries.extend(_parse_lines(data))
+
+        tag, compress, _ = CODECS[self.codec]
+        ordinal = datetime.date.fromisoformat(day).toordinal()
+        new_blocks, new_pairs = [], []
+        tmp_path = sealed_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(SEGMENT_MAGIC + tag)
+            for start in range(0, len(entries), self.block_entries):
+                chunk = entries[start:start + self.block_entries]
+                payload = compress("".join(json.dumps(entry, ensure_ascii=False) + "\n"
+                                           for entry in chunk).encode("utf-8"))
+                f.write(_LENGTH.pack(len(payload)))
+                new_blocks.append((ordinal, f.tell(), len(payload)))
+                f.write(payload)
+                block = len(new_blocks) - 1
+                new_pairs.extend((entry["order_number"], block) for entry in chunk
+                                 if isinstance(entry.get("order_number"), int))
+            f.flush()
+            os.fsync(f.fileno())
+        # Writers hold seal.lock shared, so this only trips on a writer that does not
+        if os.path.getsize(active_path) != len(data):
+            os.remove(tmp_path)
+            raise SealConflict(f"{active_path} changed while it was being sealed")
+        os.replace(tmp_path, sealed_path)
+        self._index_day(ordinal, new_blocks, new_pairs)
+        # The .jsonl goes last: a crash before this just seals the day again
+        os.remove(active_path)
+
+    # --------------------------- Index --------------------------- #
+    def _index_day(self, ordinal, new_blocks, new_pairs):
+        """Replace the blocks of one day in the index and write it out."""
+        if any(block[0] == ordinal for block in self.blocks):
+            remap, blocks = {}, []
+            for old_id, block in enumerate(self.blocks):
+                if block[0] != ordinal:
+                    remap[old_id] = len(blocks)
+                    blocks.append(block)
+            pairs = [(number, remap[block_id]) for number, block_id in zip(self.orders, self.block_ids)
+                     if block_id in remap]
+        else:
+            blocks, pairs = self.blocks, None
+
+        base = len(blocks)
+        blocks = blocks + new_blocks
+        new_pairs = sorted((number, base + block) for number, block in new_pairs)
+        if pairs is None and (not self.orders or not new_pairs or new_pairs[0][0] >= self.orders[-1]):
+            # Usual case: a new day's orders all follow the existing ones
+            orders, block_ids = array("I", self.orders), array("I", self.block_ids)
+            orders.extend(number for number, _ in new_pairs)
+            block_ids.extend(block for _, block in new_pairs)
+        else:
+            pairs = sorted((pairs if pairs is not None else list(zip(self.orders, self.block_ids)))
+                           + new_pairs)
+            orders = array("I", (number for number, _ in pairs))
+            block_ids = array("I", (block for _, block in pairs))
+
+        self.blocks, self.orders, self.block_ids = blocks, orders, block_ids
+        self._write_index()
+
+    def _write_index(self):
+        tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(INDEX_MAGIC)
+            f.write(_INDEX_HEADER.pack(len(self.blocks), len(self.orders)))
+            f.write(b"".join(_BLOCK.pack(*block) for block in self.blocks))
+            f.write(_as_le(self.orders))
+            f.write(_as_le(self.block_ids))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.index_path)
+        self._index_stat = self._stat_index()
+
+    def _stat_index(self):
+        try:
+            st = os.stat(self.index_path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _load_index(self):
+        stat = self._stat_index()
+        if stat is None:
+            if self.sealed_days() and not self.readonly:
+                self.rebuild_index()
+            return
+        with open(self.index_path, "rb") as f:
+            data = f.read()
+        if not data.startswith(INDEX_MAGIC):
+            if not self.readonly:
+                self.rebuild_index()
+            return
+        position = len(INDEX_MAGIC)
+        block_count, entry_count = _INDEX_HEADER.unpack_from(data, position)
+        position += _INDEX_HEADER.size
+        self.blocks = [_BLOCK.unpack_from(data, position + i * _BLOCK.size) for i in range(block_count)]
+        position += block_count * _BLOCK.size
+        self.orders = _from_le(data[position:position + 4 * entry_count])
+        position += 4 * entry_count
+        self.block_ids = _from_le(data[position:position + 4 * entry_count])
+        self._index_stat = stat
+
+    def _reload_if_changed(self):
+        """Pick up blocks sealed by another till sharing this directory."""
+        if self._stat_index() != self._index_stat:
+            self._load_index()
+
+    def rebuild_index(self):
+        """Recreate ``index.bin`` by scanning every sealed segment."""
+        blocks, pairs = [], []
+        for day in self.sealed_days():
+            ordinal = datetime.date.fromisoformat(day).toordinal()
+            for offset, length, entries in self._scan_segment(self._sealed_path(day)):
+                block = len(blocks)
+                blocks.append((ordinal, offset, length))
+                pairs.extend((entry["order_number"], block) for entry in entries
+                             if isinstance(entry.get("order_number"), int))
+        pairs.sort()
+        self.blocks = blocks
+        self.orders = array("I", (number for number, _ in pairs))
+        self.block_ids = array("I", (block for _, block in pairs))
+        self._write_index()
+        return len(pairs)
+
+    # --------------------------- Reading --------------------------- #
+    @staticmethod
+    def _scan_segment(path):
+        """Yield (payload offset, length, entries) for every block of a sealed segment."""
+        with open(path, "rb") as f:
+            header = f.read(len(SEGMENT_MAGIC) + 1)
+            if not header.startswith(SEGMENT_MAGIC):
+                raise ValueError(f"Not a history segment: {path}")
+            decompress = _DECOMPRESS[header[-1:]]
+            while True:
+                prefix = f.read(_LENGTH.size)
+                if len(prefix) < _LENGTH.size:
+                    return
+                (length,) = _LENGTH.unpack(prefix)
+                offset = f.tell()
+                payload = f.read(length)
+                if len(payload) < length:
+                    return
+                yield offset, length, list(_parse_lines(decompress(payload)))
+
+    def _read_sealed_day(self, day):
+        for _, _, entries in self._scan_segment(self._sealed_path(day)):
+            yield from entries
+
+    def _active_data(self, day):
+        try:
+            with open(self._active_path(day), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return b""
+
+    def _read_active_day(self, day):
+        yield from _parse_lines(self._active_data(day))
+
+    def _read_day(self, day):
+        return read_day(self.directory, day)
+
+    def _read_block(self, block_id):
+        """Return the decompressed JSON Lines bytes of one sealed block."""
+        ordinal, offset, length = self.blocks[block_id]
+        path = self._sealed_path(datetime.date.fromordinal(ordinal).isoformat())
+        with open(path, "rb") as f:
+            tag = f.read(len(SEGMENT_MAGIC) + 1)[-1:]
+            f.seek(offset)
+            return _DECOMPRESS[tag](f.read(length))
+
+    def days(self):
+        """Every day with saved orders, oldest first."""
+        return sorted(set(self.sealed_days()) | set(self.active_days()))
+
+    def iter_entries(self):
+        """Yield every saved order, oldest day first."""
+        for day in self.days():
+            yield from self._read_day(day)
+
+    def __iter__(self):
+        return self.iter_entries()
+
+    def iter_range(self, start=None, end=None):
+        """Yield orders of the days overlapping [start, end); callers filter exact times."""
+        first = start[:10] if start else None
+        last = end[:10] if end else None
+        for day in self.days():
+            if (first is None or day >= first) and (last is None or day <= last):
+                yield from self._read_day(day)
+
+    def get_order(self, order_number):
+        """Return the latest entry for ``order_number`` or None.
+
+        Unsealed days are checked first (they hold the newest orders); a
+        sealed order costs one bisect plus one block decompress.
+        """
+        for day in reversed(self.active_days()):
+            found = _find_order(self._active_data(day), order_number)
+            if found is not None:
+                return found
+
+        with self._lock:
+            self._reload_if_changed()
+            position = bisect.bisect_right(self.orders, order_number) - 1
+            if position < 0 or self.orders[position] != order_number:
+                return None
+            block_id = self.block_ids[position]
+        return _find_order(self._read_block(block_id), order_number)
+
+    def max_order_number(self):
+        """Highest saved order number without decompressing sealed days."""
+        with self._lock:
+            self._reload_if_changed()
+            high = self.orders[-1] if self.orders else 0
+        for day in self.active_days():
+            for entry in self._read_active_day(day):
+                number = entry.get("order_number")
+                if isinstance(number, int) and number > high:
+                    high = number
+        return high
+
+    def disk_usage(self):
+        """Return {"active": bytes, "sealed": bytes, "index": bytes}."""
+        usage = {"active": 0, "sealed": 0, "index": 0}
+        for name in os.listdir(self.directory):
+            size = os.path.getsize(os.path.join(self.directory, name))
+            if name.endswith(".jsonl"):
+                usage["active"] += size
+            elif name.endswith(".seg"):
+                usage["sealed"] += size
+            elif name == "index.bin":
+                usage["index"] += size
+        return usage
+
+    # --------------------------- Migration --------------------------- #
+    def migrate_from_log(self, log_path):
+        """Import an ``order_history.jsonl`` log (and its rotated files) into daily segments.
+
+        The imported files are kept as ``<name>.migrated``. ``migration.pending``
+        marks the import as unfinished until every day file is fsynced; if it
+        is still there on the next start the partial import is discarded and
+        redone. Returns the number of imported orders.
+        """
+        if os.path.exists(self.migration_path):
+            for name in os.listdir(self.directory):
+                if name.endswith((".jsonl", ".seg")) or name == "index.bin":
+                    os.remove(os.path.join(self.directory, name))
+        else:
+            with open(self.migration_path, "wb") as f:
+                f.flush()
+                os.fsync(f.fileno())
+        log = OrderHistoryLog(log_path)
+        paths = log.segment_paths()
+        count = 0
+        batch = []
+        for entry in log.iter_entries():
+            batch.append(entry)
+            if len(batch) >= 10_000:
+                count += self._import(batch)
+                batch = []
+        count += self._import(batch)
+        os.remove(self.migration_path)
+        for path in paths:
+            os.replace(path, path + ".migrated")
+        return count
+
+    def _import(self, entries):
+        by_day = {}
+        for entry in entries:
+            by_day.setdefault(_day_of(entry), []).append(json.dumps(entry, ensure_ascii=False) + "\n")
+        for day, lines in by_day.items():
+            append_lines(self._active_path(day), "".join(lines).encode("utf-8"), sync=True)
+        return len(entries)
+
+
+# --------------------------- Read-only Access --------------------------- #
+def read_day(directory, day):
+    """Yield the orders saved on ``day`` straight from the segment files.
+
+    Unlike opening a SegmentedHistory this never migrates, seals or loads
+    the index, so separate processes can read days in parallel.
+    """
+    sealed_path = os.path.join(directory, f"{day}.seg")
+    if os.path.exists(sealed_path):
+        for _, _, entries in SegmentedHistory._scan_segment(sealed_path):
+            yield from entries
+    try:
+        with open(os.path.join(directory, f"{day}.jsonl"), "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return
+    yield from _parse_lines(data)
+
+
+# --------------------------- Command Line --------------------------- #
+def main():
+    parser = argparse.ArgumentParser(description="Daily compressed order history segments")
+    parser.add_argument("command", choices=["seal", "stats", "get", "rebuild-index"])
+    parser.add_argument("order", nargs="?", type=int, help="order number for 'get'")
+    parser.add_argument("--directory", default="order_history")
+    parser.add_argument("--codec", choices=sorted(CODECS), default="gzip",
+                        help="compression for newly sealed days")
+    args = parser.parse_args()
+
+    history = SegmentedHistory(args.directory, codec=args.codec)
+    if args.command == "seal":
+        print(f"Sealed {len(history.seal())} days")
+    elif args.command == "rebuild-index":
+        print(f"Indexed {history.rebuild_index()} orders")
+    elif args.command == "get":
+        if args.order is None:
+            parser.error("get needs an order number")
+        entry = history.get_order(args.order)
+        if entry is None:
+            sys.exit(f"Order #{args.order} not found")
+        print(json.dumps(entry, indent=2, ensure_ascii=False))
+    else:
+        usage = history.disk_usage()
+        print(f"Days: {len(history.sealed_days())} sealed, {len(history.active_days())} active")
+        print(f"Indexed orders: {len(history.orders)} in {len(history.blocks)} blocks")
+        for kind, size in usage.items():
+            print(f"{kind:>7}: {size / 1024:,.1f} KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+# ====================================================================== #
+#                     Opt-in Timing Instrumentation                      #
+#   Latency histograms, counters, bytes written & slow-operation log     #
+# ====================================================================== #
+
+import collections
+import datetime
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+
+# --------------------------- Settings --------------------------- #
+# Histogram bucket upper bounds in seconds (+Inf is implicit)
+BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+           0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+# Per-operation slow thresholds in seconds; anything else uses the default
+DEFAULT_SLOW_THRESHOLD = 0.1
+SLOW_THRESHOLDS = {
+    "add_item": 0.005,
+    "add_item_by_id": 0.005,
+    "calculate_total": 0.005,
+    "generate_bill": 0.05,
+    "get_next_order_number": 0.05,
+    "save_order_history": 0.1,
+    "save_orders": 0.1,
+}
+
+MANAGER_OPERATIONS = ("add_item", "add_item_by_id", "set_quantity", "calculate_total",
+                      "generate_bill", "get_order_summary", "save_order_history",
+                      "record_order", "record_orders", "save_orders", "save_bill",
+                      "get_next_order_number")
+APP_CALLBACKS = ("set_quantity", "generate_bill", "save_bill",
+                 "clear_all", "new_order", "on_search_typed", "add_search_result")
+
+
+# --------------------------- Histogram --------------------------- #
+def _bound_ms(bound):
+    """Bucket bound in milliseconds; None for the open-ended +Inf bucket."""
+    return None if bound == float("inf") else round(bound * 1000, 3)
+
+
+class Histogram:
+    """Fixed-bucket latency histogram (counts per bucket, sum and count)."""
+
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding quantile ``q`` (None if empty)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS + (float("inf"),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+# --------------------------- Metrics Registry --------------------------- #
+class Metrics:
+    """Thread-safe store of operation timings, counters and slow operations.
+
+    Nothing here runs unless instrument_manager()/instrument_app() wrapped
+    the methods, so a disabled till pays nothing. Slow operations are kept
+    in a bounded in-memory log and, with ``slow_log_path``, appended to a
+    JSON Lines file.
+    """
+
+    def __init__(self, slow_thresholds=None, default_threshold=DEFAULT_SLOW_THRESHOLD,
+                 slow_log_path=None, slow_log_size=200):
+        self.slow_thresholds = dict(SLOW_THRESHOLDS, **(slow_thresholds or {}))
+        self.default_threshold = default_threshold
+        self.slow_log_path = slow_log_path
+        self.histograms = {}
+        self.errors = collections.Counter()
+        self.slow_counts = collections.Counter()
+        self.bytes_written = collections.Counter()
+        self.slow_log = collections.deque(maxlen=slow_log_size)
+        self._lock = threading.Lock()
+
+    # --------------------------- Recording --------------------------- #
+    def observe(self, name, seconds, failed=False):
+        slow = seconds >= self.slow_thresholds.get(name, self.default_threshold)
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                self.histograms[name] = histogram = Histogram()
+            histogram.observe(seconds)
+            if failed:
+                self.errors[name] += 1
+            if slow:
+                self.slow_counts[name] += 1
+                record = {"op": name, "ms": round(seconds * 1000, 3),
+                          "at": datetime.datetime.now().isoformat(timespec="milliseconds")}
+                self.slow_log.append(record)
+        if slow and self.slow_log_path:
+            with open(self.slow_log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+
+    def add_bytes(self, target, count):
+        with self._lock:
+            self.bytes_written[target] += count
+
+    def timed(self, name, fn):
+        """Wrap ``fn`` so every call is timed under ``name``."""
+        observe = self.observe
+        clock = time.perf_counter
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = clock()
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException:
+                observe(name, clock() - started, failed=True)
+                raise
+            observe(name, clock() - started)
+            return result
+        return wrapper
+
+    # --------------------------- Export --------------------------- #
+    def snapshot(self):
+        """Return all metrics as a JSON-ready dict (times in milliseconds)."""
+        with self._lock:
+            operations = {}
+            for name, histogram in sorted(self.histograms.items()):
+                operations[name] = {
+                    "count": histogram.count,
+                    "errors": self.errors[name],
+                    "slow": self.slow_counts[name],
+                    "total_ms": round(histogram.total * 1000, 3),
+                    "mean_ms": round(histogram.total / histogram.count * 1000, 4),
+                    "p50_le_ms": _bound_ms(histogram.quantile(0.5)),
+                    "p99_le_ms": _bound_ms(histogram.quantile(0.99)),
+                    "buckets": {("+Inf" if bound == float("inf") else f"{bound * 1000:g}ms"): count
+                                for bound, count in zip(BUCKETS + (float("inf"),), histogram.counts)},
+                }
+            return {
+                "generated": datetime.datetime.now().isoformat(timespec="seconds"),
+                "operations": operations,
+                "bytes_written": dict(self.bytes_written),
+                "slow_operations": list(self.slow_log),
+            }
+
+    def to_prometheus(self):
+        """Render the metrics in the Prometheus text exposition format."""
+        lines = [
+            "# HELP restaurant_operation_seconds Latency of instrumented operations.",
+            "# TYPE restaurant_operation_seconds histogram",
+        ]
+        with self._lock:
+            for name, histogram in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, count in zip(BUCKETS + (float("inf"),), histogram.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                    lines.append(f'restaurant_operation_seconds_bucket{{op="{name}",le="{le}"}} {cumulative}')
+                lines.append(f'restaurant_operation_seconds_sum{{op="{name}"}} {histogram.total:.9f}')
+                lines.append(f'restaurant_operation_seconds_count{{op="{name}"}} {histogram.count}')
+
+            lines.append("# HELP restaurant_operation_errors_total Calls that raised.")
+            lines.append("# TYPE restaurant_operation_errors_total counter")
+            lines.extend(f'restaurant_operation_errors_total{{op="{name}"}} {count}'
+                         for name, count in sorted(self.errors.items()))
+            lines.append("# HELP restaurant_slow_operations_total Calls over their slow threshold.")
+            lines.append("# TYPE restaurant_slow_operations_total counter")
+            lines.extend(f'restaurant_slow_operations_total{{op="{name}"}} {count}'
+                         for name, count in sorted(self.slow_counts.items()))
+            lines.append("# HELP restaurant_bytes_written_total Bytes persisted by target.")
+            lines.append("# TYPE restaurant_bytes_written_total counter")
+            lines.extend(f'restaurant_bytes_written_total{{target="{target}"}} {count}'
+                         for target, count in sorted(self.bytes_written.items()))
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Write Prometheus text (``.prom``/``.txt``) or a JSON snapshot, atomically."""
+        if path.endswith(".json"):
+            content = json.dumps(self.snapshot(), indent=2)
+        else:
+            content = self.to_prometheus()
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+
+# --------------------------- Wiring --------------------------- #
+def _wrap(target, names, metrics, prefix=""):
+    for name in names:
+        method = getattr(target, name, None)
+        if method is not None:
+            setattr(target, name, metrics.timed(prefix + name, method))
+
+
+def _count_bytes(storage, metrics):
+    """Record bytes written by the storage backend's history and bill writes."""
+    # Set when a history/bill write inside save_orders counted its own bytes
+    state = threading.local()
+
+    def wrap_history(method):
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            written = method(*args, **kwargs)
+            metrics.add_bytes("history", written or 0)
+            state.counted = True
+            return written
+        return wrapper
+
+    def wrap_bills(method, single):
+        signature = inspect.signature(method)
+
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            # Bind so keyword calls (bills=..., content=...) are counted too
+            bound = signature.bind(*args, **kwargs)
+            if single:
+                contents = [bound.arguments["content"]]
+            else:
+                bills = list(bound.arguments["bills"])
+                bound.arguments["bills"] = bills
+                contents = [content for _, content in bills]
+            result = method(*bound.args, **bound.kwargs)
+            metrics.add_bytes("bills", sum(len(content.encode("utf-8")) for content in contents))
+            state.counted = True
+            return result
+        return wrapper
+
+    def wrap_save_orders(method):
+        signature = inspect.signature(method)
+
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            entries = list(bound.arguments["entries"])
+            bills = list(bound.arguments["bills"])
+            bound.arguments["entries"], bound.arguments["bills"] = entries, bills
+            state.counted = False
+            result = method(*bound.args, **bound.kwargs)
+            # Backends that write both in one transaction (SQLite) skip the wrapped methods
+            if not state.counted:
+                metrics.add_bytes("history", sum(len(json.dumps(entry, ensure_ascii=False).encode("utf-8"))
+                                                 for entry in entries))
+                metrics.add_bytes("bills", sum(len(content.encode("utf-8")) for _, content in bills))
+            return result
+        return wrapper
+
+    storage.append_order = wrap_history(storage.append_order)
+    storage.append_orders = wrap_history(storage.append_orders)
+    storage.save_bill = wrap_bills(storage.save_bill, single=True)
+    storage.save_bills = wrap_bills(storage.save_bills, single=False)
+    storage.save_orders = wrap_save_orders(storage.save_orders)
+
+
+def instrument_manager(manager, metrics):
+    """Time the manager's hot operations and count bytes its storage writes."""
+    _wrap(manager, MANAGER_OPERATIONS, metrics)
+    _count_bytes(manager.storage, metrics)
+    return manager
+
+
+def instrument_app(app, metrics):
+    """Time RestaurantApp callbacks; call before the widgets bind them."""
+    _wrap(app, APP_CALLBACKS, metrics, prefix="ui.")
+    return app
+
+
+def instrument_summary(refresher, metrics):
+    """Time SummaryRefresher flushes, where the live order summary is redrawn."""
+    _wrap(refresher, ("flush",), metrics, prefix="ui.summary_")
+    return refresher
+
+
+def metrics_from_env(environ=os.environ):
+    """Return (Metrics, export path) when POS_METRICS is set, else (None, None).
+
+    POS_METRICS is the export file (``.prom`` or ``.json``); POS_SLOW_LOG
+    optionally names a JSON Lines file for slow operations and POS_SLOW_MS
+    overrides the default slow threshold.
+    """
+    path = environ.get("POS_METRICS")
+    if not path:
+        return None, None
+    threshold = float(environ.get("POS_SLOW_MS", DEFAULT_SLOW_THRESHOLD * 1000)) / 1000
+    return Metrics(default_threshold=threshold,
+                   slow_log_path=environ.get("POS_SLOW_LOG") or None), path
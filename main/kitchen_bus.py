@@ -0,0 +1,461 @@
+# ====================================================================== #
+#                      Kitchen Order Ticket (KOT) Bus                    #
+#   Asyncio pub/sub to station displays with acks, replay & backpressure #
+# ====================================================================== #
+
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import json
+import os
+import random
+import statistics
+import threading
+import time
+
+
+# --------------------------- Stations --------------------------- #
+STATIONS = ("grill", "tandoor", "drinks", "desserts")
+
+# First keyword found in a menu category picks its station; anything else goes to the grill
+STATION_RULES = (
+    ("bread", "tandoor"),
+    ("naan", "tandoor"),
+    ("tandoor", "tandoor"),
+    ("beverage", "drinks"),
+    ("drink", "drinks"),
+    ("dessert", "desserts"),
+    ("sweet", "desserts"),
+)
+DEFAULT_STATION = "grill"
+
+
+def station_for(category):
+    """Return the kitchen station that prepares items of a menu category."""
+    lowered = category.lower()
+    for keyword, station in STATION_RULES:
+        if keyword in lowered:
+            return station
+    return DEFAULT_STATION
+
+
+def split_tickets(entry):
+    """Split a history entry into {station: [{"item", "quantity"}]} lines."""
+    stations = {}
+    for key, qty in entry.get("items", {}).items():
+        category, _, item = key.partition(":")
+        stations.setdefault(station_for(category), []).append({"item": item, "quantity": qty})
+    return stations
+
+
+def _encode(message):
+    return (json.dumps(message, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+# --------------------------- Station Log --------------------------- #
+class _Station:
+    """Recent tickets of one station, numbered by a per-station sequence."""
+
+    __slots__ = ("name", "seq", "log", "subscribers")
+
+    def __init__(self, name, retain):
+        self.name = name
+        self.seq = 0
+        self.log = collections.deque(maxlen=retain)
+        self.subscribers = set()
+
+    def after(self, seq):
+        """Return the first retained ticket with a sequence above ``seq`` (or None)."""
+        if not self.log or seq >= self.seq:
+            return None
+        first = self.log[0]["seq"]
+        # Tickets older than the retained log are gone; resume at the oldest kept
+        return self.log[max(0, seq + 1 - first)]
+
+
+class _Subscriber:
+    __slots__ = ("station", "display", "writer", "sent", "acked", "wakeup")
+
+    def __init__(self, station, display, writer, acked):
+        self.station = station
+        self.display = display
+        self.writer = writer
+        self.sent = acked
+        self.acked = acked
+        self.wakeup = asyncio.Event()
+
+
+# --------------------------- Kitchen Bus --------------------------- #
+class KitchenBus:
+    """Publish confirmed orders to kitchen station displays.
+
+    Each order is split into one ticket per station and appended to that
+    station's bounded log. Every connected display has its own sender that
+    streams tickets from the log but keeps at most ``window`` unacknowledged
+    tickets in flight, so a slow screen throttles only itself. Publishers go
+    through a bounded intake queue and wait when it is full. Displays send
+    ``ack`` messages; the bus remembers the last ack per (station, display)
+    and a display that reconnects is replayed everything after it.
+
+    Protocol (JSON Lines over TCP):
+        display -> {"op": "subscribe", "station": "grill", "display": "grill-1", "last_seq": 12}
+        bus     -> {"op": "welcome", "station": "grill", "seq": 15, "resume_from": 12}
+        bus     -> {"op": "ticket", "seq": 13, "station": "grill", "order_number": 7, ...}
+        display -> {"op": "ack", "seq": 13}
+    """
+
+    def __init__(self, stations=STATIONS, retain=1000, window=32, intake_size=1000):
+        self.stations = {name: _Station(name, retain) for name in stations}
+        self.window = window
+        self.intake = asyncio.Queue(intake_size)
+        self.acked = {}     # (station, display) -> last acknowledged seq
+        self.published = 0
+        self._dispatcher = None
+
+    # --------------------------- Publishing --------------------------- #
+    def start(self):
+        self._dispatcher = asyncio.ensure_future(self._dispatch())
+
+    async def stop(self):
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            self._dispatcher = None
+
+    async def publish(self, entry):
+        """Queue a confirmed order; waits while the intake queue is full."""
+        await self.intake.put(entry)
+
+    async def _dispatch(self):
+        while True:
+            entry = await self.intake.get()
+            created = entry.get("kot_created") or time.time()
+            for station_name, lines in split_tickets(entry).items():
+                station = self.stations.get(station_name) or self.stations[DEFAULT_STATION]
+                station.seq += 1
+                station.log.append({
+                    "op": "ticket", "seq": station.seq, "station": station.name,
+                    "order_number": entry.get("order_number"),
+                    "customer_name": entry.get("customer_name", ""),
+                    "items": lines, "created": created,
+                })
+                for subscriber in station.subscribers:
+                    subscriber.wakeup.set()
+            self.published += 1
+
+    # --------------------------- Displays --------------------------- #
+    async def handle_display(self, reader, writer):
+        """Serve one display connection: subscribe, stream tickets, take acks."""
+        subscriber = feeder = None
+        try:
+            hello = json.loads(await reader.readline() or b"{}")
+            station = self.stations.get(hello.get("station"))
+            if hello.get("op") != "subscribe" or station is None:
+                writer.write(_encode({"op": "error", "error": "expected subscribe to a known station",
+                                      "stations": list(self.stations)}))
+                await writer.drain()
+                return
+            display = str(hello.get("display") or id(writer))
+            key = (station.name, display)
+            last_seq = hello.get("last_seq")
+            if last_seq is None:
+                # Known displays resume after their last ack; new ones start live
+                last_seq = self.acked.get(key, station.seq)
+            last_seq = max(0, min(int(last_seq), station.seq))
+
+            subscriber = _Subscriber(station, display, writer, last_seq)
+            station.subscribers.add(subscriber)
+            writer.write(_encode({"op": "welcome", "station": station.name, "seq": station.seq,
+                                  "resume_from": last_seq}))
+            feeder = asyncio.ensure_future(self._feed(subscriber))
+
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                message = json.loads(line)
+                if message.get("op") == "ack":
+                    seq = int(message["seq"])
+                    if seq > subscriber.acked:
+                        subscriber.acked = seq
+                        self.acked[key] = seq
+                        subscriber.wakeup.set()
+        except (ConnectionError, ValueError, KeyError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            if feeder is not None:
+                feeder.cancel()
+            if subscriber is not None:
+                subscriber.station.subscribers.discard(subscriber)
+            writer.close()
+
+    async def _feed(self, subscriber):
+        """Send tickets to one display, never more than ``window`` unacknowledged."""
+        station = subscriber.station
+        writer = subscriber.writer
+        try:
+            while True:
+                sent_any = False
+                while subscriber.sent - subscriber.acked < self.window:
+                    ticket = station.after(subscriber.sent)
+                    if ticket is None:
+                        break
+                    writer.write(_encode(ticket))
+                    subscriber.sent = ticket["seq"]
+                    sent_any = True
+                if sent_any:
+                    await writer.drain()
+                    continue
+                subscriber.wakeup.clear()
+                await subscriber.wakeup.wait()
+        except ConnectionError:
+            writer.close()
+
+    def status(self):
+        """Per-station sequence, connected displays and their unacknowledged counts."""
+        return {name: {"seq": station.seq,
+                       "displays": {s.display: station.seq - s.acked for s in station.subscribers}}
+                for name, station in self.stations.items()}
+
+
+# --------------------------- Background Service --------------------------- #
+class KitchenService:
+    """Run a KitchenBus and its display server on a background event loop.
+
+    This is the object handed to RestaurantManager(kitchen=...): submit()
+    is thread-safe and is called with every confirmed order.
+    """
+
+    def __init__(self, host="127.0.0.1", port=9100, submit_timeout=1.0, **bus_options):
+        self.host = host
+        self.port = port
+        self.submit_timeout = submit_timeout
+        self.bus_options = bus_options
+        self.bus = None
+        self.loop = None
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        """Start the loop thread and listen for displays; returns self."""
+        ready = threading.Event()
+        failure = []
+
+        def run():
+            self.loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self.loop)
+            try:
+                self.loop.run_until_complete(self._start_server())
+            except OSError as e:
+                failure.append(e)
+                ready.set()
+                return
+            ready.set()
+            self.loop.run_forever()
+            self.loop.run_until_complete(self._stop_server())
+            self.loop.close()
+
+        self._thread = threading.Thread(target=run, name="kitchen-bus", daemon=True)
+        self._thread.start()
+        ready.wait()
+        if failure:
+            raise failure[0]
+        return self
+
+    async def _start_server(self):
+        self.bus = KitchenBus(**self.bus_options)
+        self.bus.start()
+        self._server = await asyncio.start_server(self.bus.handle_display, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def _stop_server(self):
+        await self.bus.stop()
+        self._server.close()
+        await self._server.wait_closed()
+
+    def submit(self, entry):
+        """Publish a confirmed order from any thread.
+
+        Returns False if the intake stayed full for ``submit_timeout``; the
+        order is still delivered once the bus catches up.
+        """
+        entry = dict(entry, kot_created=time.time())
+        future = asyncio.run_coroutine_threadsafe(self.bus.publish(entry), self.loop)
+        try:
+            future.result(self.submit_timeout)
+        except concurrent.futures.TimeoutError:
+            return False
+        return True
+
+    def stop(self):
+        if self.loop is not None and self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join()
+
+
+def kitchen_from_env(environ=os.environ):
+    """Start a KitchenService when POS_KITCHEN is set (``port`` or ``host:port``)."""
+    spec = environ.get("POS_KITCHEN")
+    if not spec:
+        return None
+    host, _, port = spec.rpartition(":")
+    return KitchenService(host or "127.0.0.1", int(port)).start()
+
+
+# --------------------------- Stand-in Display --------------------------- #
+class KitchenDisplay:
+    """Socket client that behaves like a station screen (for testing).
+
+    It subscribes, acknowledges every ticket, ignores duplicates by sequence
+    and reconnects with its last acknowledged sequence so nothing is lost.
+    ``latencies`` collects order-to-screen times in seconds.
+    """
+
+    def __init__(self, host, port, station, display=None, on_ticket=None, reconnect_delay=0.2):
+        self.host = host
+        self.port = port
+        self.station = station
+        self.display = display or f"{station}-{random.randrange(10 ** 6)}"
+        self.on_ticket = on_ticket
+        self.reconnect_delay = reconnect_delay
+        self.last_seq = None
+        self.tickets = []
+        self.latencies = []
+        self._writer = None
+
+    async def connect(self):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        self._writer = writer
+        writer.write(_encode({"op": "subscribe", "station": self.station,
+                              "display": self.display, "last_seq": self.last_seq}))
+        await writer.drain()
+        welcome = json.loads(await reader.readline())
+        if welcome.get("op") != "welcome":
+            raise ConnectionError(welcome.get("error", "subscription refused"))
+        if self.last_seq is None:
+            self.last_seq = welcome["resume_from"]
+        return reader, writer
+
+    async def listen(self, reader, writer):
+        """Receive and acknowledge tickets until the connection closes."""
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            ticket = json.loads(line)
+            if ticket.get("op") != "ticket" or ticket["seq"] <= self.last_seq:
+                continue
+            self.latencies.append(time.time() - ticket["created"])
+            self.last_seq = ticket["seq"]
+            self.tickets.append(ticket)
+            if self.on_ticket is not None:
+                self.on_ticket(ticket)
+            writer.write(_encode({"op": "ack", "seq": ticket["seq"]}))
+
+    async def run(self):
+        """Stay subscribed, reconnecting after a dropped connection."""
+        while True:
+            try:
+                reader, writer = await self.connect()
+                try:
+                    await self.listen(reader, writer)
+                finally:
+                    writer.close()
+            except (ConnectionError, OSError):
+                pass
+            await asyncio.sleep(self.reconnect_delay)
+
+    def disconnect(self):
+        """Drop the connection (a simulated network blip); run() reconnects."""
+        if self._writer is not None:
+            self._writer.close()
+
+
+# --------------------------- Load Check --------------------------- #
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def _load_test(service, displays_per_station, orders, rate, blips):
+    displays = [KitchenDisplay(service.host, service.port, station, f"{station}-{i}")
+                for station in STATIONS for i in range(displays_per_station)]
+    tasks = [asyncio.ensure_future(display.run()) for display in displays]
+    while sum(1 for d in displays if d.last_seq is not None) < len(displays):
+        await asyncio.sleep(0.01)
+
+    categories = ("Main Course", "Breads & Sides", "Beverages", "Desserts", "Starters")
+    rng = random.Random(7)
+    loop = asyncio.get_running_loop()
+    for number in range(1, orders + 1):
+        entry = {"order_number": number, "customer_name": "Load",
+                 "items": {f"{category}:Item {rng.randrange(20)}": rng.randint(1, 3)
+                           for category in rng.sample(categories, rng.randint(1, 4))}}
+        await loop.run_in_executor(None, service.submit, entry)
+        if blips and number % (orders // blips or 1) == 0:
+            rng.choice(displays).disconnect()
+        await asyncio.sleep(1 / rate)
+
+    # Let replays finish before counting
+    deadline = time.time() + 5
+    expected = {name: station.seq for name, station in service.bus.stations.items()}
+    while time.time() < deadline and any(d.last_seq < expected[d.station] for d in displays):
+        await asyncio.sleep(0.05)
+    for task in tasks:
+        task.cancel()
+    return displays, expected
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Kitchen order ticket bus")
+    sub = parser.add_subparsers(dest="command", required=True)
+    serve = sub.add_parser("serve", help="run the bus and accept displays")
+    display = sub.add_parser("display", help="stand-in station screen")
+    check = sub.add_parser("loadcheck", help="measure order-to-screen latency locally")
+    for p in (serve, display):
+        p.add_argument("--host", default="127.0.0.1")
+        p.add_argument("--port", type=int, default=9100)
+    display.add_argument("--station", choices=STATIONS, required=True)
+    display.add_argument("--name", help="display id (reconnects resume after its last ack)")
+    check.add_argument("--displays", type=int, default=12, help="displays per station")
+    check.add_argument("--orders", type=int, default=500)
+    check.add_argument("--rate", type=float, default=100, help="orders per second")
+    check.add_argument("--blips", type=int, default=5, help="forced display disconnects")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        service = KitchenService(args.host, args.port).start()
+        print(f"Kitchen bus on {args.host}:{service.port}; Ctrl+C to stop")
+        try:
+            while True:
+                time.sleep(5)
+                print(json.dumps(service.bus.status()))
+        except KeyboardInterrupt:
+            service.stop()
+    elif args.command == "display":
+        def show(ticket):
+            items = ", ".join(f"{line['quantity']} x {line['item']}" for line in ticket["items"])
+            print(f"#{ticket['order_number']} [{ticket['seq']}] {ticket['customer_name']}: {items}")
+        try:
+            asyncio.run(KitchenDisplay(args.host, args.port, args.station, args.name, show).run())
+        except KeyboardInterrupt:
+            pass
+    else:
+        service = KitchenService(port=0).start()
+        try:
+            displays, expected = asyncio.run(
+                _load_test(service, args.displays, args.orders, args.rate, args.blips))
+        finally:
+            service.stop()
+        latencies = [value for d in displays for value in d.latencies]
+        missing = sum(expected[d.station] - d.last_seq for d in displays)
+        duplicates = sum(len(d.tickets) - len({t["seq"] for t in d.tickets}) for d in displays)
+        print(f"{len(displays)} displays, {args.orders} orders, {len(latencies)} tickets shown")
+        print(f"latency ms: p50 {statistics.median(latencies) * 1000:.2f}  "
+              f"p95 {_percentile(latencies, 0.95) * 1000:.2f}  "
+              f"p99 {_percentile(latencies, 0.99) * 1000:.2f}  max {max(latencies) * 1000:.2f}")
+        print(f"missing {missing}, duplicates shown {duplicates}")
+
+
+if __name__ == "__main__":
+    main()
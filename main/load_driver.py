@@ -0,0 +1,362 @@
+# ====================================================================== #
+#                    Multi-Terminal Load Driver & Replay                 #
+#     Simulated tills on RestaurantManager with latency & integrity      #
+# ====================================================================== #
+
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from history_segments import SegmentedHistory
+from restaurant_backend import RestaurantManager
+from storage import JsonFileStorage, SQLiteStorage
+
+
+# --------------------------- Settings --------------------------- #
+OPERATIONS = ("add_item", "generate_bill", "save_order_history", "new_order")
+
+
+class OrderMix:
+    """How synthetic terminals build orders.
+
+    Items per order, quantity per line, how often a discount or tip is given
+    and which values are used, plus optional category weights (a category
+    name fragment, e.g. "Main" -> 3, makes its items three times as likely).
+    """
+
+    def __init__(self, min_items=1, max_items=6, max_quantity=3,
+                 discount_chance=0.2, discounts=(5, 10, 15),
+                 tip_chance=0.4, tips=(50, 100, 200), category_weights=None):
+        self.min_items = min_items
+        self.max_items = max_items
+        self.max_quantity = max_quantity
+        self.discount_chance = discount_chance
+        self.discounts = tuple(discounts)
+        self.tip_chance = tip_chance
+        self.tips = tuple(tips)
+        self.category_weights = dict(category_weights or {})
+
+    def weight(self, category):
+        for fragment, weight in self.category_weights.items():
+            if fragment.lower() in category.lower():
+                return weight
+        return 1
+
+    def as_dict(self):
+        return dict(vars(self), discounts=list(self.discounts), tips=list(self.tips))
+
+
+# --------------------------- Workspace --------------------------- #
+def open_storage_in(kind, directory):
+    """Open a storage backend whose files all live in ``directory``."""
+    if kind == "sqlite":
+        return SQLiteStorage(os.path.join(directory, "restaurant.db"))
+    return JsonFileStorage(
+        counter_path=os.path.join(directory, "order_counter.json"),
+        history=SegmentedHistory(os.path.join(directory, "order_history"), legacy_path=None),
+        bill_dir=directory)
+
+
+def load_replay(path):
+    """Read orders to replay from a JSON array (order_history.json) or JSON Lines file."""
+    with open(path, "r", encoding="utf-8") as f:
+        head = f.read(1)
+        f.seek(0)
+        if head == "[":
+            entries = json.load(f)
+        else:
+            entries = [json.loads(line) for line in f if line.strip()]
+    return sorted(entries, key=lambda entry: entry.get("date", ""))
+
+
+def replay_schedule(entries, speed):
+    """Return [(seconds after start, entry)], original gaps divided by ``speed`` (0 = no waiting)."""
+    if not entries:
+        return []
+    times = []
+    for entry in entries:
+        try:
+            times.append(time.mktime(time.strptime(entry["date"][:19], "%Y-%m-%dT%H:%M:%S")))
+        except (KeyError, ValueError):
+            times.append(times[-1] if times else 0.0)
+    first = times[0]
+    return [((t - first) / speed if speed else 0.0, entry) for t, entry in zip(times, entries)]
+
+
+# --------------------------- Terminal --------------------------- #
+def _synthetic_orders(manager, mix, count, seed):
+    """Yield (items [(category, item, qty)], tip, discount) for ``count`` random orders."""
+    rng = random.Random(seed)
+    records = list(manager.menu_index)
+    weights = [mix.weight(record.category) for record in records]
+    for _ in range(count):
+        lines = {}
+        for record in rng.choices(records, weights, k=rng.randint(mix.min_items, mix.max_items)):
+            lines[(record.category, record.name)] = rng.randint(1, mix.max_quantity)
+        tip = rng.choice(mix.tips) if mix.tips and rng.random() < mix.tip_chance else 0
+        discount = (rng.choice(mix.discounts)
+                    if mix.discounts and rng.random() < mix.discount_chance else 0)
+        yield [(category, item, qty) for (category, item), qty in lines.items()], tip, discount
+
+
+def _replayed_order(entry):
+    items = [(key.partition(":")[0], key.partition(":")[2], qty)
+             for key, qty in entry.get("items", {}).items()]
+    return items, entry.get("tip", 0), entry.get("discount", 0)
+
+
+def run_terminal(terminal, kind, directory, tag, orders=0, mix=None, schedule=None,
+                 start_at=None, think=0.0, seed=0):
+    """Run one till: add_item -> generate_bill -> save_order_history -> new order.
+
+    Synthetic terminals place ``orders`` random orders following ``mix``;
+    replay terminals follow ``schedule`` [(offset seconds, entry)] from
+    ``start_at``. Returns latencies per operation, the saved orders and any
+    errors.
+    """
+    storage = open_storage_in(kind, directory)
+    latencies = {name: [] for name in OPERATIONS}
+    saved, errors = [], []
+    unmatched = 0
+    max_lag = 0.0
+    clock = time.perf_counter
+    try:
+        manager = RestaurantManager(storage)
+        if schedule is not None:
+            start_at = start_at or time.time()
+            work = ((offset, _replayed_order(entry)) for offset, entry in schedule)
+        else:
+            work = ((None, order) for order in _synthetic_orders(manager, mix, orders, seed))
+
+        for position, (offset, (items, tip, discount)) in enumerate(work):
+            if offset is not None:
+                delay = start_at + offset - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    max_lag = max(max_lag, -delay)
+            elif think:
+                time.sleep(think)
+            customer = f"{tag}-{terminal}-{position}"
+            try:
+                for category, item, qty in items:
+                    started = clock()
+                    manager.add_item(category, item, qty)
+                    latencies["add_item"].append(clock() - started)
+                lines = len(manager.order)
+                unmatched += len(items) - lines
+                if not lines:
+                    continue
+
+                started = clock()
+                manager.generate_bill(tip, discount, customer)
+                latencies["generate_bill"].append(clock() - started)
+
+                number = manager.order_number
+                started = clock()
+                manager.save_order_history(customer_name=customer, tip=tip, discount=discount)
+                latencies["save_order_history"].append(clock() - started)
+                saved.append((number, customer, lines))
+            except Exception as e:  # keep driving; errors are part of the report
+                errors.append(f"terminal {terminal}: {type(e).__name__}: {e}")
+            finally:
+                started = clock()
+                manager.clear_order()
+                latencies["new_order"].append(clock() - started)
+    finally:
+        storage.close()
+    return {"terminal": terminal, "latencies": latencies, "saved": saved, "errors": errors,
+            "unmatched_items": unmatched, "max_schedule_lag": max_lag}
+
+
+def _run_terminal_job(job):
+    return run_terminal(**job)
+
+
+# --------------------------- Integrity Check --------------------------- #
+def check_integrity(kind, directory, tag, results):
+    """Compare what terminals saved with what the history holds."""
+    saved = [order for result in results for order in result["saved"]]
+    numbers = [number for number, _, _ in saved]
+    expected = {customer: (number, lines) for number, customer, lines in saved}
+
+    storage = open_storage_in(kind, directory)
+    try:
+        found = {}
+        for entry in storage.iter_orders():
+            customer = entry.get("customer_name", "")
+            if customer.startswith(tag + "-"):
+                found.setdefault(customer, []).append(entry)
+    finally:
+        storage.close()
+
+    lost = sorted(customer for customer in expected if customer not in found)
+    duplicated = sorted(customer for customer, entries in found.items() if len(entries) > 1)
+    unexpected = sorted(customer for customer in found if customer not in expected)
+    mismatched = sorted(
+        customer for customer, entries in found.items()
+        if customer in expected and (entries[-1].get("order_number") != expected[customer][0]
+                                     or len(entries[-1].get("items", {})) != expected[customer][1]))
+    return {
+        "orders_saved": len(saved),
+        "duplicate_order_numbers": len(numbers) - len(set(numbers)),
+        "lost_history_entries": len(lost),
+        "duplicated_history_entries": len(duplicated),
+        "unexpected_history_entries": len(unexpected),
+        "mismatched_history_entries": len(mismatched),
+        "examples": {"lost": lost[:5], "duplicated": duplicated[:5], "mismatched": mismatched[:5]},
+    }
+
+
+# --------------------------- Reporting --------------------------- #
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def summarize(results, elapsed):
+    operations = {}
+    for name in OPERATIONS:
+        values = [value for result in results for value in result["latencies"][name]]
+        if not values:
+            continue
+        operations[name] = {
+            "count": len(values),
+            "p50_ms": round(statistics.median(values) * 1000, 3),
+            "p95_ms": round(_percentile(values, 0.95) * 1000, 3),
+            "p99_ms": round(_percentile(values, 0.99) * 1000, 3),
+            "max_ms": round(max(values) * 1000, 3),
+        }
+    orders = sum(len(result["saved"]) for result in results)
+    return {
+        "seconds": round(elapsed, 3),
+        "orders": orders,
+        "orders_per_minute": round(orders / elapsed * 60, 1) if elapsed else None,
+        "operations": operations,
+        "unmatched_items": sum(result["unmatched_items"] for result in results),
+        "max_schedule_lag_s": round(max(result["max_schedule_lag"] for result in results), 3),
+        "errors": [error for result in results for error in result["errors"]][:20],
+    }
+
+
+def print_report(report):
+    summary, integrity = report["summary"], report["integrity"]
+    print(f"{report['terminals']} terminals ({report['mode']}, {report['storage']}): "
+          f"{summary['orders']} orders in {summary['seconds']}s "
+          f"= {summary['orders_per_minute']} orders/min")
+    print(f"{'operation':<20} {'count':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for name, stats in summary["operations"].items():
+        print(f"{name:<20} {stats['count']:>8} {stats['p50_ms']:>9.3f} {stats['p95_ms']:>9.3f} "
+              f"{stats['p99_ms']:>9.3f} {stats['max_ms']:>9.3f}")
+    if report.get("replay"):
+        print(f"replay: {report['replay']['orders']} orders at {report['replay']['speed']}x, "
+              f"max lag behind schedule {summary['max_schedule_lag_s']}s, "
+              f"{summary['unmatched_items']} items not on the menu")
+    print("integrity: " + ", ".join(f"{key} {value}" for key, value in integrity.items()
+                                    if key != "examples"))
+    for error in summary["errors"]:
+        print(f"  error: {error}")
+
+
+# --------------------------- Driver --------------------------- #
+def run(terminals=8, orders=50, mix=None, kind="json", directory=None, mode="threads",
+        replay=None, speed=0.0, think=0.0, seed=1):
+    """Run the load and return the report document."""
+    tag = f"load{int(time.time())}"
+    owned = directory is None
+    directory = directory or tempfile.mkdtemp(prefix="pos_load_")
+    os.makedirs(directory, exist_ok=True)
+    # Create the files once so terminals do not race to initialize them
+    open_storage_in(kind, directory).close()
+
+    start_at = time.time() + 0.5
+    jobs = []
+    for terminal in range(terminals):
+        job = {"terminal": terminal, "kind": kind, "directory": directory, "tag": tag,
+               "start_at": start_at, "think": think, "seed": seed * 1000 + terminal}
+        if replay is not None:
+            # Round-robin keeps every till busy and each till's orders in time order
+            job["schedule"] = replay_schedule(replay, speed)[terminal::terminals]
+        else:
+            job["orders"] = orders
+            job["mix"] = mix or OrderMix()
+        jobs.append(job)
+
+    pool_class = ProcessPoolExecutor if mode == "processes" else ThreadPoolExecutor
+    started = time.perf_counter()
+    with pool_class(terminals) as pool:
+        results = list(pool.map(_run_terminal_job, jobs))
+    elapsed = time.perf_counter() - started
+
+    report = {
+        "terminals": terminals, "mode": mode, "storage": kind,
+        "directory": None if owned else directory,
+        "mix": None if replay is not None else (mix or OrderMix()).as_dict(),
+        "replay": {"orders": len(replay), "speed": speed} if replay is not None else None,
+        "summary": summarize(results, elapsed),
+        "integrity": check_integrity(kind, directory, tag, results),
+    }
+    if owned:
+        shutil.rmtree(directory, ignore_errors=True)
+    return report
+
+
+def _values(text):
+    """Parse '5,10,15' into numbers (ints when whole)."""
+    numbers = (float(value) for value in text.split(",") if value.strip()) if text else ()
+    return tuple(int(number) if number.is_integer() else number for number in numbers)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate many tills on RestaurantManager")
+    parser.add_argument("--terminals", type=int, default=8)
+    parser.add_argument("--orders", type=int, default=50, help="orders per synthetic terminal")
+    parser.add_argument("--mode", choices=["threads", "processes"], default="threads",
+                        help="terminals as threads in one process or as separate processes")
+    parser.add_argument("--storage", choices=["json", "sqlite"], default="json")
+    parser.add_argument("--directory", help="workspace for the run (default: a temp dir, removed after)")
+    parser.add_argument("--think", type=float, default=0.0, help="seconds between orders per till")
+    parser.add_argument("--items", default="1-6", help="items per order, e.g. 1-6")
+    parser.add_argument("--quantity", type=int, default=3, help="largest quantity per line")
+    parser.add_argument("--discount-chance", type=float, default=0.2)
+    parser.add_argument("--discounts", default="5,10,15", help="discount percentages to pick from")
+    parser.add_argument("--tip-chance", type=float, default=0.4)
+    parser.add_argument("--tips", default="50,100,200", help="tips (Rs.) to pick from")
+    parser.add_argument("--weight", action="append", default=[],
+                        help="category weight, e.g. 'Main=3' (repeatable)")
+    parser.add_argument("--replay", help="replay orders from order_history.json or a .jsonl log")
+    parser.add_argument("--speed", type=float, default=0.0,
+                        help="replay speed-up (60 = an hour per minute; 0 = as fast as possible)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="also write the report as JSON")
+    args = parser.parse_args()
+
+    low, _, high = args.items.partition("-")
+    mix = OrderMix(int(low), int(high or low), args.quantity, args.discount_chance,
+                   _values(args.discounts), args.tip_chance, _values(args.tips),
+                   {name: float(weight) for name, _, weight in
+                    (spec.partition("=") for spec in args.weight)})
+    replay = load_replay(args.replay) if args.replay else None
+
+    report = run(args.terminals, args.orders, mix, args.storage, args.directory, args.mode,
+                 replay, args.speed, args.think, args.seed)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+    integrity = report["integrity"]
+    if any(integrity[key] for key in ("duplicate_order_numbers", "lost_history_entries",
+                                      "duplicated_history_entries", "mismatched_history_entries")):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,13 +6,25 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 from restaurant_backend import RestaurantManager
+from instrumentation import instrument_app, instrument_manager, instrument_summary, metrics_from_env
+from kitchen_bus import kitchen_from_env
+from pricing_rules import load_pricing
+from order_summary import SummaryRefresher, TextSink
+from persistence_worker import PersistenceWorker
+from virtual_menu import VirtualItemList
+from sales_rollups import SalesRollups
+from storage import open_storage
 import datetime
+import os
 
 
 # --------------------------- Main Application Class --------------------------- #
 class RestaurantApp:
     """GUI Application for Restaurant Management using Tkinter."""
 
+    MENU_POLL_MS = 2000
+    METRICS_EXPORT_MS = 10000
+
     # --------------------------- Initialization --------------------------- #
     def __init__(self, root):
         self.root = root
@@ -24,14 +36,44 @@ class RestaurantApp:
         if self.root.tk.call('tk', 'windowingsystem') == 'win32':
             self.root.state('zoomed')
 
-        # Backend Manager Instance
-        self.manager = RestaurantManager()
+        # Kitchen displays subscribe to saved orders when POS_KITCHEN=host:port is set
+        self.kitchen = kitchen_from_env()
+
+        # Backend Manager Instance (POS_STORAGE=sqlite:restaurant.db selects SQLite)
+        # Promotions and category tax come from pricing_rules.json (or POS_PRICING) if present
+        self.manager = RestaurantManager(open_storage(os.environ.get("POS_STORAGE", "json")),
+                                         SalesRollups(), kitchen=self.kitchen,
+                                         pricing=load_pricing())
+
+        # Opt-in timing metrics (POS_METRICS=metrics.prom or metrics.json); callbacks
+        # are wrapped before any widget binds them
+        self.metrics, self.metrics_path = metrics_from_env()
+        if self.metrics is not None:
+            instrument_manager(self.manager, self.metrics)
+            instrument_app(self, self.metrics)
+            self.root.after(self.METRICS_EXPORT_MS, self.export_metrics)
+
+        # Bills, history and order numbers are written off the UI thread
+        self.worker = PersistenceWorker(self.manager)
+        self.worker.attach(self.root)
+        self.order_pending = False
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
 
         # Setup UI
         self.setup_styles()
         self.create_widgets()
+
+        # Bursts of edits are coalesced into one idle-time, line-diffed summary update
+        self.summary = SummaryRefresher(self.manager, TextSink(self.order_summary),
+                                        pricing=self.read_pricing,
+                                        schedule=self.root.after_idle)
+        if self.metrics is not None:
+            instrument_summary(self.summary, self.metrics)
         self.update_order_display()
 
+        # Pick up menu.json edits without a restart
+        self.root.after(self.MENU_POLL_MS, self.watch_menu)
+
     # --------------------------- Tkinter Styles --------------------------- #
     def setup_styles(self):
         """Configure custom styles for the UI."""
@@ -98,89 +140,137 @@ class RestaurantApp:
                  font=("Segoe UI", 20, "bold"),
                  bg="#2c3e50", fg="#ecf0f1").pack(pady=10)
 
+        # Keyboard item search
+        self.create_search_box(menu_frame)
+
         # Tabbed categories
         self.notebook = ttk.Notebook(menu_frame, style="Custom.TNotebook")
         self.notebook.pack(fill=tk.BOTH, expand=True, pady=10)
 
-        # Store references for quantity fields
-        self.entries = {}
-        for category, items in self.manager.menu.items():
-            self.create_menu_tab(category, items)
-
-    def create_menu_tab(self, category, items):
-        """Create a tab for each menu category."""
-        tab_frame = tk.Frame(self.notebook, bg="#ecf0f1")
-        self.notebook.add(tab_frame, text=category)
-
-        # Scrollable Canvas
-        canvas = tk.Canvas(tab_frame, bg="#ecf0f1", highlightthickness=0)
-        scrollbar = ttk.Scrollbar(tab_frame, orient="vertical", command=canvas.yview)
-        scrollable_frame = tk.Frame(canvas, bg="#ecf0f1")
-
-        scrollable_frame.bind("<Configure>", lambda e: canvas.configure(scrollregion=canvas.bbox("all")))
-        canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
-        canvas.configure(yscrollcommand=scrollbar.set)
-
-        # Category Header
-        header_frame = tk.Frame(scrollable_frame, bg="#3498db", pady=15)
-        header_frame.pack(fill=tk.X, padx=20, pady=(20, 10))
-
-        tk.Label(header_frame,
-                 text=category,
-                 font=("Segoe UI", 18, "bold"),
-                 bg="#3498db", fg="white").pack()
-
-        # Add menu items
-        for item, price in items.items():
-            self.create_menu_item(scrollable_frame, category, item, price)
-
-        canvas.pack(side="left", fill="both", expand=True)
-        scrollbar.pack(side="right", fill="y")
-
-        # Scroll with mousewheel
-        def _on_mousewheel(event):
-            canvas.yview_scroll(int(-1 * (event.delta / 120)), "units")
-        canvas.bind_all("<MouseWheel>", _on_mousewheel)
-
-    def create_menu_item(self, parent, category, item, price):
-        """Create individual menu item entry with + and - buttons."""
-        item_frame = tk.Frame(parent, bg="white", relief="ridge", bd=2)
-        item_frame.pack(fill=tk.X, padx=20, pady=5)
-
-        # Item Info
-        info_frame = tk.Frame(item_frame, bg="white")
-        info_frame.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=15, pady=10)
-
-        tk.Label(info_frame, text=item,
-                 font=("Segoe UI", 14, "bold"),
-                 bg="white", fg="#2c3e50").pack(anchor="w")
-
-        tk.Label(info_frame, text=f"Rs. {price}",
-                 font=("Segoe UI", 12),
-                 bg="white", fg="#e74c3c").pack(anchor="w")
-
-        # Quantity Controls
-        qty_frame = tk.Frame(item_frame, bg="white")
-        qty_frame.pack(side=tk.RIGHT, padx=15, pady=10)
-
-        qty_var = tk.IntVar(value=0)
-        self.entries[(category, item)] = qty_var
-
-        # Decrease button
-        tk.Button(qty_frame, text="−", font=("Segoe UI", 12, "bold"),
-                  bg="#e74c3c", fg="white", width=3,
-                  command=lambda: self.change_quantity(qty_var, -1)).pack(side=tk.LEFT)
-
-        # Quantity Entry
-        qty_entry = tk.Entry(qty_frame, textvariable=qty_var,
-                             font=("Segoe UI", 12), width=5, justify="center")
-        qty_entry.pack(side=tk.LEFT, padx=5)
-        qty_entry.bind('<KeyRelease>', lambda e: self.update_order_display())
-
-        # Increase button
-        tk.Button(qty_frame, text="+", font=("Segoe UI", 12, "bold"),
-                  bg="#27ae60", fg="white", width=3,
-                  command=lambda: self.change_quantity(qty_var, 1)).pack(side=tk.LEFT)
+        # Tabs start empty and are built the first time they are selected
+        self.tab_categories = {}
+        self.item_lists = {}
+        self.shown_menu = None
+        self.notebook.bind("<<NotebookTabChanged>>", self.on_tab_changed)
+        self.build_menu_tabs()
+
+        # Scroll with mousewheel (the visible tab only)
+        self.root.bind_all("<MouseWheel>", self.on_mousewheel)
+
+    def build_menu_tabs(self):
+        """(Re)create one empty tab per category of the manager's current menu."""
+        for tab in self.notebook.tabs():
+            self.notebook.forget(tab)
+            self.notebook.nametowidget(tab).destroy()
+        self.tab_categories.clear()
+        self.item_lists.clear()
+        self.shown_menu = self.manager.menu_index
+
+        for category in self.manager.menu:
+            tab_frame = tk.Frame(self.notebook, bg="#ecf0f1")
+            self.tab_categories[str(tab_frame)] = category
+            self.notebook.add(tab_frame, text=category)
+        self.on_tab_changed()
+
+    def sync_menu(self):
+        """Rebuild the tabs if the manager switched to a reloaded menu."""
+        if self.manager.menu_index is not self.shown_menu:
+            self.build_menu_tabs()
+            self.clear_search()
+
+    def watch_menu(self):
+        """Poll the menu catalog; an order in progress keeps its prices until cleared."""
+        self.manager.check_menu()
+        self.sync_menu()
+        self.root.after(self.MENU_POLL_MS, self.watch_menu)
+
+    def on_tab_changed(self, event=None):
+        """Build the selected category tab on first use."""
+        tab = self.notebook.select()
+        if tab and tab not in self.item_lists and tab in self.tab_categories:
+            self.create_menu_tab(tab, self.tab_categories[tab])
+
+    def create_menu_tab(self, tab, category):
+        """Fill a category tab with a virtualized, scrollable item list."""
+        index = self.manager.menu_index
+        records = [index.items[item_id] for item_id in index.categories.get(category, [])]
+        self.item_lists[tab] = VirtualItemList(self.notebook.nametowidget(tab), category, records,
+                                               quantity_of=lambda item_id: self.manager.order.get(item_id, 0),
+                                               on_change=self.set_quantity)
+
+    def on_mousewheel(self, event):
+        item_list = self.item_lists.get(self.notebook.select())
+        if item_list is not None:
+            item_list.scroll(int(-1 * (event.delta / 120)))
+
+    # --------------------------- Item Search --------------------------- #
+    def create_search_box(self, parent):
+        """Search box: type a name or shortcode, Up/Down to pick, Enter adds one."""
+        search_frame = tk.Frame(parent, bg="#2c3e50")
+        search_frame.pack(fill=tk.X, padx=10)
+
+        tk.Label(search_frame, text="🔍 Search (Ctrl+F):",
+                 font=("Segoe UI", 11), bg="#2c3e50", fg="#ecf0f1").pack(side=tk.LEFT)
+
+        self.search_var = tk.StringVar()
+        self.search_entry = tk.Entry(search_frame, textvariable=self.search_var,
+                                     font=("Segoe UI", 12), bg="white")
+        self.search_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=10)
+
+        # Result list, shown under the box only while there are matches
+        self.search_results = tk.Listbox(parent, height=6, font=("Segoe UI", 11),
+                                         activestyle="none", exportselection=False)
+        self.search_matches = []
+
+        self.search_entry.bind("<KeyRelease>", self.on_search_typed)
+        self.search_entry.bind("<Down>", lambda e: self.move_search_selection(1))
+        self.search_entry.bind("<Up>", lambda e: self.move_search_selection(-1))
+        self.search_entry.bind("<Return>", lambda e: self.add_search_result())
+        self.search_entry.bind("<Escape>", lambda e: self.clear_search())
+        self.search_results.bind("<Double-Button-1>", lambda e: self.add_search_result())
+        self.root.bind("<Control-f>", lambda e: self.search_entry.focus_set())
+
+    def on_search_typed(self, event):
+        """Refresh the result list as the query changes."""
+        if event.keysym in ("Up", "Down", "Return", "Escape"):
+            return
+        self.search_matches = self.manager.search_items(self.search_var.get(), limit=8)
+        self.search_results.delete(0, tk.END)
+        for record in self.search_matches:
+            code = f"[{record.code}] " if record.code else ""
+            self.search_results.insert(tk.END, f"{code}{record.short_name}  —  Rs. {record.price}")
+        if self.search_matches:
+            self.search_results.selection_set(0)
+            self.search_results.pack(fill=tk.X, padx=10, pady=(5, 0), before=self.notebook)
+        else:
+            self.search_results.pack_forget()
+
+    def move_search_selection(self, step):
+        if not self.search_matches:
+            return "break"
+        selected = self.search_results.curselection()
+        index = min(max((selected[0] if selected else 0) + step, 0), len(self.search_matches) - 1)
+        self.search_results.selection_clear(0, tk.END)
+        self.search_results.selection_set(index)
+        self.search_results.see(index)
+        return "break"
+
+    def add_search_result(self):
+        """Add one unit of the selected search result to the order."""
+        if self.search_matches:
+            selected = self.search_results.curselection()
+            record = self.search_matches[selected[0] if selected else 0]
+            self.set_quantity(record.item_id, self.manager.order.get(record.item_id, 0) + 1)
+            for item_list in self.item_lists.values():
+                item_list.refresh()
+        self.clear_search()
+        return "break"
+
+    def clear_search(self):
+        self.search_var.set("")
+        self.search_matches = []
+        self.search_results.delete(0, tk.END)
+        self.search_results.pack_forget()
 
     # --------------------------- Order & Billing Panel --------------------------- #
     def create_order_panel(self, parent):
@@ -236,8 +326,8 @@ class RestaurantApp:
                  font=("Segoe UI", 10), width=8).grid(row=1, column=1, padx=5, pady=5)
 
         # Auto-update on changes
-        self.discount_var.trace('w', lambda *args: self.update_order_display())
-        self.tip_var.trace('w', lambda *args: self.update_order_display())
+        self.discount_var.trace('w', lambda *args: self.summary.request())
+        self.tip_var.trace('w', lambda *args: self.summary.request())
 
         # Bill Display Box
         tk.Label(order_frame, text="📄 BILL RECEIPT",
@@ -278,47 +368,26 @@ class RestaurantApp:
         btn_frame.grid_columnconfigure(1, weight=1)
 
     # --------------------------- Utility Methods --------------------------- #
-    def change_quantity(self, qty_var, change):
-        """Increase or decrease an item's quantity."""
-        current = qty_var.get()
-        new_qty = max(0, current + change)
-        qty_var.set(new_qty)
-        self.update_order_display()
+    def set_quantity(self, item_id, quantity):
+        """Record an item's new quantity in the order and schedule a summary refresh."""
+        self.manager.set_quantity(item_id, quantity)
+        self.summary.request()
+
+    @staticmethod
+    def read_int(var):
+        """Return an IntVar's value, treating text that is mid-edit as 0."""
+        try:
+            return var.get()
+        except tk.TclError:
+            return 0
+
+    def read_pricing(self):
+        """Return the current (tip, discount) inputs."""
+        return self.read_int(self.tip_var), self.read_int(self.discount_var)
 
     def update_order_display(self):
-        """Update the live order summary display."""
-        # Reset order before rebuilding
-        self.manager.order.clear()
-        for (category, item), qty_var in self.entries.items():
-            qty = qty_var.get()
-            if qty > 0:
-                self.manager.add_item(category, item, qty)
-
-        # Update summary text box
-        self.order_summary.delete(1.0, tk.END)
-        if self.manager.order:
-            summary_text = []
-            for key, qty in self.manager.order.items():
-                category, item = key.split(":", 1)
-                price = self.manager.menu[category][item]
-                total = price * qty
-                clean_item = item.split(" ", 1)[-1] if " " in item else item
-                summary_text.append(f"{clean_item:<20} x{qty:<3} Rs.{total}")
-
-            amounts = self.manager.calculate_total(self.tip_var.get(), self.discount_var.get())
-            summary_text.append("-" * 40)
-            summary_text.append(f"{'Subtotal:':<30} Rs.{amounts['subtotal']:.2f}")
-            if self.discount_var.get() > 0:
-                summary_text.append(f"{'Discount:':<30} -Rs.{amounts['discount_amount']:.2f}")
-            summary_text.append(f"{'Tax (5%):':<30} Rs.{amounts['tax_amount']:.2f}")
-            if self.tip_var.get() > 0:
-                summary_text.append(f"{'Tip:':<30} Rs.{self.tip_var.get():.2f}")
-            summary_text.append("-" * 40)
-            summary_text.append(f"{'TOTAL:':<30} Rs.{amounts['total']:.2f}")
-
-            self.order_summary.insert(tk.END, "\n".join(summary_text))
-        else:
-            self.order_summary.insert(tk.END, "No items selected")
+        """Update the live order summary now."""
+        self.summary.flush()
 
     def update_datetime(self):
         """Update and refresh the live date/time display every second."""
@@ -351,23 +420,25 @@ class RestaurantApp:
         if not bill_content or bill_content == "No items in order":
             messagebox.showerror("Error", "No bill to save! Please generate a bill first.")
             return
+        if self.order_pending:
+            messagebox.showwarning("Please Wait", "The new order number is still being assigned.")
+            return
 
-        filename = f"bill_{self.manager.order_number:04d}_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
-
-        try:
-            with open(filename, "w", encoding="utf-8") as f:
-                f.write(bill_content)
-
-            # Save in history
-            self.manager.save_order_history(bill_content, self.customer_var.get())
-            messagebox.showinfo("Saved", f"Bill saved as {filename}")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to save bill: {str(e)}")
+        # Snapshot the order now; the worker writes bill and history in the background
+        entry = self.manager.build_history_entry(self.customer_var.get(),
+                                                 tip=self.tip_var.get(),
+                                                 discount=self.discount_var.get())
+        self.worker.save_order(
+            self.manager.order_number, bill_content, entry,
+            on_done=lambda filename: messagebox.showinfo("Saved", f"Bill saved as {filename}"),
+            on_error=lambda e: messagebox.showerror("Error", f"Failed to save bill: {str(e)}"))
 
     def clear_all(self):
         """Reset all inputs and clear current order."""
-        for qty_var in self.entries.values():
-            qty_var.set(0)
+        self.manager.clear_items()
+        self.sync_menu()
+        for item_list in self.item_lists.values():
+            item_list.refresh()
         self.tip_var.set(0)
         self.discount_var.set(0)
         self.customer_var.set("")
@@ -381,9 +452,42 @@ class RestaurantApp:
                 return
 
         self.clear_all()
-        self.manager.clear_order()
-        self.order_num_label.config(text=f"Order #{self.manager.order_number:04d}")
-        messagebox.showinfo("New Order", f"Started new order #{self.manager.order_number:04d}")
+
+        # Reserving a number may touch the counter file, so it runs on the worker
+        self.order_pending = True
+        self.order_num_label.config(text="Order #....")
+        self.worker.call(self.manager.get_next_order_number,
+                         on_done=self.start_order, on_error=self.order_number_failed)
+
+    def start_order(self, order_number):
+        """Show the freshly reserved order number."""
+        self.manager.order_number = order_number
+        self.order_pending = False
+        self.order_num_label.config(text=f"Order #{order_number:04d}")
+        messagebox.showinfo("New Order", f"Started new order #{order_number:04d}")
+
+    def order_number_failed(self, error):
+        """Report a failed reservation; saving stays blocked until New Order succeeds."""
+        messagebox.showerror("Error", f"Could not start a new order: {error}\n"
+                                      "Press New Order to try again.")
+
+    def export_metrics(self, reschedule=True):
+        """Write the metrics file and schedule the next export."""
+        try:
+            self.metrics.write(self.metrics_path)
+        except OSError:
+            pass  # metrics must never interrupt billing
+        if reschedule:
+            self.root.after(self.METRICS_EXPORT_MS, self.export_metrics)
+
+    def on_close(self):
+        """Finish pending writes before the window closes."""
+        self.worker.close()
+        if self.kitchen is not None:
+            self.kitchen.stop()
+        if self.metrics is not None:
+            self.export_metrics(reschedule=False)
+        self.root.destroy()
 
 
 # --------------------------- Run Application --------------------------- #
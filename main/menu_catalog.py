@@ -0,0 +1,165 @@
+# ====================================================================== #
+#                          External Menu Catalog                         #
+#       JSON/SQLite menu file with a binary snapshot & hot reload        #
+# ====================================================================== #
+
+import json
+import marshal
+import os
+import sqlite3
+
+from menu_index import MenuIndex
+
+
+# --------------------------- Catalog Location --------------------------- #
+# Shipped next to this module so the app finds it from any working directory
+CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "menu.json")
+
+# Bump when the snapshot layout changes; older snapshots are rebuilt
+SNAPSHOT_MAGIC = "pak-cuisine-menu"
+SNAPSHOT_FORMAT = 1
+
+
+# --------------------------- Catalog Parsing --------------------------- #
+def _rows_from_json(path):
+    """Read (item_id, category, name, price, code) rows and the version from JSON."""
+    with open(path, "r", encoding="utf-8") as f:
+        catalog = json.load(f)
+    rows = []
+    for category in catalog["categories"]:
+        for item in category["items"]:
+            rows.append((int(item["id"]), category["name"], item["name"], int(item["price"]),
+                         item.get("code")))
+    return rows, int(catalog.get("version", 0))
+
+
+def _rows_from_sqlite(path):
+    """Read catalog rows from a SQLite file with a ``menu_items`` table.
+
+    Expected schema: menu_items(item_id, category, name, price, code, position)
+    and an optional single-row catalog(version).
+    """
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        rows = conn.execute("SELECT item_id, category, name, price, code FROM menu_items "
+                            "ORDER BY position, item_id").fetchall()
+        try:
+            version = conn.execute("SELECT version FROM catalog").fetchone()
+        except sqlite3.OperationalError:
+            version = None
+    finally:
+        conn.close()
+    return [tuple(row) for row in rows], int(version[0]) if version else 0
+
+
+def write_catalog(menu_index, path=CATALOG_PATH, version=None):
+    """Write a MenuIndex out as a JSON catalog (used to seed or export menus)."""
+    catalog = {"version": menu_index.version if version is None else version, "categories": []}
+    for category, ids in menu_index.categories.items():
+        items = []
+        for item_id in ids:
+            record = menu_index[item_id]
+            item = {"id": record.item_id, "name": record.name, "price": record.price}
+            if record.code:
+                item["code"] = record.code
+            items.append(item)
+        catalog["categories"].append({"name": category, "items": items})
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(catalog, f, indent=2, ensure_ascii=False)
+        f.write("\n")
+    os.replace(tmp_path, path)
+
+
+# --------------------------- Menu Catalog --------------------------- #
+class MenuCatalog:
+    """Load the menu from a catalog file and notice when it changes.
+
+    The parsed catalog is cached as a ``marshal`` snapshot next to the file
+    (``<catalog>.snapshot``). The snapshot records the snapshot format and
+    the catalog's size and modification time, so startup skips JSON/SQL
+    parsing until the catalog is edited. poll() compares the file's stat
+    against the loaded one and returns a fresh MenuIndex when it changed;
+    indexes already handed out are never modified, so open orders keep the
+    prices they were created with. Without a catalog file, ``fallback``
+    (a {category: {item: price}} dict) is used.
+    """
+
+    def __init__(self, path=CATALOG_PATH, fallback=None, snapshot_path=None):
+        self.path = path
+        self.fallback = fallback
+        self.snapshot_path = snapshot_path or path + ".snapshot"
+        self.menu_index = None
+        self._stat = None
+
+    # --------------------------- Loading --------------------------- #
+    def _source_stat(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _read_snapshot(self, stat):
+        try:
+            with open(self.snapshot_path, "rb") as f:
+                magic, fmt, source_stat, version, rows = marshal.load(f)
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+        if magic != SNAPSHOT_MAGIC or fmt != SNAPSHOT_FORMAT or tuple(source_stat) != stat:
+            return None
+        return rows, version
+
+    def _write_snapshot(self, stat, rows, version):
+        tmp_path = f"{self.snapshot_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                marshal.dump((SNAPSHOT_MAGIC, SNAPSHOT_FORMAT, stat, version, rows), f)
+            os.replace(tmp_path, self.snapshot_path)
+        except OSError:
+            # A read-only install still works, it just parses the catalog each start
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def _parse(self):
+        if self.path.endswith((".db", ".sqlite", ".sqlite3")):
+            return _rows_from_sqlite(self.path)
+        return _rows_from_json(self.path)
+
+    def load(self):
+        """Load the catalog (from the snapshot when it is current) and return a MenuIndex."""
+        stat = self._source_stat()
+        if stat is None:
+            if self.fallback is None:
+                raise FileNotFoundError(f"Menu catalog not found: {self.path}")
+            self.menu_index = MenuIndex(self.fallback)
+        else:
+            cached = self._read_snapshot(stat)
+            if cached is not None:
+                rows, version = cached
+            else:
+                rows, version = self._parse()
+                self._write_snapshot(stat, rows, version)
+            self.menu_index = MenuIndex.from_rows(rows, version)
+        self._stat = stat
+        return self.menu_index
+
+    # --------------------------- Hot Reload --------------------------- #
+    def changed(self):
+        """True if the catalog file differs from the one last loaded."""
+        return self._source_stat() != self._stat
+
+    def poll(self):
+        """Reload if the catalog changed; return the new MenuIndex or None.
+
+        A catalog that fails to parse (e.g. caught mid-save) is ignored and
+        retried on the next poll.
+        """
+        if not self.changed():
+            return None
+        try:
+            return self.load()
+        except (OSError, ValueError, KeyError, TypeError, sqlite3.Error):
+            return None
@@ -0,0 +1,111 @@
+# ====================================================================== #
+#                          Precomputed Menu Index                        #
+#         Integer item IDs mapped to compact, pre-parsed menu records    #
+# ====================================================================== #
+
+
+# --------------------------- Menu Item Record --------------------------- #
+class MenuItem:
+    """One menu item with every display form derived once at menu load."""
+
+    __slots__ = ("item_id", "category", "name", "key", "receipt_name",
+                 "short_name", "price", "rank", "code")
+
+    def __init__(self, item_id, category, name, price, code=None):
+        self.item_id = item_id
+        self.category = category
+        self.name = name
+        self.price = price
+
+        # Optional till shortcode from the menu catalog
+        self.code = code
+
+        # Legacy "category:item" key, still used in saved order history
+        self.key = f"{category}:{name}"
+
+        # Emoji-free name for receipts and the name without its emoji prefix
+        self.receipt_name = name.encode("ascii", "ignore").decode()
+        self.short_name = name.split(" ", 1)[-1] if " " in name else name
+
+        # Position in bill order (alphabetical by key), filled in by MenuIndex
+        self.rank = 0
+
+    def __repr__(self):
+        return f"MenuItem({self.item_id}, {self.key!r}, {self.price})"
+
+
+# --------------------------- Menu Index --------------------------- #
+class MenuIndex:
+    """Map stable integer item IDs to MenuItem records.
+
+    IDs are assigned in menu order, so a category/item keeps its ID as long
+    as the menu layout does not change. Catalog menus (see from_rows) carry
+    their own IDs; an ID retired from the catalog leaves a ``None`` gap in
+    ``items`` so existing IDs never shift. ``version`` identifies the price
+    version the index was built from.
+    """
+
+    def __init__(self, menu=None, version=0):
+        rows = []
+        for category, items in (menu or {}).items():
+            for name, price in items.items():
+                rows.append((len(rows), category, name, price, None))
+        self._build(rows, version)
+
+    @classmethod
+    def from_rows(cls, rows, version=0):
+        """Build an index from (item_id, category, name, price, code) rows in menu order."""
+        index = cls.__new__(cls)
+        index._build(rows, version)
+        return index
+
+    def _build(self, rows, version):
+        self.version = version
+        self.items = [None] * (max((row[0] for row in rows), default=-1) + 1)
+        self.by_name = {}
+        self.by_key = {}
+        self.by_code = {}
+        self.categories = {}
+
+        for item_id, category, name, price, code in rows:
+            if self.items[item_id] is not None:
+                raise ValueError(f"Duplicate menu item id {item_id}")
+            record = MenuItem(item_id, category, name, price, code)
+            self.items[item_id] = record
+            self.by_name[(category, name)] = record
+            self.by_key[record.key] = record
+            if code:
+                self.by_code[code] = record
+            self.categories.setdefault(category, []).append(item_id)
+
+        for rank, record in enumerate(sorted(self, key=lambda r: r.key)):
+            record.rank = rank
+
+    def __getitem__(self, item_id):
+        return self.items[item_id]
+
+    def __len__(self):
+        """Size of the ID space (highest item ID + 1), used to size per-item arrays."""
+        return len(self.items)
+
+    def __iter__(self):
+        return (record for record in self.items if record is not None)
+
+    def get(self, item_id):
+        """Return the MenuItem for ``item_id``, or None if no such item exists."""
+        if 0 <= item_id < len(self.items):
+            return self.items[item_id]
+        return None
+
+    def lookup(self, category, name):
+        """Return the MenuItem for a category/item pair, or None."""
+        return self.by_name.get((category, name))
+
+    def prices(self):
+        """Return the price of every item, indexed by item ID (0 for retired IDs)."""
+        return [record.price if record is not None else 0 for record in self.items]
+
+    def menu(self):
+        """Return the index as a {category: {item: price}} dict."""
+        return {category: {self.items[item_id].name: self.items[item_id].price for item_id in ids}
+                for category, ids in self.categories.items()}
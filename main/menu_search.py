@@ -0,0 +1,182 @@
+# ====================================================================== #
+#                          Menu Item Search Index                        #
+#      Prefix & typo-tolerant lookup over item names and shortcodes      #
+# ====================================================================== #
+
+import re
+from bisect import bisect_left, insort
+
+
+# --------------------------- Text Helpers --------------------------- #
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+# Queries shorter than this are matched by prefix only
+MIN_FUZZY_LENGTH = 3
+
+
+def tokens(text):
+    """Lower-case ASCII words of ``text`` (emoji and punctuation dropped)."""
+    return _TOKEN.findall(text.lower())
+
+
+def _deletes(term):
+    """The term itself plus every variant with one character removed."""
+    return {term} | {term[:i] + term[i + 1:] for i in range(len(term))}
+
+
+def _within_one_edit(a, b):
+    """True if ``a`` and ``b`` differ by at most one insert, delete, substitution or swap."""
+    if a == b:
+        return True
+    la, lb = len(a), len(b)
+    if abs(la - lb) > 1:
+        return False
+    if la > lb:
+        a, b, la, lb = b, a, lb, la
+    i = 0
+    while i < la and a[i] == b[i]:
+        i += 1
+    if la == lb:
+        return (a[i + 1:] == b[i + 1:]
+                or (i + 1 < la and a[i] == b[i + 1] and a[i + 1] == b[i] and a[i + 2:] == b[i + 2:]))
+    return a[i:] == b[i + 1:]
+
+
+# --------------------------- Search Index --------------------------- #
+class MenuSearchIndex:
+    """Search menu items by name words and shortcodes as the cashier types.
+
+    Every word of an item's emoji-stripped name, and its shortcode, is a
+    term (a code with punctuation such as "BN-2" also as "bn2"; the raw code
+    typed in full is always the top hit). Terms are kept in a sorted list so a prefix is one bisect plus a
+    short scan, and a deletion-neighbourhood table (each term with one
+    character removed) finds terms one typo away without comparing against
+    the whole menu. update() applies only the items that changed between
+    two menu versions.
+    """
+
+    # Score of one query word by how it matched
+    CODE, EXACT, PREFIX, FUZZY = 4, 3, 2, 1
+
+    def __init__(self, menu_index=None):
+        self.records = {}       # item_id -> MenuItem
+        self._item_terms = {}   # item_id -> (signature, terms)
+        self._postings = {}     # term -> set of item_ids
+        self._codes = {}        # lower-case shortcode -> item_id
+        self._terms = []        # sorted distinct terms
+        self._deletes = {}      # delete variant -> set of terms
+        if menu_index is not None:
+            self.update(menu_index)
+
+    # --------------------------- Maintenance --------------------------- #
+    @staticmethod
+    def _signature(record):
+        return (record.name, record.code)
+
+    def _add(self, record):
+        terms = set(tokens(record.receipt_name))
+        if record.code:
+            code = record.code.lower()
+            self._codes[code] = record.item_id
+            # Same normalization as query words, so "BN-2" is also found as "bn2"
+            code_term = "".join(tokens(code))
+            if code_term:
+                terms.add(code_term)
+        self._item_terms[record.item_id] = (self._signature(record), terms)
+        for term in terms:
+            items = self._postings.get(term)
+            if items is None:
+                self._postings[term] = items = set()
+                insort(self._terms, term)
+                for variant in _deletes(term):
+                    self._deletes.setdefault(variant, set()).add(term)
+            items.add(record.item_id)
+
+    def _remove(self, item_id):
+        (name, code), terms = self._item_terms.pop(item_id)
+        if code and self._codes.get(code.lower()) == item_id:
+            del self._codes[code.lower()]
+        for term in terms:
+            items = self._postings[term]
+            items.discard(item_id)
+            if not items:
+                del self._postings[term]
+                del self._terms[bisect_left(self._terms, term)]
+                for variant in _deletes(term):
+                    holders = self._deletes[variant]
+                    holders.discard(term)
+                    if not holders:
+                        del self._deletes[variant]
+
+    def update(self, menu_index):
+        """Bring the index in line with ``menu_index``; returns how many items changed."""
+        changed = 0
+        current = {}
+        for record in menu_index:
+            current[record.item_id] = record
+            known = self._item_terms.get(record.item_id)
+            if known is None or known[0] != self._signature(record):
+                if known is not None:
+                    self._remove(record.item_id)
+                self._add(record)
+                changed += 1
+        for item_id in [item_id for item_id in self._item_terms if item_id not in current]:
+            self._remove(item_id)
+            changed += 1
+        # Unchanged items still point at the new records (prices may differ)
+        self.records = current
+        return changed
+
+    # --------------------------- Lookup --------------------------- #
+    def _prefix_terms(self, word):
+        terms = self._terms
+        position = bisect_left(terms, word)
+        while position < len(terms) and terms[position].startswith(word):
+            yield terms[position]
+            position += 1
+
+    def _fuzzy_terms(self, word):
+        found = set()
+        deletes = self._deletes
+        for variant in _deletes(word):
+            for term in deletes.get(variant, ()):
+                if term not in found and _within_one_edit(word, term):
+                    found.add(term)
+        return found
+
+    def _match_word(self, word):
+        """Return {item_id: score} for one query word."""
+        scores = {}
+        postings = self._postings
+        for term in self._prefix_terms(word):
+            score = self.EXACT if term == word else self.PREFIX
+            for item_id in postings[term]:
+                if scores.get(item_id, 0) < score:
+                    scores[item_id] = score
+        if len(word) >= MIN_FUZZY_LENGTH:
+            for term in self._fuzzy_terms(word):
+                for item_id in postings[term]:
+                    scores.setdefault(item_id, self.FUZZY)
+        code_item = self._codes.get(word)
+        if code_item is not None:
+            scores[code_item] = self.CODE
+        return scores
+
+    def search(self, query, limit=10):
+        """Return up to ``limit`` MenuItems matching every word of ``query``, best first."""
+        # Shortcodes may hold punctuation that tokens() drops, so try the raw query first
+        code_item = self._codes.get(query.strip().lower())
+        words = tokens(query)
+        scores = self._match_word(words[0]) if words else {}
+        for word in words[1:]:
+            if not scores:
+                break
+            matches = self._match_word(word)
+            scores = {item_id: score + matches[item_id]
+                      for item_id, score in scores.items() if item_id in matches}
+
+        records = self.records
+        ranked = sorted(scores, key=lambda item_id: (-scores[item_id], records[item_id].rank))
+        if code_item is not None:
+            ranked = [code_item] + [item_id for item_id in ranked if item_id != code_item]
+        return [records[item_id] for item_id in ranked[:limit]]
@@ -0,0 +1,396 @@
+# ====================================================================== #
+#                       Headless Order API Server                        #
+#          Asyncio HTTP/JSON service on top of RestaurantManager         #
+# ====================================================================== #
+
+import argparse
+import asyncio
+import json
+import re
+from urllib.parse import parse_qs, urlsplit
+
+from kitchen_bus import KitchenService
+from order_book import OrderBook
+from pricing_rules import load_pricing
+from restaurant_backend import RestaurantManager, render_history_bill
+from sales_rollups import SalesRollups
+from storage import BillSaveError, open_storage
+
+
+# --------------------------- HTTP Helpers --------------------------- #
+REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found",
+           405: "Method Not Allowed", 409: "Conflict", 500: "Internal Server Error",
+           503: "Service Unavailable"}
+
+
+class APIError(Exception):
+    """Error returned to the client as a JSON body with an HTTP status."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def _number(value, name):
+    """Parse a numeric request field (int when possible)."""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise APIError(400, f"'{name}' must be a number")
+    return int(number) if number.is_integer() else number
+
+
+# --------------------------- Order API Server --------------------------- #
+class OrderAPIServer:
+    """Serve menu, open orders, billing and history over HTTP/JSON.
+
+    Open orders live in an OrderBook in memory on the event loop, keyed by
+    order number and sharing one storage backend. Anything that touches
+    the disk (order numbers, history, bills) runs in the default executor
+    so slow writes never stall other requests.
+
+    Endpoints:
+        GET    /menu
+        POST   /orders                       {"customer_name": ""}
+        GET    /orders/<n>?tip=&discount=
+        POST   /orders/<n>/items             {"item_id": 3, "quantity": 2}
+        DELETE /orders/<n>/items/<item_id>
+        GET    /orders/<n>/totals?tip=&discount=
+        POST   /orders/<n>/bill              {"tip": 0, "discount": 0, "save": false}
+        DELETE /orders/<n>
+        POST   /orders/<n>/suspend | /orders/<n>/resume
+        GET    /history?customer=&start=&end=
+        GET    /history/<n>
+        GET    /history/<n>/bill
+    """
+
+    def __init__(self, storage=None, host="127.0.0.1", port=8080, rollups=None,
+                 menu_poll_interval=2.0, kitchen=None, pricing=None):
+        self.storage = storage if storage is not None else open_storage("json")
+        self.rollups = rollups
+        self.kitchen = kitchen
+        self.pricing = pricing
+        self.host = host
+        self.port = port
+        self.manager = None
+        self.book = None
+        self._saving = set()
+        self._recorded = set()      # order numbers in history whose bill failed to save
+        self._server = None
+        self._menu_watcher = None
+        self.menu_poll_interval = menu_poll_interval
+
+        # Route table: (method, compiled path pattern, handler)
+        self.routes = [
+            ("GET", re.compile(r"^/menu$"), self.get_menu),
+            ("POST", re.compile(r"^/orders$"), self.open_order),
+            ("GET", re.compile(r"^/orders/(\d+)$"), self.get_order),
+            ("DELETE", re.compile(r"^/orders/(\d+)$"), self.discard_order),
+            ("POST", re.compile(r"^/orders/(\d+)/suspend$"), self.suspend_order),
+            ("POST", re.compile(r"^/orders/(\d+)/resume$"), self.resume_order),
+            ("POST", re.compile(r"^/orders/(\d+)/items$"), self.add_item),
+            ("DELETE", re.compile(r"^/orders/(\d+)/items/(\d+)$"), self.remove_item),
+            ("GET", re.compile(r"^/orders/(\d+)/totals$"), self.get_totals),
+            ("POST", re.compile(r"^/orders/(\d+)/bill$"), self.bill_order),
+            ("GET", re.compile(r"^/history$"), self.find_history),
+            ("GET", re.compile(r"^/history/(\d+)$"), self.get_history),
+            ("GET", re.compile(r"^/history/(\d+)/bill$"), self.reprint_bill),
+        ]
+
+    # --------------------------- Lifecycle --------------------------- #
+    async def start(self):
+        """Start listening; returns the asyncio server."""
+        loop = asyncio.get_running_loop()
+        self.manager = await loop.run_in_executor(
+            None, RestaurantManager, self.storage, self.rollups, None, self.kitchen, self.pricing)
+        self.book = OrderBook(self.manager)
+        if self.menu_poll_interval:
+            self._menu_watcher = asyncio.ensure_future(self._watch_menu())
+        self._server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self._server
+
+    async def serve_forever(self):
+        server = await self.start()
+        async with server:
+            await server.serve_forever()
+
+    async def _watch_menu(self):
+        """Pick up menu catalog edits; open orders keep their own prices."""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.menu_poll_interval)
+            await loop.run_in_executor(None, self.manager.check_menu)
+
+    async def stop(self):
+        if self._menu_watcher is not None:
+            self._menu_watcher.cancel()
+            self._menu_watcher = None
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    # --------------------------- Connection Handling --------------------------- #
+    async def handle_connection(self, reader, writer):
+        """Serve HTTP/1.1 requests on one keep-alive connection."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line or not request_line.strip():
+                    break
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    await self._respond(writer, 400, {"error": "Malformed request line"}, False)
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get("content-length", 0) or 0)
+                body = await reader.readexactly(length) if length else b""
+                keep_alive = (headers.get("connection", "").lower() != "close"
+                              and version.upper() == "HTTP/1.1")
+
+                status, payload = await self.dispatch(method.upper(), target, body)
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, status, payload, keep_alive):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        head = (f"HTTP/1.1 {status} {REASONS.get(status, 'OK')}\r\n"
+                f"Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+    async def dispatch(self, method, target, body):
+        """Route a request and return (status, JSON payload)."""
+        url = urlsplit(target)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        path_matched = False
+        try:
+            data = json.loads(body) if body else {}
+            for route_method, pattern, handler in self.routes:
+                match = pattern.match(url.path)
+                if not match:
+                    continue
+                path_matched = True
+                if route_method == method:
+                    result = handler(*match.groups(), query=query, data=data)
+                    if asyncio.iscoroutine(result):
+                        result = await result
+                    return result
+            if path_matched:
+                raise APIError(405, f"{method} not allowed on {url.path}")
+            raise APIError(404, f"No route for {url.path}")
+        except APIError as e:
+            return e.status, {"error": e.message}
+        except json.JSONDecodeError:
+            return 400, {"error": "Request body is not valid JSON"}
+        except Exception as e:
+            return 500, {"error": str(e)}
+
+    # --------------------------- Helpers --------------------------- #
+    def _order(self, order_number):
+        try:
+            return self.book.get(int(order_number))
+        except KeyError:
+            raise APIError(404, f"Order #{order_number} is not open") from None
+
+    @staticmethod
+    def _pricing(source):
+        return (_number(source.get("tip", 0), "tip"),
+                _number(source.get("discount", 0), "discount"))
+
+    @staticmethod
+    def _order_payload(order, tip=0, discount=0):
+        records = order.menu_index.items
+        return {
+            "order_number": order.order_number,
+            "customer_name": order.customer_name,
+            "suspended": order.suspended,
+            "items": [{"item_id": item_id, "name": records[item_id].name,
+                       "price": records[item_id].price, "quantity": qty}
+                      for item_id, qty in order.items().items()],
+            "item_count": order.item_count,
+            "totals": order.calculate_total(tip, discount),
+        }
+
+    def _item_id(self, order, data):
+        if "item_id" in data:
+            item_id = int(_number(data["item_id"], "item_id"))
+            if order.menu_index.get(item_id) is None:
+                raise APIError(404, f"Unknown item id {item_id}")
+            return item_id
+        record = order.menu_index.lookup(data.get("category"), data.get("item"))
+        if record is None:
+            raise APIError(404, "Unknown menu item")
+        return record.item_id
+
+    # --------------------------- Menu --------------------------- #
+    def get_menu(self, query, data):
+        index = self.manager.menu_index
+        return 200, {
+            category: [{"item_id": i, "name": index[i].name, "price": index[i].price}
+                       for i in ids]
+            for category, ids in index.categories.items()
+        }
+
+    # --------------------------- Orders --------------------------- #
+    async def open_order(self, query, data):
+        # Reserving a number may touch the counter file, so do it off the loop
+        loop = asyncio.get_running_loop()
+        order_number = await loop.run_in_executor(None, self.storage.next_order_number)
+        order = self.book.open(customer_name=str(data.get("customer_name", "")),
+                               order_number=order_number)
+        return 201, self._order_payload(order)
+
+    def get_order(self, order_number, query, data):
+        order = self._order(order_number)
+        return 200, self._order_payload(order, *self._pricing(query))
+
+    def discard_order(self, order_number, query, data):
+        self._order(order_number)
+        self.book.discard(int(order_number))
+        return 200, {"order_number": int(order_number), "discarded": True}
+
+    def suspend_order(self, order_number, query, data):
+        self._order(order_number)
+        return 200, self._order_payload(self.book.suspend(int(order_number)))
+
+    def resume_order(self, order_number, query, data):
+        self._order(order_number)
+        return 200, self._order_payload(self.book.resume(int(order_number)))
+
+    def add_item(self, order_number, query, data):
+        order = self._order(order_number)
+        quantity = int(_number(data.get("quantity", 1), "quantity"))
+        try:
+            order.add_item(self._item_id(order, data), quantity)
+        except ValueError as e:
+            raise APIError(400, str(e))
+        return 200, self._order_payload(order, *self._pricing(data))
+
+    def remove_item(self, order_number, item_id, query, data):
+        order = self._order(order_number)
+        try:
+            order.remove_item(self._item_id(order, {"item_id": item_id}))
+        except ValueError as e:
+            raise APIError(400, str(e))
+        return 200, self._order_payload(order, *self._pricing(query))
+
+    def get_totals(self, order_number, query, data):
+        order = self._order(order_number)
+        return 200, order.calculate_total(*self._pricing(query))
+
+    async def bill_order(self, order_number, query, data):
+        """Render the bill; with ``"save": true`` also persist it and close the order."""
+        order = self._order(order_number)
+        if not order.item_count:
+            raise APIError(400, "No items in order")
+        tip, discount = self._pricing(data)
+        customer_name = str(data.get("customer_name", order.customer_name))
+        bill = self.book.generate_bill(order.ticket, tip, discount, customer_name)
+        payload = {"order_number": order.order_number, "bill": bill,
+                   "totals": order.calculate_total(tip, discount)}
+
+        if data.get("save"):
+            if order.ticket in self._saving:
+                raise APIError(409, f"Order #{order.order_number} is already being saved")
+            # Snapshot now; the disk writes happen off the event loop. The order
+            # stays open (and on hold) until they succeed, so a failed save can be retried
+            entry = self.book.build_history_entry(order.ticket, customer_name, tip, discount)
+            was_suspended = order.suspended
+            order.suspended = True
+            self._saving.add(order.ticket)
+            # A retry after only the bill failed must not write the history again
+            entries = [] if order.order_number in self._recorded else [entry]
+            loop = asyncio.get_running_loop()
+            try:
+                payload["saved_as"] = await loop.run_in_executor(
+                    None, self._persist, order.order_number, bill, entries)
+            except BillSaveError as e:
+                self._recorded.add(order.order_number)
+                order.suspended = was_suspended
+                raise APIError(503, f"Order #{order.order_number} was recorded but its bill was not "
+                                    f"saved ({e}); it is still open, retry the request") from e
+            except Exception as e:
+                order.suspended = was_suspended
+                raise APIError(503, f"Order #{order.order_number} was not saved ({e}); "
+                                    "it is still open, retry the request") from e
+            finally:
+                self._saving.discard(order.ticket)
+            self._recorded.discard(order.order_number)
+            self.book.discard(order.ticket)
+        return 200, payload
+
+    def _persist(self, order_number, bill, entries):
+        # History before bill (see StorageBackend.save_orders)
+        return self.manager.save_orders(entries, [(order_number, bill)])[0]
+
+    # --------------------------- History --------------------------- #
+    async def find_history(self, query, data):
+        loop = asyncio.get_running_loop()
+        orders = await loop.run_in_executor(
+            None, lambda: self.storage.find_orders(query.get("customer"),
+                                                   query.get("start"), query.get("end")))
+        return 200, {"orders": orders}
+
+    async def get_history(self, order_number, query, data):
+        loop = asyncio.get_running_loop()
+        entry = await loop.run_in_executor(None, self.storage.get_order, int(order_number))
+        if entry is None:
+            raise APIError(404, f"Order #{order_number} not found in history")
+        return 200, entry
+
+    async def reprint_bill(self, order_number, query, data):
+        status, entry = await self.get_history(order_number, query, data)
+        return status, {"order_number": entry["order_number"],
+                        "bill": render_history_bill(entry, self.manager.menu_index)}
+
+
+# --------------------------- Run Server --------------------------- #
+def main():
+    parser = argparse.ArgumentParser(description="Pak Cuisine headless order API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--storage", default="json",
+                        help="storage spec, e.g. json or sqlite:restaurant.db")
+    parser.add_argument("--rollups", default="sales_rollups.db",
+                        help="sales rollups database ('' to disable)")
+    parser.add_argument("--kitchen-port", type=int,
+                        help="also publish saved orders to kitchen displays on this port")
+    parser.add_argument("--pricing", default=None,
+                        help="pricing rules file (default: pricing_rules.json if present)")
+    args = parser.parse_args()
+
+    rollups = SalesRollups(args.rollups) if args.rollups else None
+    kitchen = KitchenService(args.host, args.kitchen_port).start() if args.kitchen_port else None
+    server = OrderAPIServer(open_storage(args.storage), args.host, args.port, rollups,
+                            kitchen=kitchen, pricing=load_pricing(args.pricing))
+    print(f"Serving order API on http://{args.host}:{args.port}")
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if kitchen is not None:
+            kitchen.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+# ====================================================================== #
+#                     Order API Local Test Client                        #
+#         Keep-alive asyncio client & smoke/load test for order_api      #
+# ====================================================================== #
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+from urllib.parse import urlencode
+
+from history_log import OrderHistoryLog
+from order_api import OrderAPIServer
+from sales_rollups import SalesRollups
+from storage import JsonFileStorage
+
+
+# --------------------------- Async Client --------------------------- #
+class OrderAPIClient:
+    """Minimal HTTP/1.1 keep-alive JSON client for OrderAPIServer."""
+
+    def __init__(self, host="127.0.0.1", port=8080):
+        self.host = host
+        self.port = port
+        self._reader = None
+        self._writer = None
+
+    async def connect(self):
+        self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        return self
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            await self._writer.wait_closed()
+            self._writer = None
+
+    async def request(self, method, path, data=None, **query):
+        """Send one request and return (status, decoded JSON body)."""
+        if self._writer is None:
+            await self.connect()
+        if query:
+            path = f"{path}?{urlencode(query)}"
+        body = json.dumps(data).encode("utf-8") if data is not None else b""
+        head = (f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n")
+        self._writer.write(head.encode("latin-1") + body)
+        await self._writer.drain()
+
+        status = int((await self._reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await self._reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            if name.strip().lower() == "content-length":
+                length = int(value.strip())
+        payload = await self._reader.readexactly(length) if length else b"{}"
+        return status, json.loads(payload)
+
+    # --------------------------- Convenience Calls --------------------------- #
+    async def menu(self):
+        return (await self.request("GET", "/menu"))[1]
+
+    async def open_order(self, customer_name=""):
+        return (await self.request("POST", "/orders", {"customer_name": customer_name}))[1]
+
+    async def add_item(self, order_number, item_id, quantity=1):
+        return (await self.request("POST", f"/orders/{order_number}/items",
+                                   {"item_id": item_id, "quantity": quantity}))[1]
+
+    async def remove_item(self, order_number, item_id):
+        return (await self.request("DELETE", f"/orders/{order_number}/items/{item_id}"))[1]
+
+    async def totals(self, order_number, tip=0, discount=0):
+        return (await self.request("GET", f"/orders/{order_number}/totals",
+                                   tip=tip, discount=discount))[1]
+
+    async def bill(self, order_number, tip=0, discount=0, save=False):
+        return (await self.request("POST", f"/orders/{order_number}/bill",
+                                   {"tip": tip, "discount": discount, "save": save}))[1]
+
+    async def history(self, order_number):
+        return (await self.request("GET", f"/history/{order_number}"))[1]
+
+
+# --------------------------- Smoke / Load Test --------------------------- #
+async def run_load(host, port, clients=50, orders_per_client=10, items_per_order=5):
+    """Drive full order lifecycles from many concurrent clients; return stats."""
+    probe = await OrderAPIClient(host, port).connect()
+    item_ids = [item["item_id"] for items in (await probe.menu()).values() for item in items]
+    await probe.close()
+
+    requests = 0
+    saved = []
+
+    async def terminal():
+        nonlocal requests
+        client = await OrderAPIClient(host, port).connect()
+        try:
+            for _ in range(orders_per_client):
+                order = await client.open_order("Load Test")
+                number = order["order_number"]
+                for _ in range(items_per_order):
+                    await client.add_item(number, random.choice(item_ids), random.randint(1, 3))
+                await client.totals(number, tip=50, discount=10)
+                result = await client.bill(number, tip=50, discount=10, save=True)
+                saved.append(result["order_number"])
+                requests += items_per_order + 3
+        finally:
+            await client.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(terminal() for _ in range(clients)))
+    elapsed = time.perf_counter() - started
+
+    # Spot-check that saved orders reached history
+    checker = await OrderAPIClient(host, port).connect()
+    missing = [n for n in saved[:20] if "order_number" not in await checker.history(n)]
+    await checker.close()
+
+    return {
+        "requests": requests,
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(requests / elapsed, 1),
+        "orders_saved": len(saved),
+        "duplicate_order_numbers": len(saved) - len(set(saved)),
+        "missing_from_history": missing,
+    }
+
+
+async def _run_with_local_server(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = JsonFileStorage(
+            counter_path=os.path.join(tmp, "order_counter.json"),
+            history=OrderHistoryLog(os.path.join(tmp, "order_history.jsonl"), legacy_path=None),
+            bill_dir=tmp)
+        rollups = SalesRollups(os.path.join(tmp, "sales_rollups.db"))
+        server = OrderAPIServer(storage, "127.0.0.1", 0, rollups)
+        await server.start()
+        try:
+            return await run_load("127.0.0.1", server.port, args.clients, args.orders, args.items)
+        finally:
+            await server.stop()
+            storage.close()
+            rollups.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local test client for the order API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--local", action="store_true",
+                        help="start a throwaway server in a temp directory")
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--orders", type=int, default=10, help="orders per client")
+    parser.add_argument("--items", type=int, default=5, help="items per order")
+    args = parser.parse_args()
+
+    if args.local:
+        stats = asyncio.run(_run_with_local_server(args))
+    else:
+        stats = asyncio.run(run_load(args.host, args.port, args.clients, args.orders, args.items))
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+# ====================================================================== #
+#                        Multi-Order Session Book                        #
+#          Many open tables/tickets per RestaurantManager at once        #
+# ====================================================================== #
+
+import datetime
+from array import array
+
+from pricing_rules import record_adjustments
+from restaurant_backend import compute_amounts, format_bill
+from storage import BillSaveError
+
+
+# --------------------------- Open Order --------------------------- #
+class OpenOrder:
+    """One open ticket stored as per-item counts in a compact array.
+
+    ``counts[item_id]`` is the quantity of that menu item and ``lines`` holds
+    just the non-zero ones, so views of the order cost its number of lines,
+    not the size of the menu. The subtotal and item count are kept up to date
+    on every change, so repricing costs the same no matter how many lines the
+    order has. ``pricing`` is the manager's PricingPlan (or None) at the time
+    the order was opened.
+    """
+
+    __slots__ = ("ticket", "order_number", "customer_name", "menu_index", "counts", "lines",
+                 "subtotal", "item_count", "suspended", "opened_at", "pricing")
+
+    def __init__(self, ticket, order_number, menu_index, customer_name="", pricing=None):
+        self.ticket = ticket
+        self.order_number = order_number
+        self.customer_name = customer_name
+        self.menu_index = menu_index
+        self.counts = array("I", bytes(4 * len(menu_index)))
+        self.lines = {}             # item_id -> quantity, non-zero lines in order added
+        self.subtotal = 0
+        self.item_count = 0
+        self.suspended = False
+        self.opened_at = datetime.datetime.now()
+        self.pricing = pricing
+
+    # --------------------------- Item Management --------------------------- #
+    def add_item(self, item_id, quantity):
+        """Add (or with a negative quantity, take away) units of a menu item."""
+        if self.suspended:
+            raise ValueError(f"Ticket {self.ticket!r} is suspended")
+        current = self.counts[item_id]
+        new_qty = max(0, current + quantity)
+        self._set(item_id, current, new_qty)
+
+    def set_quantity(self, item_id, quantity):
+        """Set the quantity of a menu item directly."""
+        if self.suspended:
+            raise ValueError(f"Ticket {self.ticket!r} is suspended")
+        self._set(item_id, self.counts[item_id], max(0, quantity))
+
+    def remove_item(self, item_id):
+        """Remove a menu item from the order completely."""
+        self.set_quantity(item_id, 0)
+
+    def _set(self, item_id, current, new_qty):
+        change = new_qty - current
+        if change:
+            self.counts[item_id] = new_qty
+            if new_qty:
+                self.lines[item_id] = new_qty
+            else:
+                del self.lines[item_id]
+            self.subtotal += self.menu_index.items[item_id].price * change
+            self.item_count += change
+
+    # --------------------------- Pricing & Views --------------------------- #
+    def calculate_total(self, tip=0, discount=0):
+        """Return the same amounts as RestaurantManager.calculate_total."""
+        if self.pricing is not None:
+            return self.pricing.amounts(self.items(), self.subtotal, tip, discount)
+        return compute_amounts(self.subtotal, tip, discount)
+
+    def items(self):
+        """Return the order as {item_id: quantity} for the non-zero lines."""
+        return dict(self.lines)
+
+    def history_items(self):
+        """Return the order in history format {"category:item": quantity}."""
+        records = self.menu_index.items
+        return {records[item_id].key: qty for item_id, qty in self.lines.items()}
+
+
+# --------------------------- Order Book --------------------------- #
+class OrderBook:
+    """Keep many open orders keyed by table or ticket name.
+
+    Orders share the manager's menu index and storage backend. Opening an
+    order reserves an order number; closing one renders its bill and saves
+    it to history.
+    """
+
+    def __init__(self, manager):
+        self.manager = manager
+        self.orders = {}
+        self._recorded = set()      # order numbers in history whose bill failed to save
+
+    def __len__(self):
+        return len(self.orders)
+
+    def __contains__(self, ticket):
+        return ticket in self.orders
+
+    # --------------------------- Lifecycle --------------------------- #
+    def open(self, ticket=None, customer_name="", order_number=None):
+        """Open a new order; the ticket defaults to its order number."""
+        if order_number is None:
+            order_number = self.manager.storage.next_order_number()
+        ticket = order_number if ticket is None else ticket
+        if ticket in self.orders:
+            raise KeyError(f"Ticket {ticket!r} is already open")
+        order = OpenOrder(ticket, order_number, self.manager.menu_index, customer_name,
+                          self.manager.pricing_plan)
+        self.orders[ticket] = order
+        return order
+
+    def get(self, ticket):
+        """Return the open order for ``ticket`` (KeyError if none)."""
+        try:
+            return self.orders[ticket]
+        except KeyError:
+            raise KeyError(f"No open order for ticket {ticket!r}") from None
+
+    def suspend(self, ticket):
+        """Put an order on hold; it rejects changes until resumed."""
+        order = self.get(ticket)
+        order.suspended = True
+        return order
+
+    def resume(self, ticket):
+        """Take an order off hold."""
+        order = self.get(ticket)
+        order.suspended = False
+        return order
+
+    def open_tickets(self, include_suspended=True):
+        """Return the tickets of all open (and optionally suspended) orders."""
+        return [ticket for ticket, order in self.orders.items()
+                if include_suspended or not order.suspended]
+
+    def discard(self, ticket):
+        """Drop an order without saving it."""
+        return self.orders.pop(ticket, None)
+
+    # --------------------------- Billing --------------------------- #
+    def generate_bill(self, ticket, tip=0, discount=0, customer_name=None):
+        """Render the bill for an open order."""
+        order = self.get(ticket)
+        if not order.item_count:
+            return "No items in order"
+        if customer_name is None:
+            customer_name = order.customer_name
+        return format_bill(order.menu_index, order.items(), order.order_number,
+                           order.calculate_total(tip, discount), tip, discount, customer_name)
+
+    def build_history_entry(self, ticket, customer_name=None, tip=0, discount=0):
+        """Snapshot an open order as a structured order history entry."""
+        order = self.get(ticket)
+        records = order.menu_index.items
+        items = order.items()
+        entry = {
+            "order_number": order.order_number,
+            "date": datetime.datetime.now().isoformat(),
+            "customer_name": order.customer_name if customer_name is None else customer_name,
+            "items": {records[item_id].key: qty for item_id, qty in items.items()},
+            "prices": {records[item_id].key: records[item_id].price for item_id in items},
+            "tip": tip,
+            "discount": discount
+        }
+        if order.pricing is not None:
+            record_adjustments(entry, order.calculate_total(tip, discount))
+        return entry
+
+    def close(self, ticket, tip=0, discount=0, customer_name=None, save=True):
+        """Bill an order, optionally save history and bill, and remove it from the book.
+
+        The order leaves the book only once it is saved, so a failed save can
+        be retried. After a BillSaveError the history is already written and
+        the retry saves just the bill.
+        """
+        bill = self.generate_bill(ticket, tip, discount, customer_name)
+        order = self.get(ticket)
+        if save:
+            number = order.order_number
+            entries = ([] if number in self._recorded
+                       else [self.build_history_entry(ticket, customer_name, tip, discount)])
+            try:
+                self.manager.save_orders(entries, [(number, bill)])
+            except BillSaveError:
+                self._recorded.add(number)
+                raise
+            self._recorded.discard(number)
+        del self.orders[ticket]
+        return bill
@@ -0,0 +1,140 @@
+# ====================================================================== #
+#                      Order Number Allocation (Hi/Lo)                   #
+#          Lock-safe, batched order numbers shared by many terminals     #
+# ====================================================================== #
+
+import atexit
+import json
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+# --------------------------- File Lock --------------------------- #
+class FileLock:
+    """Exclusive inter-process lock held on a side file while the counter changes.
+
+    With ``shared`` several holders may share the lock while excluding an
+    exclusive holder (Windows has no shared mode and locks exclusively).
+    """
+
+    def __init__(self, path, shared=False):
+        self.path = path
+        self.shared = shared
+        self._file = None
+
+    def __enter__(self):
+        self._file = open(self.path, "a+")
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_SH if self.shared else fcntl.LOCK_EX)
+        else:
+            while True:
+                try:
+                    self._file.seek(0)
+                    msvcrt.locking(self._file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    time.sleep(0.05)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            else:
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self._file.close()
+            self._file = None
+
+
+# --------------------------- Order Number Allocator --------------------------- #
+class OrderNumberAllocator:
+    """Hand out order numbers from blocks reserved in ``order_counter.json``.
+
+    Each process reserves ``block_size`` numbers at a time under a file lock,
+    so most allocations never touch the disk and two tills can never receive
+    the same number. The counter is written to a temp file and atomically
+    renamed, and if it is missing or unreadable the high-water mark is
+    recovered from the order history.
+    """
+
+    def __init__(self, counter_path="order_counter.json", block_size=10, history=None):
+        self.counter_path = counter_path
+        self.lock_path = counter_path + ".lock"
+        self.block_size = max(1, int(block_size))
+        self.history = history
+
+        # Current block: numbers _next .. _high (inclusive) belong to this process
+        self._next = 1
+        self._high = 0
+        self._lock = threading.Lock()
+
+        # Hand unused numbers back on a clean exit to avoid gaps
+        atexit.register(self.release)
+
+    # --------------------------- Allocation --------------------------- #
+    def allocate(self):
+        """Return the next order number, reserving a new block when needed."""
+        with self._lock:
+            if self._next > self._high:
+                self._reserve_block()
+            order_num = self._next
+            self._next += 1
+            return order_num
+
+    def _reserve_block(self):
+        with FileLock(self.lock_path):
+            last = self._read_counter()
+            self._write_counter(last + self.block_size)
+        self._next = last + 1
+        self._high = last + self.block_size
+
+    def release(self):
+        """Return the unused tail of this process' block if nobody reserved after it."""
+        with self._lock:
+            if self._next > self._high:
+                return
+            with FileLock(self.lock_path):
+                if self._read_counter() == self._high:
+                    self._write_counter(self._next - 1)
+            self._high = self._next - 1
+
+    # --------------------------- Counter File --------------------------- #
+    def _read_counter(self):
+        try:
+            with open(self.counter_path, "r") as f:
+                return int(json.load(f).get("last_order", 0))
+        except FileNotFoundError:
+            return self.recover_high_water()
+        except (ValueError, AttributeError):
+            # Corrupted counter (e.g. a crash with the old non-atomic writer)
+            return self.recover_high_water()
+
+    def _write_counter(self, last_order):
+        tmp_path = f"{self.counter_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"last_order": last_order}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.counter_path)
+
+    def recover_high_water(self):
+        """Return the highest order number found in the order history (0 if none)."""
+        if self.history is None:
+            return 0
+        if hasattr(self.history, "max_order_number"):
+            return self.history.max_order_number()
+        high = 0
+        for entry in self.history.iter_entries():
+            number = entry.get("order_number")
+            if isinstance(number, int) and number > high:
+                high = number
+        return high
@@ -0,0 +1,227 @@
+# ====================================================================== #
+#                      Live Order Summary Refresher                      #
+#        Coalesced, line-diffed updates of the current order panel       #
+# ====================================================================== #
+
+import argparse
+import difflib
+import json
+import os
+import random
+import tempfile
+import time
+
+from history_log import OrderHistoryLog
+from restaurant_backend import RestaurantManager
+from storage import JsonFileStorage
+
+
+# --------------------------- Summary Lines --------------------------- #
+def summary_lines(manager, tip=0, discount=0):
+    """Return the order summary panel text as a list of lines (menu order)."""
+    if not manager.order:
+        return ["No items selected"]
+
+    items = manager.menu_index.items
+    lines = []
+    for item_id, qty in sorted(manager.order.items()):
+        record = items[item_id]
+        lines.append(f"{record.short_name:<20} x{qty:<3} Rs.{record.price * qty}")
+
+    amounts = manager.calculate_total(tip, discount)
+    lines.append("-" * 40)
+    lines.append(f"{'Subtotal:':<30} Rs.{amounts['subtotal']:.2f}")
+    for label, amount in amounts.get('promotions', ()):
+        lines.append(f"{label + ':':<30} -Rs.{amount:.2f}")
+    if discount > 0:
+        lines.append(f"{'Discount:':<30} -Rs.{amounts['discount_amount']:.2f}")
+    if 'taxes' in amounts:
+        lines.extend(f"{f'Tax ({rate:g}%):':<30} Rs.{amount:.2f}" for rate, amount in amounts['taxes'])
+    else:
+        lines.append(f"{'Tax (5%):':<30} Rs.{amounts['tax_amount']:.2f}")
+    if tip > 0:
+        lines.append(f"{'Tip:':<30} Rs.{tip:.2f}")
+    lines.append("-" * 40)
+    lines.append(f"{'TOTAL:':<30} Rs.{amounts['total']:.2f}")
+    return lines
+
+
+# --------------------------- Output Sinks --------------------------- #
+class TextSink:
+    """Apply line replacements to a Tk Text widget without redrawing the rest."""
+
+    def __init__(self, widget):
+        self.widget = widget
+
+    def replace(self, start, stop, new_lines, old_count):
+        """Replace lines ``start``..``stop`` (exclusive) of ``old_count`` with ``new_lines``."""
+        widget = self.widget
+        text = "\n".join(new_lines)
+        if stop < old_count:
+            # Lines in the middle: each keeps its own trailing newline
+            widget.delete(f"{start + 1}.0", f"{stop + 1}.0")
+            if new_lines:
+                widget.insert(f"{start + 1}.0", text + "\n")
+        elif start < old_count:
+            # Change reaches the last line
+            if new_lines:
+                widget.delete(f"{start + 1}.0", "end-1c")
+                widget.insert(f"{start + 1}.0", text)
+            else:
+                widget.delete(f"{start}.end" if start else "1.0", "end-1c")
+        elif new_lines:
+            # Appending after the last line
+            widget.insert("end-1c", "\n" + text if old_count else text)
+
+
+class HeadlessSink:
+    """In-memory stand-in for the Text widget, used to measure refresh cost."""
+
+    def __init__(self):
+        self.lines = []
+        self.lines_written = 0
+        self.updates = 0
+
+    def replace(self, start, stop, new_lines, old_count):
+        self.lines[start:stop] = new_lines
+        self.lines_written += len(new_lines)
+        self.updates += 1
+
+    def text(self):
+        return "\n".join(self.lines)
+
+
+# --------------------------- Refresher --------------------------- #
+class SummaryRefresher:
+    """Coalesce bursts of quantity/pricing changes into one summary update.
+
+    ``request(item_id)`` only records what changed. The first request
+    schedules a flush through ``schedule`` (``root.after_idle`` in the app),
+    so a burst of keystrokes or variable traces costs one update. A flush
+    re-reads only the changed quantities (when a ``quantity_of`` source is
+    given) and rewrites only the summary lines that differ from what is on
+    screen. Without ``schedule`` (headless use)
+    flush() is called explicitly.
+    """
+
+    def __init__(self, manager, sink, pricing, quantity_of=None, schedule=None):
+        self.manager = manager
+        self.sink = sink
+        self.quantity_of = quantity_of      # item_id -> current quantity, if not in the order
+        self.pricing = pricing              # () -> (tip, discount)
+        self.schedule = schedule
+        self.lines = []
+        self._dirty = set()
+        self._scheduled = False
+        self.requests = 0
+        self.refreshes = 0
+
+    def request(self, item_id=None):
+        """Note a change (an item's quantity, or pricing when ``item_id`` is None)."""
+        self.requests += 1
+        if item_id is not None:
+            self._dirty.add(item_id)
+        if self.schedule is not None and not self._scheduled:
+            self._scheduled = True
+            self.schedule(self.flush)
+
+    def refresh(self, item_ids):
+        """Re-read the given items and update the summary immediately."""
+        self._dirty.update(item_ids)
+        self.flush()
+
+    def flush(self):
+        """Apply pending changes to the order and redraw the changed lines."""
+        self._scheduled = False
+        manager = self.manager
+        if self.quantity_of is not None:
+            for item_id in self._dirty:
+                manager.set_quantity(item_id, self.quantity_of(item_id))
+        self._dirty.clear()
+
+        tip, discount = self.pricing()
+        new = summary_lines(manager, tip, discount)
+        old = self.lines
+        if new == old:
+            return
+        opcodes = difflib.SequenceMatcher(None, old, new, autojunk=False).get_opcodes()
+        # Apply from the bottom up so earlier line numbers stay valid
+        count = len(old)
+        for tag, i1, i2, j1, j2 in reversed(opcodes):
+            if tag != "equal":
+                self.sink.replace(i1, i2, new[j1:j2], count)
+                count += (j2 - j1) - (i2 - i1)
+        self.lines = new
+        self.refreshes += 1
+
+
+# --------------------------- Headless Measurement --------------------------- #
+def measure_refresh(manager, changes=5000, burst=5, seed=0):
+    """Time coalesced, diffed refreshes against full redraws without a display.
+
+    Simulates ``changes`` quantity edits arriving in bursts of ``burst`` and
+    returns timings and the number of summary lines written by each approach.
+    """
+    rng = random.Random(seed)
+    ids = [record.item_id for record in manager.menu_index]
+    quantities = {}
+    edits = [(rng.choice(ids), rng.randint(0, 5)) for _ in range(changes)]
+
+    # Full redraw on every edit (the original behaviour)
+    full = HeadlessSink()
+    manager.clear_items()
+    started = time.perf_counter()
+    for item_id, qty in edits:
+        quantities[item_id] = qty
+        manager.clear_items()
+        for key, value in quantities.items():
+            manager.add_item_by_id(key, value)
+        lines = summary_lines(manager)
+        full.replace(0, len(full.lines), lines, len(full.lines))
+    full_seconds = time.perf_counter() - started
+
+    # Coalesced bursts with line diffs
+    quantities.clear()
+    manager.clear_items()
+    sink = HeadlessSink()
+    refresher = SummaryRefresher(manager, sink, lambda: (0, 0), lambda i: quantities.get(i, 0))
+    started = time.perf_counter()
+    for index, (item_id, qty) in enumerate(edits, 1):
+        quantities[item_id] = qty
+        refresher.request(item_id)
+        if index % burst == 0:
+            refresher.flush()
+    refresher.flush()
+    diff_seconds = time.perf_counter() - started
+
+    assert sink.lines == full.lines
+    return {
+        "changes": changes,
+        "burst": burst,
+        "full_seconds": full_seconds,
+        "full_lines_written": full.lines_written,
+        "coalesced_seconds": diff_seconds,
+        "coalesced_refreshes": refresher.refreshes,
+        "coalesced_lines_written": sink.lines_written,
+    }
+
+
+# --------------------------- Command Line --------------------------- #
+def main():
+    parser = argparse.ArgumentParser(description="Measure order summary refresh cost headlessly")
+    parser.add_argument("--changes", type=int, default=5000, help="quantity edits to simulate")
+    parser.add_argument("--burst", type=int, default=5, help="edits coalesced into one refresh")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = JsonFileStorage(
+            counter_path=os.path.join(tmp, "order_counter.json"),
+            history=OrderHistoryLog(os.path.join(tmp, "order_history.jsonl"), legacy_path=None),
+            bill_dir=tmp)
+        result = measure_refresh(RestaurantManager(storage), args.changes, args.burst)
+        storage.close()
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
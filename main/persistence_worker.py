@@ -0,0 +1,170 @@
+# ====================================================================== #
+#                     Write-Behind Persistence Worker                    #
+#       Background saving with group commit for a responsive UI          #
+# ====================================================================== #
+
+import queue
+import threading
+
+from storage import BillSaveError
+
+
+# --------------------------- Queued Job --------------------------- #
+class _Job:
+    """One unit of queued work and the callbacks waiting on it."""
+
+    __slots__ = ("kind", "payload", "on_done", "on_error")
+
+    def __init__(self, kind, payload, on_done=None, on_error=None):
+        self.kind = kind
+        self.payload = payload
+        self.on_done = on_done
+        self.on_error = on_error
+
+
+# --------------------------- Persistence Worker --------------------------- #
+class PersistenceWorker:
+    """Save bills and order history on a background thread.
+
+    Jobs run in the order they were queued. Pending saves are drained in
+    batches and written together, so one fsync makes the whole batch
+    durable (group commit). A save's ``on_done`` callback only runs after
+    its bill and history entry are on disk.
+
+    History is written before bills. When only the bills fail the save
+    reports the error, but the worker remembers the order numbers already
+    in history: saving the same order again writes just its bill, so a
+    retry never duplicates history.
+
+    Callbacks never run on the worker thread: they are queued and delivered
+    by poll(), which attach() schedules with ``root.after`` so Tk widgets
+    are only touched from the main loop.
+    """
+
+    def __init__(self, manager, max_batch=64):
+        self.manager = manager
+        self.max_batch = max(1, int(max_batch))
+        self._jobs = queue.Queue()
+        self._results = queue.Queue()
+        self._closed = False
+        self._recorded = set()
+        self._thread = threading.Thread(target=self._run, name="persistence-worker", daemon=True)
+        self._thread.start()
+
+    # --------------------------- Queueing --------------------------- #
+    def save_order(self, order_number, bill_content, entry, on_done=None, on_error=None):
+        """Queue a bill and its history entry; ``on_done(location)`` runs once both are durable."""
+        self._put(_Job("save", (order_number, bill_content, entry), on_done, on_error))
+
+    def call(self, fn, *args, on_done=None, on_error=None):
+        """Run ``fn(*args)`` on the worker thread; ``on_done(result)`` gets its return value."""
+        self._put(_Job("call", (fn, args), on_done, on_error))
+
+    def _put(self, job):
+        if self._closed:
+            raise RuntimeError("Persistence worker is closed")
+        self._jobs.put(job)
+
+    def pending(self):
+        """Return the number of queued or running jobs."""
+        return self._jobs.unfinished_tasks
+
+    # --------------------------- Worker Thread --------------------------- #
+    def _run(self):
+        while True:
+            batch = [self._jobs.get()]
+            while batch[-1] is not None and len(batch) < self.max_batch:
+                try:
+                    batch.append(self._jobs.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = batch[-1] is None
+            if stop:
+                batch.pop()
+            self._process(batch)
+            if stop:
+                self._jobs.task_done()
+                return
+
+    def _process(self, batch):
+        saves = []
+        for job in batch:
+            if job.kind == "save":
+                saves.append(job)
+                continue
+            # Keep queue order: commit earlier saves before running a call
+            self._commit(saves)
+            saves = []
+            fn, args = job.payload
+            try:
+                result = fn(*args)
+            except Exception as exc:
+                self._finish(job, error=exc)
+            else:
+                self._finish(job, result)
+        self._commit(saves)
+
+    def _commit(self, saves):
+        """Write a run of saves with one durable flush per store."""
+        if not saves:
+            return
+        bills = [(number, bill) for number, bill, _ in (job.payload for job in saves)]
+        # Orders whose history was written by an earlier attempt only need their bill
+        entries = [entry for number, _, entry in (job.payload for job in saves)
+                   if number not in self._recorded]
+        try:
+            locations = self.manager.save_orders(entries, bills, sync=True)
+        except BillSaveError as exc:
+            self._recorded.update(entry["order_number"] for entry in entries)
+            for job in saves:
+                self._finish(job, error=exc)
+        except Exception as exc:
+            for job in saves:
+                self._finish(job, error=exc)
+        else:
+            self._recorded.difference_update(number for number, _ in bills)
+            for job, location in zip(saves, locations):
+                self._finish(job, location)
+
+    def _finish(self, job, result=None, error=None):
+        if error is not None:
+            if job.on_error is not None:
+                self._results.put((job.on_error, error))
+        elif job.on_done is not None:
+            self._results.put((job.on_done, result))
+        self._jobs.task_done()
+
+    # --------------------------- Delivery --------------------------- #
+    def poll(self):
+        """Run callbacks for finished jobs on the calling thread; returns how many ran."""
+        count = 0
+        while True:
+            try:
+                callback, value = self._results.get_nowait()
+            except queue.Empty:
+                return count
+            callback(value)
+            count += 1
+
+    def attach(self, root, interval=50):
+        """Deliver callbacks on the Tk main loop every ``interval`` milliseconds."""
+        def tick():
+            self.poll()
+            if not self._closed or self.pending():
+                root.after(interval, tick)
+        root.after(interval, tick)
+
+    def wait(self):
+        """Block until every queued job has finished, then deliver callbacks."""
+        self._jobs.join()
+        self.poll()
+
+    def close(self):
+        """Finish pending writes and stop the worker thread."""
+        if self._closed:
+            return
+        self._closed = True
+        self._jobs.put(None)
+        self._thread.join()
+        self.poll()
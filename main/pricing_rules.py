@@ -0,0 +1,646 @@
+# ====================================================================== #
+#                         Compiled Pricing Rules                         #
+#   Combos, happy hours, buy-X-get-Y & category tax, memoized per order  #
+# ====================================================================== #
+
+import argparse
+import datetime
+import json
+import os
+import random
+import time
+
+
+# --------------------------- Rules Location --------------------------- #
+# Shipped next to this module like menu.json; POS_PRICING points elsewhere
+PRICING_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pricing_rules.json")
+
+# Tax rate of every category without a tax rule (the long-standing 5%)
+DEFAULT_TAX_RATE = 5
+
+# Rule types, in the order they claim units of an order
+RULE_TYPES = ("combo", "buy_x_get_y", "happy_hour", "tax")
+WEEKDAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+
+# Memoized cluster results kept before the memo is cleared
+MEMO_SIZE = 4096
+
+_NO_RESULT = ((), {})
+
+
+# --------------------------- Amounts --------------------------- #
+def adjusted_amounts(subtotal, tip=0, discount=0, promotions=(), taxes=None):
+    """Apply promotions, discount, tax and tip to a subtotal.
+
+    ``promotions`` holds (label, amount) credits taken off before the
+    discount percentage; ``taxes`` holds (rate, amount) pairs, or None for
+    the flat 5% on the discounted subtotal. Without either the result is
+    exactly that of compute_amounts.
+    """
+    promotion_amount = sum(amount for _, amount in promotions)
+    priced_subtotal = subtotal - promotion_amount
+    discount_amount = (priced_subtotal * discount) / 100
+    discounted_subtotal = priced_subtotal - discount_amount
+    if taxes is None:
+        tax_amount = (discounted_subtotal * DEFAULT_TAX_RATE) / 100
+    else:
+        tax_amount = sum(amount for _, amount in taxes)
+    total = discounted_subtotal + tax_amount + tip
+
+    amounts = {
+        'subtotal': subtotal,
+        'discount_amount': discount_amount,
+        'discounted_subtotal': discounted_subtotal,
+        'tax_amount': tax_amount,
+        'tip': tip,
+        'total': total
+    }
+    if promotions:
+        amounts['promotions'] = [tuple(promotion) for promotion in promotions]
+        amounts['promotion_amount'] = promotion_amount
+    if taxes is not None:
+        amounts['taxes'] = [tuple(tax) for tax in taxes]
+    return amounts
+
+
+def record_adjustments(entry, amounts):
+    """Copy the promotions and tax breakdown of ``amounts`` into a history entry."""
+    if amounts.get('promotions'):
+        entry["promotions"] = [[label, amount] for label, amount in amounts['promotions']]
+    if 'taxes' in amounts:
+        entry["taxes"] = [[rate, amount] for rate, amount in amounts['taxes']]
+    return entry
+
+
+# --------------------------- Rule Definitions --------------------------- #
+def _clock(value, position):
+    """Parse "HH:MM" into minutes after midnight."""
+    try:
+        hours, minutes = str(value).split(":")
+        minutes = int(hours) * 60 + int(minutes)
+    except ValueError:
+        raise ValueError(f"Rule {position}: bad time {value!r} (expected HH:MM)") from None
+    if not 0 <= minutes <= 24 * 60:
+        raise ValueError(f"Rule {position}: bad time {value!r} (expected HH:MM)")
+    return minutes
+
+
+def _positive(raw, field, position, default=None):
+    value = raw.get(field, default)
+    if not isinstance(value, (int, float)) or isinstance(value, bool) or value <= 0:
+        raise ValueError(f"Rule {position}: '{field}' must be a positive number")
+    return value
+
+
+def _parse_rule(raw, position):
+    """Validate one rule definition and return it in normalized form."""
+    kind = raw.get("type")
+    if kind not in RULE_TYPES:
+        raise ValueError(f"Rule {position}: unknown type {kind!r} (expected one of "
+                         f"{', '.join(RULE_TYPES)})")
+    rule = {"type": kind, "name": str(raw.get("name") or f"{kind.replace('_', ' ').title()} #{position}")}
+
+    if kind == "combo":
+        items = raw.get("items")
+        if isinstance(items, list):
+            items = {ref: 1 for ref in items}
+        if not isinstance(items, dict) or not items:
+            raise ValueError(f"Rule {position}: a combo needs 'items'")
+        rule["items"] = [(ref, int(count)) for ref, count in items.items()]
+        if any(count < 1 for _, count in rule["items"]):
+            raise ValueError(f"Rule {position}: combo item counts must be at least 1")
+        rule["price"] = raw.get("price")
+        if not isinstance(rule["price"], (int, float)) or rule["price"] < 0:
+            raise ValueError(f"Rule {position}: a combo needs a 'price'")
+    elif kind == "buy_x_get_y":
+        if "item" not in raw:
+            raise ValueError(f"Rule {position}: buy_x_get_y needs an 'item'")
+        rule["item"] = raw["item"]
+        rule["free_item"] = raw.get("free_item", raw["item"])
+        rule["buy"] = int(_positive(raw, "buy", position))
+        rule["get"] = int(_positive(raw, "get", position, 1))
+    elif kind == "happy_hour":
+        if "category" not in raw and "items" not in raw:
+            raise ValueError(f"Rule {position}: happy_hour needs a 'category' or 'items'")
+        rule["category"] = raw.get("category")
+        rule["items"] = list(raw.get("items", ()))
+        rule["percent"] = _positive(raw, "percent", position)
+        if rule["percent"] > 100:
+            raise ValueError(f"Rule {position}: 'percent' must be at most 100")
+    else:
+        if "category" not in raw or not isinstance(raw.get("rate"), (int, float)) or raw["rate"] < 0:
+            raise ValueError(f"Rule {position}: a tax rule needs a 'category' and a 'rate'")
+        rule["category"] = raw["category"]
+        rule["rate"] = raw["rate"]
+
+    if "start" in raw or "end" in raw or "days" in raw:
+        if kind == "tax":
+            raise ValueError(f"Rule {position}: tax rules cannot have a time window")
+        start = _clock(raw.get("start", "00:00"), position)
+        end = _clock(raw.get("end", "24:00"), position)
+        days = raw.get("days", WEEKDAYS)
+        try:
+            days = frozenset(day if isinstance(day, int) else WEEKDAYS.index(str(day).lower()[:3])
+                             for day in days)
+        except ValueError:
+            raise ValueError(f"Rule {position}: bad 'days' {raw.get('days')!r}") from None
+        rule["window"] = (start, end, days)
+    return rule
+
+
+class PricingRules:
+    """Promotion and tax rule definitions, independent of any menu version.
+
+    Rules are plain dicts (usually from ``pricing_rules.json``)::
+
+        {"type": "combo", "name": "Biryani Deal", "price": 360,
+         "items": {"🍛 Main Course:🍛 Chicken Biryani": 1, "🥤 Beverages:🥤 Coca Cola": 1}}
+        {"type": "happy_hour", "category": "🥤 Beverages", "percent": 20,
+         "start": "16:00", "end": "19:00", "days": ["mon", "tue"]}
+        {"type": "buy_x_get_y", "item": "🥖 Breads & Sides:🥖 Butter Naan", "buy": 2, "get": 1}
+        {"type": "tax", "category": "🥤 Beverages", "rate": 16}
+
+    Items are named by id, "category:item" key or shortcode; categories by
+    name, with or without the emoji. Any promotion may carry a start/end
+    time and weekdays. compile() resolves them against a menu index.
+    """
+
+    def __init__(self, rules=()):
+        self.rules = [_parse_rule(rule, position) for position, rule in enumerate(rules, 1)]
+
+    @classmethod
+    def load(cls, path=PRICING_PATH):
+        """Read rules from a JSON file holding a list or {"rules": [...]}."""
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data.get("rules", []) if isinstance(data, dict) else data)
+
+    def __len__(self):
+        return len(self.rules)
+
+    def compile(self, menu_index):
+        """Return a PricingPlan of these rules for ``menu_index``."""
+        return PricingPlan(self.rules, menu_index)
+
+
+def load_pricing(path=None, environ=os.environ):
+    """Return the PricingRules in use, or None when there are no rules.
+
+    ``POS_PRICING`` overrides the rules file next to this module.
+    """
+    path = path or environ.get("POS_PRICING") or PRICING_PATH
+    if not os.path.exists(path):
+        return None
+    rules = PricingRules.load(path)
+    return rules if len(rules) else None
+
+
+# --------------------------- Compiled Rules --------------------------- #
+class _Rule:
+    """One promotion resolved to menu item ids."""
+
+    __slots__ = ("index", "kind", "name", "window", "items", "rank", "parts", "price",
+                 "list_price", "item", "free_item", "buy", "get", "percent")
+
+    def __init__(self, index, kind, name, window, items):
+        self.index = index
+        self.kind = kind
+        self.name = name
+        self.window = window
+        self.items = items
+        self.rank = 0
+
+    def active(self, minute, weekday):
+        start, end, days = self.window
+        if start <= end:
+            return weekday in days and start <= minute < end
+        # Windows past midnight belong to the day they start on
+        if minute >= start:
+            return weekday in days
+        return (weekday - 1) % 7 in days and minute < end
+
+
+def _category_ids(menu_index, name):
+    """Return the item ids of a category named with or without its emoji."""
+    ids = menu_index.categories.get(name)
+    if ids is None:
+        for category, category_ids in menu_index.categories.items():
+            if category.split(" ", 1)[-1] == name:
+                return category_ids
+    return ids
+
+
+def _item_id(menu_index, ref):
+    """Return the item id of an id, "category:item" key or shortcode reference."""
+    if isinstance(ref, int):
+        record = menu_index.get(ref)
+    else:
+        record = menu_index.by_key.get(ref) or menu_index.by_code.get(ref)
+    return record.item_id if record is not None else None
+
+
+# --------------------------- Pricing Plan --------------------------- #
+class PricingPlan:
+    """Rules compiled against one menu index.
+
+    Promotions that share a menu item (directly or through other rules)
+    form a cluster; every item maps to at most one cluster. A cluster is
+    evaluated on its own, with combos, then buy-X-get-Y, then happy hours
+    claiming the units they discount, so each unit gets one promotion at
+    most, and only rules indexed under the ordered items are looked at.
+    Results are memoized by the cluster's order signature (its
+    item quantities and the rules out of their time window), so a
+    PricingSession only re-evaluates the clusters of items that changed.
+    Tax rules become a per-item rate table applied after all discounts.
+    """
+
+    def __init__(self, rules, menu_index):
+        self.menu_index = menu_index
+        self.prices = menu_index.prices()
+        self.tax_rates = {}
+        self.rules = []
+        self.skipped = []
+
+        for index, definition in enumerate(rules):
+            if definition["type"] == "tax":
+                ids = _category_ids(menu_index, definition["category"])
+                if ids is None:
+                    self.skipped.append(definition["name"])
+                for item_id in ids or ():
+                    self.tax_rates[item_id] = definition["rate"]
+                continue
+            rule = self._compile_rule(index, definition)
+            if rule is None:
+                self.skipped.append(definition["name"])
+            else:
+                self.rules.append(rule)
+
+        self._cluster()
+        self.memo = {}
+        self._clock = None
+        self._inactive = frozenset()
+
+    def _compile_rule(self, index, definition):
+        """Resolve one promotion to item ids; None if it names nothing on this menu."""
+        kind = definition["type"]
+        menu_index = self.menu_index
+
+        if kind == "combo":
+            parts = tuple((_item_id(menu_index, ref), count) for ref, count in definition["items"])
+            if any(item_id is None for item_id, _ in parts):
+                return None
+            rule = _Rule(index, kind, definition["name"], definition.get("window"),
+                         tuple(item_id for item_id, _ in parts))
+            rule.parts = parts
+            rule.price = definition["price"]
+            rule.list_price = sum(self.prices[item_id] * count for item_id, count in parts)
+            if rule.list_price <= rule.price:
+                return None
+        elif kind == "buy_x_get_y":
+            item_id = _item_id(menu_index, definition["item"])
+            free_item = _item_id(menu_index, definition["free_item"])
+            if item_id is None or free_item is None:
+                return None
+            rule = _Rule(index, kind, definition["name"], definition.get("window"),
+                         tuple({item_id, free_item}))
+            rule.item = item_id
+            rule.free_item = free_item
+            rule.buy = definition["buy"]
+            rule.get = definition["get"]
+        else:
+            ids = set(_category_ids(menu_index, definition["category"]) or ()) \
+                if definition["category"] is not None else set()
+            ids.update(item_id for item_id in (_item_id(menu_index, ref) for ref in definition["items"])
+                       if item_id is not None)
+            if not ids:
+                return None
+            rule = _Rule(index, kind, definition["name"], definition.get("window"),
+                         tuple(sorted(ids)))
+            rule.percent = definition["percent"]
+        return rule
+
+    def _cluster(self):
+        """Group promotions that share items and index them by item id."""
+        parent = {}
+
+        def find(item_id):
+            while parent[item_id] != item_id:
+                parent[item_id] = parent[parent[item_id]]
+                item_id = parent[item_id]
+            return item_id
+
+        for rule in self.rules:
+            for item_id in rule.items:
+                parent.setdefault(item_id, item_id)
+            root = find(rule.items[0])
+            for item_id in rule.items[1:]:
+                parent[find(item_id)] = root
+
+        roots = {}
+        self.cluster_of = {}
+        self.cluster_items = []
+        self.cluster_rules = []
+        self.cluster_windows = []
+        for item_id in sorted(parent):
+            root = find(item_id)
+            if root not in roots:
+                roots[root] = len(self.cluster_items)
+                self.cluster_items.append([])
+                self.cluster_rules.append([])
+                self.cluster_windows.append([])
+            cluster = roots[root]
+            self.cluster_of[item_id] = cluster
+            self.cluster_items[cluster].append(item_id)
+
+        self.rules_by_item = {}
+        ordered = sorted(self.rules, key=lambda r: (RULE_TYPES.index(r.kind), r.index))
+        for rank, rule in enumerate(ordered):
+            rule.rank = rank
+            for item_id in rule.items:
+                self.rules_by_item.setdefault(item_id, []).append(rule)
+            cluster = self.cluster_of[rule.items[0]]
+            self.cluster_rules[cluster].append(rule)
+            if rule.window is not None:
+                self.cluster_windows[cluster].append(rule)
+        self.windowed_clusters = {cluster for cluster, rules in enumerate(self.cluster_windows)
+                                  if rules}
+
+    # --------------------------- Evaluation --------------------------- #
+    def inactive(self, now=None):
+        """Return the indexes of promotions outside their time window (cached per minute)."""
+        now = now or datetime.datetime.now()
+        clock = (now.date(), now.hour, now.minute)
+        if clock != self._clock:
+            minute = now.hour * 60 + now.minute
+            weekday = now.weekday()
+            inactive = frozenset(rule.index for rules in self.cluster_windows for rule in rules
+                                 if not rule.active(minute, weekday))
+            if inactive != self._inactive:
+                self._inactive = inactive
+            self._clock = clock
+        return self._inactive
+
+    def evaluate_cluster(self, cluster, order, inactive):
+        """Return (promotions, reductions) of one cluster for an {item_id: quantity} order.
+
+        Promotions are (rule index, label, amount) tuples; reductions map
+        item ids to the amount taken off their lines (used for tax).
+        """
+        signature = tuple((item_id, order[item_id]) for item_id in self.cluster_items[cluster]
+                          if order.get(item_id))
+        if not signature:
+            return _NO_RESULT
+        off = tuple(rule.index for rule in self.cluster_windows[cluster] if rule.index in inactive)
+        key = (cluster, signature, off)
+        result = self.memo.get(key)
+        if result is None:
+            # Only rules on items actually in the order can apply
+            rules_by_item = self.rules_by_item
+            rules = {rule for item_id, _ in signature for rule in rules_by_item[item_id]}
+            result = self._apply(sorted(rules, key=lambda r: r.rank), dict(signature), inactive)
+            if len(self.memo) >= MEMO_SIZE:
+                self.memo.clear()
+            self.memo[key] = result
+        return result
+
+    def _apply(self, rules, remaining, inactive):
+        prices = self.prices
+        promotions = []
+        reductions = {}
+        for rule in rules:
+            if rule.index in inactive:
+                continue
+            kind = rule.kind
+            if kind == "combo":
+                times = min(remaining.get(item_id, 0) // count for item_id, count in rule.parts)
+                if not times:
+                    continue
+                saving = (rule.list_price - rule.price) * times
+                for item_id, count in rule.parts:
+                    remaining[item_id] -= count * times
+                    reductions[item_id] = (reductions.get(item_id, 0)
+                                           + saving * prices[item_id] * count / rule.list_price)
+                label = rule.name if times == 1 else f"{rule.name} x{times}"
+            elif kind == "buy_x_get_y":
+                if rule.item == rule.free_item:
+                    times = remaining.get(rule.item, 0) // (rule.buy + rule.get)
+                    free = times * rule.get
+                    remaining[rule.item] = remaining.get(rule.item, 0) - times * (rule.buy + rule.get)
+                else:
+                    free = min(remaining.get(rule.item, 0) // rule.buy * rule.get,
+                               remaining.get(rule.free_item, 0))
+                    if free:
+                        remaining[rule.item] -= -(-free // rule.get) * rule.buy
+                        remaining[rule.free_item] -= free
+                if not free:
+                    continue
+                saving = free * prices[rule.free_item]
+                reductions[rule.free_item] = reductions.get(rule.free_item, 0) + saving
+                label = f"{rule.name} ({free} free)"
+            else:
+                saving = 0
+                for item_id in rule.items:
+                    qty = remaining.get(item_id)
+                    if qty:
+                        amount = prices[item_id] * qty * rule.percent / 100
+                        saving += amount
+                        reductions[item_id] = reductions.get(item_id, 0) + amount
+                        remaining[item_id] = 0
+                if not saving:
+                    continue
+                label = rule.name
+            promotions.append((rule.index, label, saving))
+        return tuple(promotions), reductions
+
+    def evaluate(self, order, now=None):
+        """Return the (promotions, reductions) results of every cluster ``order`` touches."""
+        inactive = self.inactive(now)
+        clusters = {self.cluster_of[item_id] for item_id in order if item_id in self.cluster_of}
+        return [self.evaluate_cluster(cluster, order, inactive) for cluster in clusters]
+
+    def price(self, order, subtotal, tip, discount, results):
+        """Turn cluster results into a calculate_total amounts dict."""
+        promotions = [(label, amount) for _, label, amount
+                      in sorted(p for result in results for p in result[0])]
+        taxes = None
+        if self.tax_rates:
+            reductions = {}
+            for result in results:
+                for item_id, amount in result[1].items():
+                    reductions[item_id] = reductions.get(item_id, 0) + amount
+            rates = self.tax_rates
+            prices = self.prices
+            bases = {}
+            for item_id, qty in order.items():
+                rate = rates.get(item_id, DEFAULT_TAX_RATE)
+                bases[rate] = bases.get(rate, 0) + prices[item_id] * qty - reductions.get(item_id, 0)
+            taxes = [(rate, ((base - (base * discount) / 100) * rate) / 100)
+                     for rate, base in sorted(bases.items())]
+        return adjusted_amounts(subtotal, tip, discount, promotions, taxes)
+
+    def amounts(self, order, subtotal, tip=0, discount=0, now=None):
+        """Price an {item_id: quantity} order from scratch (memoized per cluster)."""
+        return self.price(order, subtotal, tip, discount, self.evaluate(order, now))
+
+    def session(self):
+        """Return a PricingSession for one live order."""
+        return PricingSession(self)
+
+
+# --------------------------- Live Order Session --------------------------- #
+class PricingSession:
+    """Incremental pricing of the order being rung up.
+
+    The manager calls touch() for every changed item; amounts() then
+    re-evaluates only the clusters of touched items (and of time-windowed
+    rules when a window opens or closes) and reuses the rest.
+    """
+
+    def __init__(self, plan):
+        self.plan = plan
+        self.results = {}
+        self.dirty = set()
+        self._inactive = frozenset()
+        self._cache = None
+
+    def touch(self, item_id):
+        """Note a quantity change of ``item_id``."""
+        cluster = self.plan.cluster_of.get(item_id)
+        if cluster is not None:
+            self.dirty.add(cluster)
+        self._cache = None
+
+    def reset(self):
+        """Forget the previous order."""
+        self.results.clear()
+        self.dirty.clear()
+        self._cache = None
+
+    def amounts(self, order, subtotal, tip=0, discount=0, now=None):
+        """Return calculate_total amounts for the live order."""
+        plan = self.plan
+        inactive = plan.inactive(now)
+        if inactive is not self._inactive:
+            self._inactive = inactive
+            self.dirty |= plan.windowed_clusters
+            self._cache = None
+
+        cache = self._cache
+        if cache is not None and cache[0] == tip and cache[1] == discount:
+            return dict(cache[2])
+
+        results = self.results
+        for cluster in self.dirty:
+            result = plan.evaluate_cluster(cluster, order, inactive)
+            if result[0]:
+                results[cluster] = result
+            else:
+                results.pop(cluster, None)
+        self.dirty.clear()
+
+        amounts = plan.price(order, subtotal, tip, discount, list(results.values()))
+        self._cache = (tip, discount, amounts)
+        return dict(amounts)
+
+
+# --------------------------- Command Line --------------------------- #
+def random_rules(menu_index, count, rng):
+    """Generate ``count`` plausible rules over a menu (for the benchmark)."""
+    records = list(menu_index)
+    categories = list(menu_index.categories)
+    rules = []
+    for position in range(count):
+        kind = rng.choice(RULE_TYPES[:3])
+        if kind == "combo":
+            parts = rng.sample(records, rng.randint(2, 3))
+            price = sum(record.price for record in parts) * rng.uniform(0.7, 0.95)
+            rules.append({"type": kind, "name": f"Combo {position}", "price": round(price),
+                          "items": {record.key: 1 for record in parts}})
+        elif kind == "buy_x_get_y":
+            rules.append({"type": kind, "name": f"Offer {position}",
+                          "item": rng.choice(records).key, "buy": rng.randint(2, 4), "get": 1})
+        else:
+            start = rng.randrange(0, 22 * 60, 30)
+            rules.append({"type": kind, "name": f"Happy Hour {position}",
+                          "category": rng.choice(categories), "percent": rng.choice((10, 15, 20)),
+                          "start": f"{start // 60:02d}:{start % 60:02d}",
+                          "end": f"{(start + 120) // 60:02d}:{(start + 120) % 60:02d}"})
+    rules.append({"type": "tax", "category": rng.choice(categories), "rate": 16})
+    return rules
+
+
+def benchmark(menu_index, rule_count=500, orders=2000, lines=8, seed=7):
+    """Time live checkouts and from-scratch pricing with ``rule_count`` rules."""
+    rng = random.Random(seed)
+    plan = PricingRules(random_rules(menu_index, rule_count, rng)).compile(menu_index)
+    ids = [record.item_id for record in menu_index]
+    prices = plan.prices
+    session = plan.session()
+
+    timings = {"checkout": [], "change_and_checkout": [], "from_scratch": []}
+    for _ in range(orders):
+        order = {}
+        session.reset()
+        for item_id in rng.sample(ids, min(lines, len(ids))):
+            order[item_id] = rng.randint(1, 4)
+            session.touch(item_id)
+        subtotal = sum(prices[item_id] * qty for item_id, qty in order.items())
+
+        started = time.perf_counter()
+        session.amounts(order, subtotal, 0, 10)
+        timings["checkout"].append(time.perf_counter() - started)
+
+        item_id = rng.choice(ids)
+        order[item_id] = order.get(item_id, 0) + 1
+        subtotal += prices[item_id]
+        started = time.perf_counter()
+        session.touch(item_id)
+        session.amounts(order, subtotal, 0, 10)
+        timings["change_and_checkout"].append(time.perf_counter() - started)
+
+        plan.memo.clear()
+        started = time.perf_counter()
+        plan.amounts(order, subtotal, 0, 10)
+        timings["from_scratch"].append(time.perf_counter() - started)
+
+    results = {}
+    for name, values in timings.items():
+        values.sort()
+        results[name] = {"p50_ms": values[len(values) // 2] * 1000,
+                         "p99_ms": values[int(len(values) * 0.99)] * 1000}
+    return plan, results
+
+
+def main():
+    from restaurant_backend import load_menu_index
+
+    parser = argparse.ArgumentParser(description="Pak Cuisine pricing rules")
+    sub = parser.add_subparsers(dest="command", required=True)
+    check = sub.add_parser("check", help="validate a rules file against the menu")
+    check.add_argument("--rules", default=None, help="rules file (default: pricing_rules.json)")
+    bench = sub.add_parser("bench", help="time checkout pricing with many generated rules")
+    bench.add_argument("--rules", type=int, default=500)
+    bench.add_argument("--orders", type=int, default=2000)
+    bench.add_argument("--lines", type=int, default=8)
+    args = parser.parse_args()
+
+    menu_index = load_menu_index()
+    if args.command == "check":
+        rules = load_pricing(args.rules)
+        if rules is None:
+            print("No pricing rules; bills use the flat 5% tax")
+            return
+        plan = rules.compile(menu_index)
+        print(f"{len(rules)} rules: {len(plan.rules)} promotions in "
+              f"{len(plan.cluster_items)} clusters, {len(plan.tax_rates)} items with category tax")
+        for name in plan.skipped:
+            print(f"  skipped (not on this menu, or no saving): {name}")
+    else:
+        plan, results = benchmark(menu_index, args.rules, args.orders, args.lines)
+        print(f"{len(plan.rules)} promotions in {len(plan.cluster_items)} clusters")
+        for name, result in results.items():
+            print(f"  {name:<22} p50 {result['p50_ms']:.3f} ms   p99 {result['p99_ms']:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
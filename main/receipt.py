@@ -0,0 +1,75 @@
+# ====================================================================== #
+#                        Compiled Receipt Template                       #
+#         Static bill text built once; only order data is rendered       #
+# ====================================================================== #
+
+
+# --------------------------- Receipt Template --------------------------- #
+class ReceiptTemplate:
+    """Receipt layout with all static text and line formats prepared up front.
+
+    ``render`` only formats the order-specific parts (number, timestamp,
+    customer, item lines and amounts) and joins them with the prebuilt
+    header and footer blocks.
+    """
+
+    def __init__(self, name="🌟 PAK CUISINE RESTAURANT 🌟", tagline="Premium Pakistani Cuisine",
+                 contact="Contact: +92-21-1234567 | www.pakcuisine.pk", width=50):
+        double = "═" * width
+        single = "─" * width
+
+        # --------------------------- Static Blocks --------------------------- #
+        self.header = "\n".join([double, f"        {name}", f"          {tagline}", double])
+        self.columns = "\n".join([single, f"{'ITEM':<25} {'QTY':<5} {'PRICE':<8} {'TOTAL':<10}",
+                                  single])
+        self.footer = "\n".join([
+            double,
+            "        🍴 Thank You for Dining With Us! 🍴",
+            "           Please Visit Again Soon ❤️",
+            double,
+            "",
+            contact,
+        ])
+        self.rule = single
+
+        # --------------------------- Precompiled Formats --------------------------- #
+        self.item_line = "{:<25} {:<5} Rs.{:<6} Rs.{:<8}".format
+        self.amount_line = "{:<35} Rs.{:.2f}".format
+        self.credit_line = "{:<35} -Rs.{:.2f}".format
+        self.timestamp_format = "Date: %d/%m/%Y\nTime: %H:%M:%S"
+
+    def render(self, order_number, timestamp, lines, amounts, tip=0, discount=0, customer_name=""):
+        """Render one receipt.
+
+        ``lines`` holds (receipt name, quantity, unit price) tuples in print
+        order and ``amounts`` is a calculate_total result.
+        """
+        item_line = self.item_line
+        amount_line = self.amount_line
+
+        parts = [self.header, f"Order #: {order_number:04d}", timestamp.strftime(self.timestamp_format)]
+        if customer_name:
+            parts.append(f"Customer: {customer_name}")
+        parts.append(self.columns)
+        parts.extend(item_line(name, qty, price, price * qty) for name, qty, price in lines)
+        parts.append(self.rule)
+        parts.append(amount_line("Subtotal:", amounts['subtotal']))
+        for label, amount in amounts.get('promotions', ()):
+            parts.append(self.credit_line(f"{label}:", amount))
+        if discount > 0:
+            parts.append(self.credit_line(f"Discount ({discount}%):", amounts['discount_amount']))
+            parts.append(amount_line("After Discount:", amounts['discounted_subtotal']))
+        if 'taxes' in amounts:
+            parts.extend(amount_line(f"Tax ({rate:g}%):", amount) for rate, amount in amounts['taxes'])
+        else:
+            parts.append(amount_line("Tax (5%):", amounts['tax_amount']))
+        if tip > 0:
+            parts.append(amount_line("Tip:", tip))
+        parts.append(self.rule)
+        parts.append(amount_line("TOTAL:", amounts['total']))
+        parts.append(self.footer)
+        return "\n".join(parts)
+
+
+# Shared default layout used by the backend
+DEFAULT_RECEIPT = ReceiptTemplate()
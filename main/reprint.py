@@ -0,0 +1,48 @@
+# ====================================================================== #
+#                          Bulk Bill Reprinting                          #
+#        Render saved orders back into receipts from history data        #
+# ====================================================================== #
+
+import argparse
+import sys
+
+from restaurant_backend import load_menu_index, reprint_bills
+from storage import open_storage
+
+
+# --------------------------- Command Line --------------------------- #
+def main():
+    parser = argparse.ArgumentParser(description="Reprint saved bills from order history")
+    parser.add_argument("--storage", default="json",
+                        help="storage spec, e.g. json or sqlite:restaurant.db")
+    parser.add_argument("--order", type=int, action="append",
+                        help="order number to reprint (repeatable)")
+    parser.add_argument("--start", help="first date to include (YYYY-MM-DD)")
+    parser.add_argument("--end", help="day after the last date to include (YYYY-MM-DD)")
+    parser.add_argument("--out", help="write all receipts to this file instead of stdout")
+    args = parser.parse_args()
+
+    storage = open_storage(args.storage)
+    if args.order:
+        entries = [entry for entry in map(storage.get_order, args.order) if entry is not None]
+    elif args.start or args.end:
+        entries = storage.find_orders(start=args.start, end=args.end)
+    else:
+        entries = storage.iter_orders()
+
+    # One pass over the selected orders, streaming receipts to the output
+    out = open(args.out, "w", encoding="utf-8") if args.out else sys.stdout
+    count = 0
+    try:
+        for _, bill in reprint_bills(entries, load_menu_index()):
+            out.write(bill)
+            out.write("\n\n")
+            count += 1
+    finally:
+        if args.out:
+            out.close()
+    print(f"Reprinted {count} bills", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
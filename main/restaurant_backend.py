@@ -4,8 +4,161 @@
 # ====================================================================== #
 
 import datetime
-import json
-import os
+import logging
+
+from menu_catalog import MenuCatalog
+from menu_search import MenuSearchIndex
+from pricing_rules import DEFAULT_TAX_RATE, adjusted_amounts, record_adjustments
+from receipt import DEFAULT_RECEIPT
+from storage import BillSaveError, JsonFileStorage
+
+log = logging.getLogger(__name__)
+
+
+# --------------------------- Default Menu --------------------------- #
+# Built-in menu, used only when the menu.json catalog is missing
+DEFAULT_MENU = {
+    "🥗 Starters": {
+        "🥟 Chicken Samosa": 80,
+        "🥟 Vegetable Samosa": 60,
+        "🍗 Seekh Kebab": 180,
+        "🍗 Chicken Tikka": 220,
+        "🍵 Mixed Pakora": 100,
+        "🧅 Onion Bhaji": 90,
+        "🌶️ Chili Chicken": 250
+    },
+    "🍛 Main Course": {
+        "🍛 Chicken Biryani": 320,
+        "🥘 Beef Biryani": 380,
+        "🍛 Mutton Biryani": 450,
+        "🍛 Vegetable Biryani": 280,
+        "🍲 Chicken Karahi": 650,
+        "🍲 Beef Karahi": 750,
+        "🍲 Mutton Karahi": 850,
+        "🍲 Haleem": 250,
+        "🍲 Nihari": 400,
+        "🍗 Butter Chicken": 550,
+        "🥘 Dal Makhani": 300
+    },
+    "🥖 Breads & Sides": {
+        "🥖 Butter Naan": 50,
+        "🥖 Garlic Naan": 60,
+        "🥞 Plain Paratha": 40,
+        "🥞 Aloo Paratha": 80,
+        "🍚 Plain Rice": 60,
+        "🥗 Fresh Salad": 90,
+        "🥣 Raita": 50,
+        "🧅 Pickled Onions": 30
+    },
+    "🥤 Beverages": {
+        "🥤 Coca Cola": 80,
+        "🥤 Sprite": 80,
+        "💧 Mineral Water": 50,
+        "☕ Kashmiri Chai": 70,
+        "☕ Green Tea": 60,
+        "🥛 Sweet Lassi": 120,
+        "🥛 Mango Lassi": 140,
+        "🧃 Fresh Juice": 100
+    },
+    "🍮 Desserts": {
+        "🍮 Rice Kheer": 140,
+        "🍩 Gulab Jamun": 120,
+        "🍦 Kulfi": 180,
+        "🍯 Jalebi": 150,
+        "🥧 Ras Malai": 160,
+        "🍰 Gajar Halwa": 130
+    }
+}
+
+
+def load_menu_index():
+    """Return the MenuIndex of the menu catalog (or of DEFAULT_MENU without one)."""
+    return MenuCatalog(fallback=DEFAULT_MENU).load()
+
+
+# --------------------------- Pricing Helper --------------------------- #
+def compute_amounts(subtotal, tip=0, discount=0):
+    """Apply discount, 5% tax and tip to a subtotal."""
+    # Apply discount
+    discount_amount = (subtotal * discount) / 100
+    discounted_subtotal = subtotal - discount_amount
+
+    # Add 5% tax
+    tax_amount = (discounted_subtotal * DEFAULT_TAX_RATE) / 100
+
+    # Final total including tip
+    total = discounted_subtotal + tax_amount + tip
+
+    return {
+        'subtotal': subtotal,
+        'discount_amount': discount_amount,
+        'discounted_subtotal': discounted_subtotal,
+        'tax_amount': tax_amount,
+        'tip': tip,
+        'total': total
+    }
+
+
+# --------------------------- Bill Formatting --------------------------- #
+def format_bill(menu_index, order, order_number, amounts, tip=0, discount=0, customer_name="",
+                timestamp=None, template=DEFAULT_RECEIPT):
+    """Render a customer bill for an {item_id: quantity} order."""
+    items = menu_index.items
+    lines = [(items[item_id].receipt_name, order[item_id], items[item_id].price)
+             for item_id in sorted(order, key=lambda i: items[i].rank)]
+    return template.render(order_number, timestamp or datetime.datetime.now(), lines, amounts,
+                           tip, discount, customer_name)
+
+
+# --------------------------- History Entries --------------------------- #
+def entry_amounts(entry, menu_index=None):
+    """Return (line list, amounts dict) for a history entry.
+
+    Each line is (key, category, quantity, unit price). Prices come from the
+    entry itself; entries saved before prices were recorded fall back to the
+    menu index (or 0 for items no longer on the menu).
+    """
+    prices = entry.get("prices") or {}
+    lines = []
+    subtotal = 0
+    for key, qty in entry.get("items", {}).items():
+        price = prices.get(key)
+        if price is None:
+            record = menu_index.by_key.get(key) if menu_index is not None else None
+            price = record.price if record is not None else 0
+        category = key.split(":", 1)[0]
+        lines.append((key, category, qty, price))
+        subtotal += price * qty
+    if "promotions" in entry or "taxes" in entry:
+        # Priced by pricing rules: replay the recorded promotions and taxes
+        amounts = adjusted_amounts(subtotal, entry.get("tip", 0), entry.get("discount", 0),
+                                   entry.get("promotions", ()), entry.get("taxes"))
+    else:
+        amounts = compute_amounts(subtotal, entry.get("tip", 0), entry.get("discount", 0))
+    return lines, amounts
+
+
+def render_history_bill(entry, menu_index=None, template=DEFAULT_RECEIPT):
+    """Re-render the bill of a saved order from its structured data.
+
+    Entries saved before bills were rendered on demand still carry their
+    original ``bill`` text, which is returned unchanged.
+    """
+    if entry.get("bill"):
+        return entry["bill"]
+    lines, amounts = entry_amounts(entry, menu_index)
+    receipt_lines = [(key.split(":", 1)[-1].encode("ascii", "ignore").decode(), qty, price)
+                     for key, _, qty, price in sorted(lines)]
+    return template.render(entry.get("order_number", 0),
+                           datetime.datetime.fromisoformat(entry["date"]), receipt_lines, amounts,
+                           entry.get("tip", 0), entry.get("discount", 0),
+                           entry.get("customer_name", ""))
+
+
+def reprint_bills(entries, menu_index=None, template=DEFAULT_RECEIPT):
+    """Yield (order number, bill text) for many saved orders in one pass."""
+    for entry in entries:
+        yield entry.get("order_number"), render_history_bill(entry, menu_index, template)
 
 
 # --------------------------- Restaurant Manager Class --------------------------- #
@@ -13,132 +166,172 @@ class RestaurantManager:
     """Class to manage restaurant menu, customer orders, billing, and order history."""
 
     # --------------------------- Initialization --------------------------- #
-    def __init__(self):
-        # Full Restaurant Menu with Categories
-        self.menu = {
-            "🥗 Starters": {
-                "🥟 Chicken Samosa": 80,
-                "🥟 Vegetable Samosa": 60,
-                "🍗 Seekh Kebab": 180,
-                "🍗 Chicken Tikka": 220,
-                "🍵 Mixed Pakora": 100,
-                "🧅 Onion Bhaji": 90,
-                "🌶️ Chili Chicken": 250
-            },
-            "🍛 Main Course": {
-                "🍛 Chicken Biryani": 320,
-                "🥘 Beef Biryani": 380,
-                "🍛 Mutton Biryani": 450,
-                "🍛 Vegetable Biryani": 280,
-                "🍲 Chicken Karahi": 650,
-                "🍲 Beef Karahi": 750,
-                "🍲 Mutton Karahi": 850,
-                "🍲 Haleem": 250,
-                "🍲 Nihari": 400,
-                "🍗 Butter Chicken": 550,
-                "🥘 Dal Makhani": 300
-            },
-            "🥖 Breads & Sides": {
-                "🥖 Butter Naan": 50,
-                "🥖 Garlic Naan": 60,
-                "🥞 Plain Paratha": 40,
-                "🥞 Aloo Paratha": 80,
-                "🍚 Plain Rice": 60,
-                "🥗 Fresh Salad": 90,
-                "🥣 Raita": 50,
-                "🧅 Pickled Onions": 30
-            },
-            "🥤 Beverages": {
-                "🥤 Coca Cola": 80,
-                "🥤 Sprite": 80,
-                "💧 Mineral Water": 50,
-                "☕ Kashmiri Chai": 70,
-                "☕ Green Tea": 60,
-                "🥛 Sweet Lassi": 120,
-                "🥛 Mango Lassi": 140,
-                "🧃 Fresh Juice": 100
-            },
-            "🍮 Desserts": {
-                "🍮 Rice Kheer": 140,
-                "🍩 Gulab Jamun": 120,
-                "🍦 Kulfi": 180,
-                "🍯 Jalebi": 150,
-                "🥧 Ras Malai": 160,
-                "🍰 Gajar Halwa": 130
-            }
-        }
+    def __init__(self, storage=None, rollups=None, catalog=None, kitchen=None, pricing=None):
+        # Persistence backend (JSON files in the working directory by default)
+        self.storage = storage if storage is not None else JsonFileStorage()
+
+        # Optional SalesRollups kept up to date with every saved order
+        self.rollups = rollups
+
+        # Optional kitchen ticket feed (e.g. a KitchenService) told about every confirmed order
+        self.kitchen = kitchen
 
-        # Holds the current order
+        # Optional PricingRules (promotions & category tax); None keeps the flat 5% bill
+        self.pricing = pricing
+
+        # Menu catalog (menu.json next to this module) and its item index
+        self.catalog = catalog if catalog is not None else MenuCatalog(fallback=DEFAULT_MENU)
+        self.menu_index = self.catalog.load()
+        self.menu = self.menu_index.menu()
+
+        # Name/shortcode search over the menu in use
+        self.search = MenuSearchIndex(self.menu_index)
+
+        # Pricing rules compiled for the menu in use, priced live as items change
+        self.pricing_plan = None
+        self._pricing_session = None
+        self._compile_pricing()
+
+        # A reloaded menu waits here until the current order is cleared
+        self._pending_index = None
+
+        # Holds the current order as {item_id: quantity}
         self.order = {}
 
+        # Running aggregates of the current order, kept in step with self.order
+        self._subtotal = 0
+        self._item_count = 0
+        self._totals_cache = None
+
         # Assign next order number
         self.order_number = self.get_next_order_number()
 
+    # --------------------------- Menu Reloading --------------------------- #
+    def reload_menu(self, menu_index):
+        """Switch to a new menu version.
+
+        An order in progress keeps the prices it was started with; the new
+        menu takes over once the order is cleared. Returns True if the new
+        menu is in use now.
+        """
+        if self.order:
+            self._pending_index = menu_index
+            return False
+        self._use_menu(menu_index)
+        return True
+
+    def check_menu(self):
+        """Reload the catalog if its file changed; returns True if the menu in use changed."""
+        menu_index = self.catalog.poll()
+        return menu_index is not None and self.reload_menu(menu_index)
+
+    def _use_menu(self, menu_index):
+        self.menu_index = menu_index
+        self.menu = menu_index.menu()
+        self.search.update(menu_index)
+        self._pending_index = None
+        self._compile_pricing()
+
+    def _compile_pricing(self):
+        if self.pricing is not None:
+            self.pricing_plan = self.pricing.compile(self.menu_index)
+            self._pricing_session = self.pricing_plan.session()
+
+    # --------------------------- Menu Search --------------------------- #
+    def search_items(self, query, limit=10):
+        """Return menu items matching a name/shortcode query, best first."""
+        return self.search.search(query, limit)
+
     # --------------------------- Order Number Handling --------------------------- #
     def get_next_order_number(self):
         """Generate and save the next sequential order number."""
-        try:
-            with open("order_counter.json", "r") as f:
-                data = json.load(f)
-                order_num = data.get("last_order", 0) + 1
-        except FileNotFoundError:
-            order_num = 1
-
-        with open("order_counter.json", "w") as f:
-            json.dump({"last_order": order_num}, f)
-
-        return order_num
+        return self.storage.next_order_number()
 
     # --------------------------- Order Item Management --------------------------- #
     def add_item(self, category, item, quantity):
         """Add an item with a specific quantity to the current order."""
-        if category in self.menu and item in self.menu[category]:
-            key = f"{category}:{item}"
-            if quantity > 0:
-                self.order[key] = self.order.get(key, 0) + quantity
-            elif key in self.order:
-                del self.order[key]
+        record = self.menu_index.lookup(category, item)
+        if record is not None:
+            self.add_item_by_id(record.item_id, quantity)
+
+    def add_item_by_id(self, item_id, quantity):
+        """Add a quantity of the menu item with ``item_id`` to the current order."""
+        price = self.menu_index.items[item_id].price
+        if quantity > 0:
+            self.order[item_id] = self.order.get(item_id, 0) + quantity
+            self._adjust_totals(item_id, price, quantity)
+        elif item_id in self.order:
+            self._adjust_totals(item_id, price, -self.order.pop(item_id))
+
+    def set_quantity(self, item_id, quantity):
+        """Set the quantity of a menu item in the current order (0 removes it)."""
+        current = self.order.get(item_id, 0)
+        quantity = max(0, quantity)
+        if quantity == current:
+            return
+        if quantity:
+            self.order[item_id] = quantity
+        else:
+            del self.order[item_id]
+        self._adjust_totals(item_id, self.menu_index.items[item_id].price, quantity - current)
 
     def remove_item(self, category, item):
         """Remove an item completely from the current order."""
-        key = f"{category}:{item}"
-        if key in self.order:
-            del self.order[key]
+        record = self.menu_index.lookup(category, item)
+        if record is not None and record.item_id in self.order:
+            self._adjust_totals(record.item_id, record.price, -self.order.pop(record.item_id))
+
+    def clear_items(self):
+        """Remove all items from the current order, keeping its order number."""
+        self.order.clear()
+        self._subtotal = 0
+        self._item_count = 0
+        self._totals_cache = None
+        if self._pricing_session is not None:
+            self._pricing_session.reset()
+        if self._pending_index is not None:
+            self._use_menu(self._pending_index)
 
     def clear_order(self):
         """Clear all items from the current order and reset order number."""
-        self.order.clear()
+        self.clear_items()
         self.order_number = self.get_next_order_number()
 
+    def _adjust_totals(self, item_id, price, qty_change):
+        """Update the running subtotal and item count after a quantity change."""
+        self._subtotal += price * qty_change
+        self._item_count += qty_change
+        self._totals_cache = None
+        if self._pricing_session is not None:
+            self._pricing_session.touch(item_id)
+
+    def get_order_items(self):
+        """Return the current order as {"category:item": quantity} (history format)."""
+        items = self.menu_index.items
+        return {items[item_id].key: qty for item_id, qty in self.order.items()}
+
+    def get_item_count(self):
+        """Return the total quantity of items in the current order."""
+        return self._item_count
+
     # --------------------------- Billing & Calculation --------------------------- #
     def calculate_total(self, tip=0, discount=0):
-        """Calculate subtotal, discount, tax, tip, and final total."""
-        subtotal = 0
-
-        # Calculate subtotal
-        for key, qty in self.order.items():
-            category, item = key.split(":", 1)
-            price = self.menu[category][item]
-            subtotal += price * qty
-
-        # Apply discount
-        discount_amount = (subtotal * discount) / 100
-        discounted_subtotal = subtotal - discount_amount
-
-        # Add 5% tax
-        tax_amount = (discounted_subtotal * 5) / 100
-
-        # Final total including tip
-        total = discounted_subtotal + tax_amount + tip
-
-        return {
-            'subtotal': subtotal,
-            'discount_amount': discount_amount,
-            'discounted_subtotal': discounted_subtotal,
-            'tax_amount': tax_amount,
-            'tip': tip,
-            'total': total
-        }
+        """Calculate subtotal, discount, tax, tip, and final total.
+
+        With pricing rules the result also lists the applied ``promotions``
+        and, when categories are taxed differently, the ``taxes`` by rate.
+        """
+        if self._pricing_session is not None:
+            return self._pricing_session.amounts(self.order, self._subtotal, tip, discount)
+
+        # Reuse the last result while neither the order nor the inputs changed
+        cache = self._totals_cache
+        if cache is not None and cache[0] == tip and cache[1] == discount:
+            return dict(cache[2])
+
+        amounts = compute_amounts(self._subtotal, tip, discount)
+        self._totals_cache = (tip, discount, amounts)
+        return dict(amounts)
 
     def generate_bill(self, tip=0, discount=0, customer_name=""):
         """Generate a formatted customer bill."""
@@ -146,51 +339,8 @@ class RestaurantManager:
             return "No items in order"
 
         amounts = self.calculate_total(tip, discount)
-        bill = []
-
-        # --------------------------- Bill Header --------------------------- #
-        bill.append("═" * 50)
-        bill.append("        🌟 PAK CUISINE RESTAURANT 🌟")
-        bill.append("          Premium Pakistani Cuisine")
-        bill.append("═" * 50)
-        bill.append(f"Order #: {self.order_number:04d}")
-        bill.append(f"Date: {datetime.datetime.now().strftime('%d/%m/%Y')}")
-        bill.append(f"Time: {datetime.datetime.now().strftime('%H:%M:%S')}")
-        if customer_name:
-            bill.append(f"Customer: {customer_name}")
-        bill.append("─" * 50)
-        bill.append(f"{'ITEM':<25} {'QTY':<5} {'PRICE':<8} {'TOTAL':<10}")
-        bill.append("─" * 50)
-
-        # --------------------------- Bill Items --------------------------- #
-        for key, qty in sorted(self.order.items()):
-            category, item = key.split(":", 1)
-            unit_price = self.menu[category][item]
-            total_price = unit_price * qty
-
-            # Remove emojis for display
-            clean_item = item.encode("ascii", "ignore").decode()
-            bill.append(f"{clean_item:<25} {qty:<5} Rs.{unit_price:<6} Rs.{total_price:<8}")
-
-        # --------------------------- Bill Footer --------------------------- #
-        bill.append("─" * 50)
-        bill.append(f"{'Subtotal:':<35} Rs.{amounts['subtotal']:.2f}")
-        if discount > 0:
-            bill.append(f"{'Discount (' + str(discount) + '%):':<35} -Rs.{amounts['discount_amount']:.2f}")
-            bill.append(f"{'After Discount:':<35} Rs.{amounts['discounted_subtotal']:.2f}")
-        bill.append(f"{'Tax (5%):':<35} Rs.{amounts['tax_amount']:.2f}")
-        if tip > 0:
-            bill.append(f"{'Tip:':<35} Rs.{tip:.2f}")
-        bill.append("─" * 50)
-        bill.append(f"{'TOTAL:':<35} Rs.{amounts['total']:.2f}")
-        bill.append("═" * 50)
-        bill.append("        🍴 Thank You for Dining With Us! 🍴")
-        bill.append("           Please Visit Again Soon ❤️")
-        bill.append("═" * 50)
-        bill.append("")
-        bill.append("Contact: +92-21-1234567 | www.pakcuisine.pk")
-
-        return "\n".join(bill)
+        return format_bill(self.menu_index, self.order, self.order_number,
+                           amounts, tip, discount, customer_name)
 
     # --------------------------- Order Summary & History --------------------------- #
     def get_order_summary(self):
@@ -199,33 +349,86 @@ class RestaurantManager:
             return "No items selected"
 
         summary = []
-        total_items = 0
-        for key, qty in self.order.items():
-            category, item = key.split(":", 1)
-            clean_item = item.split(" ", 1)[-1] if " " in item else item
-            summary.append(f"{clean_item} x{qty}")
-            total_items += qty
-
-        return f"{total_items} items: " + ", ".join(summary)
-
-    def save_order_history(self, bill_content, customer_name=""):
-        """Save the order details permanently in order_history.json."""
-        history_entry = {
+        items = self.menu_index.items
+        for item_id, qty in self.order.items():
+            summary.append(f"{items[item_id].short_name} x{qty}")
+
+        return f"{self._item_count} items: " + ", ".join(summary)
+
+    def build_history_entry(self, customer_name="", tip=0, discount=0):
+        """Snapshot the current order as a structured order history entry.
+
+        The bill text is not stored; render_history_bill() rebuilds it on demand.
+        """
+        items = self.menu_index.items
+        entry = {
             "order_number": self.order_number,
             "date": datetime.datetime.now().isoformat(),
             "customer_name": customer_name,
-            "items": dict(self.order),
-            "bill": bill_content
+            "items": self.get_order_items(),
+            "prices": {items[item_id].key: items[item_id].price for item_id in self.order},
+            "tip": tip,
+            "discount": discount
         }
+        if self._pricing_session is not None:
+            record_adjustments(entry, self.calculate_total(tip, discount))
+        return entry
+
+    def save_order_history(self, *, customer_name="", tip=0, discount=0):
+        """Save the order details permanently in the order history.
 
-        # Load existing history if available
+        Arguments are keyword-only: the old signature took the rendered bill
+        first, and a positional call would store it as the customer name.
+        """
+        self.record_order(self.build_history_entry(customer_name, tip, discount))
+
+    def record_order(self, entry):
+        """Persist a history entry and fold it into the sales rollups."""
+        self.storage.append_order(entry)
+        self._publish([entry])
+
+    def record_orders(self, entries, sync=True):
+        """Persist a batch of history entries together (group commit) and roll them up."""
+        self.storage.append_orders(entries, sync=sync)
+        self._publish(entries)
+
+    def save_orders(self, entries, bills, sync=True):
+        """Persist history entries with their bills (see StorageBackend.save_orders).
+
+        Returns the bill locations. The entries are rolled up even when only
+        the bills failed (BillSaveError), since they are in the history.
+        """
         try:
-            with open("order_history.json", "r") as f:
-                history = json.load(f)
-        except FileNotFoundError:
-            history = []
-
-        # Append new order and save
-        history.append(history_entry)
-        with open("order_history.json", "w") as f:
-            json.dump(history, f, indent=2)
+            locations = self.storage.save_orders(entries, bills, sync=sync)
+        except BillSaveError:
+            self._publish(entries)
+            raise
+        self._publish(entries)
+        return locations
+
+    def _publish(self, entries):
+        """Fold saved entries into the rollups and hand them to the kitchen.
+
+        The entries are already durable, so failures here are logged rather
+        than raised: a caller treating them as a failed save would retry and
+        duplicate history. Rollups can be rebuilt from history
+        (``python sales_rollups.py rebuild``) and a missed kitchen ticket
+        can be re-sent from the saved order.
+        """
+        if self.rollups is not None:
+            try:
+                self.rollups.apply_many(entries)
+            except Exception:
+                log.exception("Sales rollups missed %d saved order(s); run "
+                              "'python sales_rollups.py rebuild'", len(entries))
+        if self.kitchen is not None:
+            for entry in entries:
+                try:
+                    self.kitchen.submit(entry)
+                except Exception:
+                    log.exception("Kitchen ticket for order #%s was not sent",
+                                  entry.get("order_number"))
+
+    def save_bill(self, bill_content):
+        """Store the rendered bill for the current order and return its location."""
+        return self.storage.save_bill(self.order_number, bill_content)
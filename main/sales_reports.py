@@ -0,0 +1,357 @@
+# ====================================================================== #
+#                     Parallel Historical Sales Reports                  #
+#     Partitioned history scans merged across a pool of processes        #
+# ====================================================================== #
+
+import argparse
+import datetime
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from batch_billing import to_paisa
+from history_log import OrderHistoryLog
+from history_segments import SegmentedHistory, read_day
+from restaurant_backend import entry_amounts, load_menu_index
+from storage import JsonFileStorage, SQLiteStorage, as_iso
+
+
+# --------------------------- Settings --------------------------- #
+# Partitions per worker: enough that a few busy days do not leave cores idle
+PARTITIONS_PER_WORKER = 4
+
+
+def _rupees(paisa):
+    return round(paisa / 100, 2)
+
+
+# --------------------------- Partitions --------------------------- #
+def _chunks(days, count):
+    """Split a sorted list of days into ``count`` contiguous runs."""
+    count = max(1, min(count, len(days)))
+    size, extra = divmod(len(days), count)
+    runs, position = [], 0
+    for i in range(count):
+        step = size + (1 if i < extra else 0)
+        runs.append(days[position:position + step])
+        position += step
+    return runs
+
+
+def partitions(storage, start=None, end=None, workers=1):
+    """Return picklable partition specs covering [start, end) of ``storage``.
+
+    Daily segments are split into runs of days and SQLite into runs of
+    dates, so each worker reads only its own part of the history. A plain
+    JSON Lines history is split by its rotated files. ``storage`` is a
+    storage backend or, as open_history() returns, a bare history.
+    """
+    first = start[:10] if start else None
+    last = end[:10] if end else None
+
+    def wanted(day):
+        return (first is None or day >= first) and (last is None or day <= last)
+
+    count = workers * PARTITIONS_PER_WORKER
+    if isinstance(storage, SQLiteStorage):
+        days = [day for day in storage.order_days() if wanted(day)]
+        return [("sqlite", storage.path, run[0], run[-1]) for run in _chunks(days, count) if run]
+    history = storage.history if isinstance(storage, JsonFileStorage) else storage
+    if isinstance(history, SegmentedHistory):
+        days = [day for day in history.days() if wanted(day)]
+        return [("segments", history.directory, run) for run in _chunks(days, count) if run]
+    if isinstance(history, OrderHistoryLog):
+        return [("log", path) for path in history.segment_paths()]
+    raise TypeError(f"Cannot partition {type(storage).__name__} history")
+
+
+def open_history(spec="json"):
+    """Open the history named by a storage spec for reading only.
+
+    Unlike open_storage this never seals days, repairs the bill archive or
+    reserves order numbers, so a report does not write to the tills' data or
+    wait on their locks.
+    """
+    kind, _, target = spec.partition(":")
+    if kind == "json":
+        return SegmentedHistory(target or "order_history", legacy_path=None, readonly=True)
+    if kind == "sqlite":
+        return SQLiteStorage(target or "restaurant.db", readonly=True)
+    raise ValueError(f"Unknown storage backend: {spec!r}")
+
+
+def _iter_partition(partition):
+    kind = partition[0]
+    if kind == "segments":
+        _, directory, days = partition
+        for day in days:
+            yield from read_day(directory, day)
+    elif kind == "sqlite":
+        _, path, first_day, last_day = partition
+        after = (datetime.date.fromisoformat(last_day) + datetime.timedelta(days=1)).isoformat()
+        storage = SQLiteStorage(path, readonly=True)
+        try:
+            yield from storage.iter_orders_between(first_day, after)
+        finally:
+            storage.close()
+    else:
+        yield from OrderHistoryLog._read_segment(partition[1])
+
+
+# --------------------------- Aggregation --------------------------- #
+def empty_totals():
+    """A zeroed partial aggregate; all money in paisa."""
+    return {
+        "orders": 0, "items": 0, "subtotal": 0, "promotion": 0, "discount": 0, "tax": 0,
+        "tip": 0, "total": 0, "discounted_orders": 0, "promoted_orders": 0, "tipped_orders": 0,
+        "item_sales": {},       # (category, item) -> [quantity, revenue]
+        "category_sales": {},   # category -> [quantity, revenue]
+        "discount_rates": {},   # discount % -> [orders, discount given]
+        "first": None, "last": None,
+    }
+
+
+def aggregate(entries, start=None, end=None, menu_index=None, totals=None):
+    """Fold saved orders within [start, end) into a partial aggregate."""
+    totals = totals if totals is not None else empty_totals()
+    item_sales, category_sales = totals["item_sales"], totals["category_sales"]
+    for entry in entries:
+        date = entry.get("date", "")
+        if (start is not None and date < start) or (end is not None and date >= end):
+            continue
+        lines, amounts = entry_amounts(entry, menu_index)
+        promotion = to_paisa(amounts.get("promotion_amount", 0))
+        discount = to_paisa(amounts["discount_amount"])
+        tip = to_paisa(amounts["tip"])
+        totals["orders"] += 1
+        totals["subtotal"] += to_paisa(amounts["subtotal"])
+        totals["promotion"] += promotion
+        totals["discount"] += discount
+        totals["tax"] += to_paisa(amounts["tax_amount"])
+        totals["tip"] += tip
+        totals["total"] += to_paisa(amounts["total"])
+        if promotion:
+            totals["promoted_orders"] += 1
+        if discount:
+            totals["discounted_orders"] += 1
+            rate = totals["discount_rates"].setdefault(entry.get("discount", 0), [0, 0])
+            rate[0] += 1
+            rate[1] += discount
+        if tip:
+            totals["tipped_orders"] += 1
+        if totals["first"] is None or date < totals["first"]:
+            totals["first"] = date
+        if totals["last"] is None or date > totals["last"]:
+            totals["last"] = date
+        for key, category, qty, price in lines:
+            revenue = price * qty * 100
+            totals["items"] += qty
+            name = (category, key.split(":", 1)[-1])
+            item = item_sales.get(name)
+            if item is None:
+                item_sales[name] = [qty, revenue]
+            else:
+                item[0] += qty
+                item[1] += revenue
+            cat = category_sales.get(category)
+            if cat is None:
+                category_sales[category] = [qty, revenue]
+            else:
+                cat[0] += qty
+                cat[1] += revenue
+    return totals
+
+
+def merge(target, partial):
+    """Add one partial aggregate into ``target`` and return it."""
+    for field in ("orders", "items", "subtotal", "promotion", "discount", "tax", "tip", "total",
+                  "discounted_orders", "promoted_orders", "tipped_orders"):
+        target[field] += partial[field]
+    for table in ("item_sales", "category_sales", "discount_rates"):
+        merged = target[table]
+        for key, (a, b) in partial[table].items():
+            row = merged.setdefault(key, [0, 0])
+            row[0] += a
+            row[1] += b
+    for field, pick in (("first", min), ("last", max)):
+        values = [v for v in (target[field], partial[field]) if v is not None]
+        target[field] = pick(values) if values else None
+    return target
+
+
+# --------------------------- Worker Processes --------------------------- #
+_worker_menu = None
+
+
+def _init_worker():
+    # Price fallback for old entries; loaded once per process, not per partition
+    global _worker_menu
+    _worker_menu = load_menu_index()
+
+
+def _aggregate_partition(partition, start, end):
+    return aggregate(_iter_partition(partition), start, end, _worker_menu)
+
+
+# --------------------------- Report Engine --------------------------- #
+class ReportEngine:
+    """Build sales reports over a date range using a pool of processes.
+
+    The history is cut into partitions (runs of days), each worker streams
+    and pre-aggregates its partitions into small partial totals, and the
+    parent only merges those, so the work scales with the number of cores.
+    ``workers=1`` runs in this process.
+    """
+
+    def __init__(self, storage, workers=None):
+        self.storage = storage
+        self.workers = max(1, workers or os.cpu_count() or 1)
+
+    def totals(self, start=None, end=None):
+        """Return the merged aggregate of every order in [start, end)."""
+        start, end = as_iso(start), as_iso(end)
+        parts = partitions(self.storage, start, end, self.workers)
+        totals = empty_totals()
+        if self.workers == 1 or len(parts) <= 1:
+            menu_index = load_menu_index()
+            for partition in parts:
+                aggregate(_iter_partition(partition), start, end, menu_index, totals)
+            return totals
+        with ProcessPoolExecutor(self.workers, initializer=_init_worker) as pool:
+            futures = [pool.submit(_aggregate_partition, partition, start, end) for partition in parts]
+            for future in as_completed(futures):
+                merge(totals, future.result())
+        return totals
+
+    def report(self, start=None, end=None, top=10):
+        """Return the report document for [start, end)."""
+        return build_report(self.totals(start, end), start, end, top)
+
+
+def build_report(totals, start=None, end=None, top=10):
+    """Turn merged totals into the JSON-ready report (money in rupees)."""
+    orders = totals["orders"]
+    revenue = sum(row[1] for row in totals["category_sales"].values())
+
+    def share(amount, whole):
+        return round(amount * 100 / whole, 2) if whole else 0.0
+
+    items = sorted(totals["item_sales"].items(), key=lambda kv: (-kv[1][1], kv[0]))
+    by_quantity = sorted(totals["item_sales"].items(), key=lambda kv: (-kv[1][0], kv[0]))
+    return {
+        "range": {"start": as_iso(start), "end": as_iso(end),
+                  "first_order": totals["first"], "last_order": totals["last"]},
+        "orders": orders,
+        "items_sold": totals["items"],
+        "sales": {field: _rupees(totals[field])
+                  for field in ("subtotal", "promotion", "discount", "tax", "tip", "total")},
+        "average_ticket": _rupees(totals["total"] / orders) if orders else 0.0,
+        "average_items": round(totals["items"] / orders, 2) if orders else 0.0,
+        "top_items_by_revenue": [
+            {"category": category, "item": item, "quantity": qty, "revenue": _rupees(rev)}
+            for (category, item), (qty, rev) in items[:top]],
+        "top_items_by_quantity": [
+            {"category": category, "item": item, "quantity": qty, "revenue": _rupees(rev)}
+            for (category, item), (qty, rev) in by_quantity[:top]],
+        "category_mix": [
+            {"category": category, "quantity": qty, "revenue": _rupees(rev),
+             "share_pct": share(rev, revenue)}
+            for category, (qty, rev) in sorted(totals["category_sales"].items(),
+                                               key=lambda kv: -kv[1][1])],
+        "discount_leakage": {
+            "total": _rupees(totals["discount"]),
+            "pct_of_subtotal": share(totals["discount"], totals["subtotal"]),
+            "discounted_orders": totals["discounted_orders"],
+            "pct_of_orders": share(totals["discounted_orders"], orders),
+            "by_rate": [{"discount_pct": rate, "orders": count, "total": _rupees(amount)}
+                        for rate, (count, amount) in sorted(totals["discount_rates"].items())],
+            "promotions": _rupees(totals["promotion"]),
+            "promotions_pct_of_subtotal": share(totals["promotion"], totals["subtotal"]),
+            "promoted_orders": totals["promoted_orders"],
+        },
+        "tips": {
+            "total": _rupees(totals["tip"]),
+            "tipped_orders": totals["tipped_orders"],
+            "pct_of_orders": share(totals["tipped_orders"], orders),
+            "average_per_tipped_order": (_rupees(totals["tip"] / totals["tipped_orders"])
+                                         if totals["tipped_orders"] else 0.0),
+        },
+    }
+
+
+# --------------------------- Text Output --------------------------- #
+def format_report(report):
+    lines = []
+    span = report["range"]
+    lines.append(f"Sales report {span['start'] or 'beginning'} .. {span['end'] or 'now'}")
+    lines.append(f"Orders: {report['orders']}   Items sold: {report['items_sold']}")
+    sales = report["sales"]
+    lines.append(f"Subtotal Rs.{sales['subtotal']:,.2f}   Tax Rs.{sales['tax']:,.2f}   "
+                 f"Total Rs.{sales['total']:,.2f}")
+    lines.append(f"Average ticket: Rs.{report['average_ticket']:,.2f} "
+                 f"({report['average_items']} items)")
+
+    lines.append("")
+    lines.append("Top items by revenue:")
+    for row in report["top_items_by_revenue"]:
+        lines.append(f"  {row['item']:<28} {row['quantity']:>8}  Rs.{row['revenue']:>14,.2f}")
+
+    lines.append("")
+    lines.append("Category mix:")
+    for row in report["category_mix"]:
+        lines.append(f"  {row['category']:<28} {row['share_pct']:>6.2f}%  Rs.{row['revenue']:>14,.2f}")
+
+    leakage = report["discount_leakage"]
+    lines.append("")
+    lines.append(f"Discount leakage: Rs.{leakage['total']:,.2f} ({leakage['pct_of_subtotal']}% of subtotal, "
+                 f"{leakage['discounted_orders']} orders / {leakage['pct_of_orders']}%)")
+    for row in leakage["by_rate"]:
+        lines.append(f"  {row['discount_pct']:>5}%  {row['orders']:>8} orders  Rs.{row['total']:>14,.2f}")
+    if leakage["promoted_orders"]:
+        lines.append(f"Promotions: Rs.{leakage['promotions']:,.2f} ({leakage['promotions_pct_of_subtotal']}% "
+                     f"of subtotal, {leakage['promoted_orders']} orders)")
+
+    tips = report["tips"]
+    lines.append("")
+    lines.append(f"Tips: Rs.{tips['total']:,.2f} on {tips['tipped_orders']} orders "
+                 f"({tips['pct_of_orders']}%), Rs.{tips['average_per_tipped_order']:,.2f} average")
+    return "\n".join(lines)
+
+
+# --------------------------- Command Line --------------------------- #
+def main():
+    parser = argparse.ArgumentParser(description="Sales reports over the saved order history")
+    parser.add_argument("--storage", default="json",
+                        help="storage spec, e.g. json, json:order_history or sqlite:restaurant.db")
+    parser.add_argument("--start", help="first date to include (YYYY-MM-DD)")
+    parser.add_argument("--end", help="day after the last date to include (YYYY-MM-DD)")
+    parser.add_argument("--month", help="shortcut for one month (YYYY-MM)")
+    parser.add_argument("--year", type=int, help="shortcut for one calendar year")
+    parser.add_argument("--workers", type=int, help="processes to use (default: all cores)")
+    parser.add_argument("--top", type=int, default=10, help="items in the top-item lists")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    start, end = args.start, args.end
+    if args.month:
+        first = datetime.date.fromisoformat(args.month + "-01")
+        start = first.isoformat()
+        end = (first + datetime.timedelta(days=32)).replace(day=1).isoformat()
+    elif args.year:
+        start, end = f"{args.year}-01-01", f"{args.year + 1}-01-01"
+
+    engine = ReportEngine(open_history(args.storage), args.workers)
+    started = time.perf_counter()
+    report = engine.report(start, end, args.top)
+    elapsed = time.perf_counter() - started
+    if args.json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+    else:
+        print(format_report(report))
+    print(f"{report['orders']} orders in {elapsed:.2f}s with {engine.workers} worker(s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+# ====================================================================== #
+#                       Incremental Sales Rollups                        #
+#      Per-day, per-hour, per-item & per-category sales aggregates       #
+# ====================================================================== #
+
+import argparse
+import datetime
+import json
+import sqlite3
+import threading
+
+from batch_billing import to_paisa
+from restaurant_backend import entry_amounts, load_menu_index
+from storage import open_storage
+
+
+# --------------------------- Helpers --------------------------- #
+def _rupees(paisa):
+    return round(paisa / 100, 2)
+
+
+# --------------------------- Sales Rollups --------------------------- #
+class SalesRollups:
+    """Materialized sales aggregates updated with every saved order.
+
+    Aggregates live in a small SQLite database, separate from the order
+    history, and are updated with upserts, so saving an order costs a few
+    index writes and reports never scan history. Money is stored as integer
+    paisa and reported in rupees.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS daily (
+            day TEXT PRIMARY KEY,
+            orders INTEGER NOT NULL DEFAULT 0,
+            items INTEGER NOT NULL DEFAULT 0,
+            subtotal INTEGER NOT NULL DEFAULT 0,
+            promotion INTEGER NOT NULL DEFAULT 0,
+            discount INTEGER NOT NULL DEFAULT 0,
+            tax INTEGER NOT NULL DEFAULT 0,
+            tip INTEGER NOT NULL DEFAULT 0,
+            total INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS hourly (
+            day TEXT NOT NULL,
+            hour INTEGER NOT NULL,
+            orders INTEGER NOT NULL DEFAULT 0,
+            items INTEGER NOT NULL DEFAULT 0,
+            total INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, hour)
+        );
+        CREATE TABLE IF NOT EXISTS item_sales (
+            day TEXT NOT NULL,
+            item TEXT NOT NULL,
+            category TEXT NOT NULL,
+            quantity INTEGER NOT NULL DEFAULT 0,
+            revenue INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, category, item)
+        );
+        CREATE TABLE IF NOT EXISTS category_sales (
+            day TEXT NOT NULL,
+            category TEXT NOT NULL,
+            quantity INTEGER NOT NULL DEFAULT 0,
+            revenue INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, category)
+        );
+    """
+
+    def __init__(self, path="sales_rollups.db", menu_index=None):
+        self.path = path
+        self.menu_index = menu_index if menu_index is not None else load_menu_index()
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(daily)")]
+        if "promotion" not in columns:
+            # Databases from before promotions; `rebuild` fills in past days
+            self.conn.execute("ALTER TABLE daily ADD COLUMN promotion INTEGER NOT NULL DEFAULT 0")
+
+    # --------------------------- Updating --------------------------- #
+    def apply(self, entry):
+        """Add one saved order to every aggregate."""
+        with self._lock:
+            self.conn.execute("BEGIN")
+            try:
+                self._apply(entry)
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def apply_many(self, entries):
+        """Add a batch of saved orders to the aggregates in one transaction."""
+        with self._lock:
+            self.conn.execute("BEGIN")
+            try:
+                for entry in entries:
+                    self._apply(entry)
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def _apply(self, entry):
+        lines, amounts = entry_amounts(entry, self.menu_index)
+        date = entry.get("date", "")
+        day = date[:10]
+        hour = int(date[11:13]) if len(date) >= 13 else 0
+        item_count = sum(qty for _, _, qty, _ in lines)
+        total = to_paisa(amounts["total"])
+
+        execute = self.conn.execute
+        execute("""INSERT INTO daily (day, orders, items, subtotal, promotion, discount, tax, tip, total)
+                   VALUES (?, 1, ?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(day) DO UPDATE SET
+                       orders = orders + 1, items = items + excluded.items,
+                       subtotal = subtotal + excluded.subtotal,
+                       promotion = promotion + excluded.promotion,
+                       discount = discount + excluded.discount,
+                       tax = tax + excluded.tax, tip = tip + excluded.tip,
+                       total = total + excluded.total""",
+                (day, item_count, to_paisa(amounts["subtotal"]),
+                 to_paisa(amounts.get("promotion_amount", 0)), to_paisa(amounts["discount_amount"]), to_paisa(amounts["tax_amount"]),
+                 to_paisa(amounts["tip"]), total))
+        execute("""INSERT INTO hourly (day, hour, orders, items, total) VALUES (?, ?, 1, ?, ?)
+                   ON CONFLICT(day, hour) DO UPDATE SET
+                       orders = orders + 1, items = items + excluded.items,
+                       total = total + excluded.total""",
+                (day, hour, item_count, total))
+
+        categories = {}
+        for key, category, qty, price in lines:
+            execute("""INSERT INTO item_sales (day, item, category, quantity, revenue)
+                       VALUES (?, ?, ?, ?, ?)
+                       ON CONFLICT(day, category, item) DO UPDATE SET
+                           quantity = quantity + excluded.quantity,
+                           revenue = revenue + excluded.revenue""",
+                    (day, key.split(":", 1)[-1], category, qty, price * qty * 100))
+            cat_qty, cat_rev = categories.get(category, (0, 0))
+            categories[category] = (cat_qty + qty, cat_rev + price * qty * 100)
+        for category, (qty, revenue) in categories.items():
+            execute("""INSERT INTO category_sales (day, category, quantity, revenue)
+                       VALUES (?, ?, ?, ?)
+                       ON CONFLICT(day, category) DO UPDATE SET
+                           quantity = quantity + excluded.quantity,
+                           revenue = revenue + excluded.revenue""",
+                    (day, category, qty, revenue))
+
+    def rebuild(self, entries):
+        """Regenerate every aggregate from scratch; returns the number of orders."""
+        count = 0
+        with self._lock:
+            self.conn.execute("BEGIN")
+            try:
+                for table in ("daily", "hourly", "item_sales", "category_sales"):
+                    self.conn.execute(f"DELETE FROM {table}")
+                for entry in entries:
+                    self._apply(entry)
+                    count += 1
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return count
+
+    # --------------------------- Queries --------------------------- #
+    def _rows(self, sql, params=()):
+        with self._lock:
+            cursor = self.conn.execute(sql, params)
+            names = [column[0] for column in cursor.description]
+            return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+    @staticmethod
+    def _range(start, end):
+        start = start.isoformat()[:10] if isinstance(start, datetime.date) else (start or "")
+        end = end.isoformat()[:10] if isinstance(end, datetime.date) else (end or "9999-12-31")
+        return start, end
+
+    def daily(self, start=None, end=None):
+        """Per-day order count, items and money totals for days in [start, end]."""
+        rows = self._rows("SELECT * FROM daily WHERE day BETWEEN ? AND ? ORDER BY day",
+                          self._range(start, end))
+        for row in rows:
+            for field in ("subtotal", "promotion", "discount", "tax", "tip", "total"):
+                row[field] = _rupees(row[field])
+        return rows
+
+    def hourly(self, start=None, end=None):
+        """Orders, items and revenue by hour of day, summed over [start, end]."""
+        rows = self._rows("""SELECT hour, SUM(orders) AS orders, SUM(items) AS items,
+                                    SUM(total) AS total
+                             FROM hourly WHERE day BETWEEN ? AND ?
+                             GROUP BY hour ORDER BY hour""", self._range(start, end))
+        for row in rows:
+            row["total"] = _rupees(row["total"])
+        return rows
+
+    def top_items(self, start=None, end=None, limit=10, by="revenue"):
+        """Best-selling items over [start, end] by ``revenue`` or ``quantity``."""
+        if by not in ("revenue", "quantity"):
+            raise ValueError("by must be 'revenue' or 'quantity'")
+        rows = self._rows(f"""SELECT item, category, SUM(quantity) AS quantity,
+                                     SUM(revenue) AS revenue
+                              FROM item_sales WHERE day BETWEEN ? AND ?
+                              GROUP BY item, category ORDER BY {by} DESC LIMIT ?""",
+                          (*self._range(start, end), limit))
+        for row in rows:
+            row["revenue"] = _rupees(row["revenue"])
+        return rows
+
+    def by_category(self, start=None, end=None):
+        """Quantity and revenue per category over [start, end]."""
+        rows = self._rows("""SELECT category, SUM(quantity) AS quantity, SUM(revenue) AS revenue
+                             FROM category_sales WHERE day BETWEEN ? AND ?
+                             GROUP BY category ORDER BY revenue DESC""",
+                          self._range(start, end))
+        for row in rows:
+            row["revenue"] = _rupees(row["revenue"])
+        return rows
+
+    def snapshot(self, day=None):
+        """Dashboard-ready summary of one day (today by default)."""
+        day = day or datetime.date.today().isoformat()
+        totals = self.daily(day, day)
+        return {
+            "day": day,
+            "totals": totals[0] if totals else {"day": day, "orders": 0, "items": 0,
+                                                 "subtotal": 0, "promotion": 0, "discount": 0, "tax": 0,
+                                                 "tip": 0, "total": 0},
+            "hourly": self.hourly(day, day),
+            "top_items": self.top_items(day, day, limit=5),
+            "categories": self.by_category(day, day),
+        }
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+# --------------------------- Command Line --------------------------- #
+def main():
+    parser = argparse.ArgumentParser(description="Pak Cuisine sales rollups")
+    parser.add_argument("command", choices=["rebuild", "snapshot"])
+    parser.add_argument("--storage", default="json",
+                        help="storage spec, e.g. json or sqlite:restaurant.db")
+    parser.add_argument("--db", default="sales_rollups.db")
+    parser.add_argument("--day", help="day for snapshot (YYYY-MM-DD)")
+    args = parser.parse_args()
+
+    rollups = SalesRollups(args.db)
+    if args.command == "rebuild":
+        count = rollups.rebuild(open_storage(args.storage).iter_orders())
+        print(f"Rebuilt rollups from {count} orders")
+    else:
+        print(json.dumps(rollups.snapshot(args.day), indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
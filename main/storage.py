@@ -0,0 +1,412 @@
+# ====================================================================== #
+#                        Restaurant Storage Backends                     #
+#         Pluggable persistence for counters, history & saved bills      #
+# ====================================================================== #
+
+import datetime
+import json
+import os
+import sqlite3
+import threading
+
+from bill_archive import BillArchive, bill_filename
+from history_segments import SegmentedHistory
+from order_numbers import OrderNumberAllocator
+
+
+# --------------------------- Helpers --------------------------- #
+def as_iso(value):
+    """Normalize a date/datetime/ISO string bound for range comparisons."""
+    if value is None or isinstance(value, str):
+        return value
+    return value.isoformat()
+
+
+def _matching_orders(entries, customer_name=None, start=None, end=None):
+    """Filter entries by customer and a [start, end) range of ISO dates."""
+    matches = []
+    for entry in entries:
+        if customer_name is not None and entry.get("customer_name") != customer_name:
+            continue
+        date = entry.get("date", "")
+        if start is not None and date < start:
+            continue
+        if end is not None and date >= end:
+            continue
+        matches.append(entry)
+    return matches
+
+
+# --------------------------- Errors --------------------------- #
+class BillSaveError(Exception):
+    """History entries were saved but their bills were not.
+
+    The orders are durable; only the bill writes need retrying (the bills
+    can also be re-rendered from history with render_history_bill).
+    """
+
+
+# --------------------------- Storage Interface --------------------------- #
+class StorageBackend:
+    """Interface for everything RestaurantManager persists.
+
+    Subclasses store the order counter, the order history and saved bills.
+    History entries are plain dicts with at least ``order_number``, ``date``
+    (ISO timestamp), ``customer_name`` and ``items``.
+    """
+
+    def next_order_number(self):
+        """Reserve and return the next sequential order number."""
+        raise NotImplementedError
+
+    def append_order(self, entry):
+        """Persist one history entry and return the number of bytes written."""
+        raise NotImplementedError
+
+    def append_orders(self, entries, sync=True):
+        """Persist several history entries together and return the bytes written.
+
+        With ``sync`` the batch must be durable when this returns. Backends
+        override this to commit the whole batch with a single flush.
+        """
+        return sum(self.append_order(entry) for entry in entries)
+
+    def iter_orders(self):
+        """Yield every saved order, oldest first."""
+        raise NotImplementedError
+
+    def get_order(self, order_number):
+        """Return the latest saved entry for ``order_number`` or None."""
+        found = None
+        for entry in self.iter_orders():
+            if entry.get("order_number") == order_number:
+                found = entry
+        return found
+
+    def find_orders(self, customer_name=None, start=None, end=None):
+        """Return saved orders matching a customer and/or a [start, end) date range."""
+        return _matching_orders(self.iter_orders(), customer_name, as_iso(start), as_iso(end))
+
+    def save_bill(self, order_number, content, timestamp=None):
+        """Store a rendered bill and return where it was saved."""
+        raise NotImplementedError
+
+    def save_bills(self, bills, sync=True):
+        """Store several (order_number, content) bills; returns their locations."""
+        return [self.save_bill(order_number, content) for order_number, content in bills]
+
+    def get_bill(self, order_number):
+        """Return the most recently saved bill text for ``order_number`` or None."""
+        raise NotImplementedError
+
+    def save_orders(self, entries, bills, sync=True):
+        """Store history entries and their (order_number, content) bills; returns bill locations.
+
+        History goes first: it is the record of the sale, so a failure never
+        leaves a bill without its order. If only the bills fail, BillSaveError
+        is raised and the caller must not write the entries again.
+        """
+        bills = list(bills)
+        if entries:
+            self.append_orders(entries, sync=sync)
+        try:
+            return self.save_bills(bills, sync=sync)
+        except Exception as exc:
+            raise BillSaveError(f"Orders were saved but their bills were not: {exc}") from exc
+
+    def import_orders(self, entries):
+        """Copy history entries (e.g. from another backend) into this one."""
+        count = 0
+        for entry in entries:
+            self.append_order(entry)
+            count += 1
+        return count
+
+    def close(self):
+        """Release any open resources."""
+
+
+# --------------------------- JSON File Storage --------------------------- #
+class JsonFileStorage(StorageBackend):
+    """File-based storage: JSON counter, daily history segments, archived bills.
+
+    ``history`` may be any log with append/append_many/iter_entries (e.g. an
+    OrderHistoryLog); the default SegmentedHistory also answers order and
+    date lookups from its index. Bills are appended to a BillArchive in
+    ``<bill_dir>/bills`` (one container per day instead of loose .txt files).
+    """
+
+    def __init__(self, counter_path="order_counter.json", history=None, bill_dir=".",
+                 block_size=10, bills=None):
+        self.history = history if history is not None else SegmentedHistory()
+        self.allocator = OrderNumberAllocator(counter_path, block_size, history=self.history)
+        self.bill_dir = bill_dir
+        self.bills = bills if bills is not None else BillArchive(os.path.join(bill_dir, "bills"))
+
+    # --------------------------- Order Numbers --------------------------- #
+    def next_order_number(self):
+        return self.allocator.allocate()
+
+    # --------------------------- History --------------------------- #
+    def append_order(self, entry):
+        return self.history.append(entry)
+
+    def append_orders(self, entries, sync=True):
+        return self.history.append_many(entries, sync=sync)
+
+    def iter_orders(self):
+        return self.history.iter_entries()
+
+    def get_order(self, order_number):
+        lookup = getattr(self.history, "get_order", None)
+        return lookup(order_number) if lookup else super().get_order(order_number)
+
+    def find_orders(self, customer_name=None, start=None, end=None):
+        start, end = as_iso(start), as_iso(end)
+        iter_range = getattr(self.history, "iter_range", None)
+        entries = iter_range(start, end) if iter_range else self.history.iter_entries()
+        return _matching_orders(entries, customer_name, start, end)
+
+    # --------------------------- Bills --------------------------- #
+    def save_bill(self, order_number, content, timestamp=None):
+        return self.bills.save(order_number, content, timestamp)
+
+    def save_bills(self, bills, sync=True):
+        """Append the bills to today's container; with ``sync`` one fsync covers them all."""
+        return self.bills.save_many(bills, sync=sync)
+
+    def get_bill(self, order_number):
+        return self.bills.get(order_number)
+
+    def close(self):
+        self.allocator.release()
+
+
+# --------------------------- SQLite Storage --------------------------- #
+class SQLiteStorage(StorageBackend):
+    """SQLite storage in WAL mode with indexed order lookups.
+
+    WAL lets several terminals write to the same database file at once,
+    and the indexes on order number, date and customer name turn lookups
+    into index reads instead of full history scans.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS counter (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            last_order INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS orders (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_number INTEGER NOT NULL,
+            date TEXT NOT NULL,
+            customer_name TEXT NOT NULL DEFAULT '',
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_orders_number ON orders (order_number);
+        CREATE INDEX IF NOT EXISTS idx_orders_date ON orders (date);
+        CREATE INDEX IF NOT EXISTS idx_orders_customer ON orders (customer_name, date);
+        CREATE TABLE IF NOT EXISTS bills (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_number INTEGER NOT NULL,
+            created TEXT NOT NULL,
+            content TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_bills_number ON bills (order_number);
+    """
+
+    def __init__(self, path="restaurant.db", timeout=10.0, readonly=False):
+        self.path = path
+        self._lock = threading.Lock()
+        if readonly:
+            # For report workers: no schema changes, no write locks
+            self.conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, timeout=timeout,
+                                        check_same_thread=False, isolation_level=None)
+            return
+        self.conn = sqlite3.connect(path, timeout=timeout, check_same_thread=False,
+                                    isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        # FULL: a committed order survives power loss; batched commits pay it once
+        self.conn.execute("PRAGMA synchronous=FULL")
+        self.conn.executescript(self.SCHEMA)
+
+    # --------------------------- Order Numbers --------------------------- #
+    def next_order_number(self):
+        with self._lock:
+            cur = self.conn.cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            try:
+                cur.execute("INSERT OR IGNORE INTO counter (id, last_order) VALUES (1, 0)")
+                cur.execute("UPDATE counter SET last_order = last_order + 1 WHERE id = 1")
+                order_num = cur.execute("SELECT last_order FROM counter WHERE id = 1").fetchone()[0]
+                cur.execute("COMMIT")
+            except Exception:
+                cur.execute("ROLLBACK")
+                raise
+        return order_num
+
+    # --------------------------- History --------------------------- #
+    def append_order(self, entry):
+        data = json.dumps(entry, ensure_ascii=False)
+        with self._lock:
+            self.conn.execute(
+                "INSERT INTO orders (order_number, date, customer_name, data) VALUES (?, ?, ?, ?)",
+                (entry["order_number"], entry.get("date", ""), entry.get("customer_name", ""), data))
+        return len(data.encode("utf-8"))
+
+    def append_orders(self, entries, sync=True):
+        rows = [(e["order_number"], e.get("date", ""), e.get("customer_name", ""),
+                 json.dumps(e, ensure_ascii=False)) for e in entries]
+        with self._lock:
+            self.conn.execute("BEGIN")
+            try:
+                self.conn.executemany(
+                    "INSERT INTO orders (order_number, date, customer_name, data) VALUES (?, ?, ?, ?)",
+                    rows)
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return sum(len(row[3].encode("utf-8")) for row in rows)
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def iter_orders(self, batch_size=1000):
+        return self.iter_orders_between(batch_size=batch_size)
+
+    def iter_orders_between(self, start=None, end=None, batch_size=1000):
+        """Yield orders dated in [start, end) in save order, ``batch_size`` rows per query."""
+        clauses, params = ["id > ?"], []
+        if start is not None:
+            clauses.append("date >= ?")
+            params.append(as_iso(start))
+        if end is not None:
+            clauses.append("date < ?")
+            params.append(as_iso(end))
+        sql = f"SELECT id, data FROM orders WHERE {' AND '.join(clauses)} ORDER BY id LIMIT ?"
+        last_id = 0
+        while True:
+            with self._lock:
+                rows = self.conn.execute(sql, (last_id, *params, batch_size)).fetchall()
+            if not rows:
+                return
+            for row_id, data in rows:
+                yield json.loads(data)
+            last_id = rows[-1][0]
+
+    def order_days(self):
+        """Return every YYYY-MM-DD with saved orders, oldest first."""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT DISTINCT substr(date, 1, 10) FROM orders ORDER BY 1").fetchall()
+        return [row[0] for row in rows if row[0]]
+
+    def get_order(self, order_number):
+        found = self._query(
+            "SELECT data FROM orders WHERE order_number = ? ORDER BY id DESC LIMIT 1",
+            (order_number,))
+        return found[0] if found else None
+
+    def find_orders(self, customer_name=None, start=None, end=None):
+        clauses, params = [], []
+        if customer_name is not None:
+            clauses.append("customer_name = ?")
+            params.append(customer_name)
+        if start is not None:
+            clauses.append("date >= ?")
+            params.append(as_iso(start))
+        if end is not None:
+            clauses.append("date < ?")
+            params.append(as_iso(end))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return self._query(f"SELECT data FROM orders {where} ORDER BY date, id", params)
+
+    def import_orders(self, entries):
+        rows = [(e["order_number"], e.get("date", ""), e.get("customer_name", ""),
+                 json.dumps(e, ensure_ascii=False)) for e in entries]
+        with self._lock:
+            # All or nothing: a failed import can simply be run again
+            self.conn.execute("BEGIN")
+            try:
+                self.conn.executemany(
+                    "INSERT INTO orders (order_number, date, customer_name, data) VALUES (?, ?, ?, ?)",
+                    rows)
+                self.conn.execute(
+                    "INSERT INTO counter (id, last_order) VALUES (1, (SELECT COALESCE(MAX(order_number), 0) FROM orders)) "
+                    "ON CONFLICT(id) DO UPDATE SET last_order = MAX(last_order, excluded.last_order)")
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return len(rows)
+
+    # --------------------------- Bills --------------------------- #
+    def save_bill(self, order_number, content, timestamp=None):
+        timestamp = timestamp or datetime.datetime.now()
+        with self._lock:
+            self.conn.execute(
+                "INSERT INTO bills (order_number, created, content) VALUES (?, ?, ?)",
+                (order_number, timestamp.isoformat(), content))
+        return f"{self.path} ({bill_filename(order_number, timestamp)})"
+
+    def save_bills(self, bills, sync=True):
+        bills = list(bills)
+        timestamp = datetime.datetime.now()
+        with self._lock:
+            self.conn.execute("BEGIN")
+            try:
+                self.conn.executemany(
+                    "INSERT INTO bills (order_number, created, content) VALUES (?, ?, ?)",
+                    [(order_number, timestamp.isoformat(), content) for order_number, content in bills])
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return [f"{self.path} ({bill_filename(order_number, timestamp)})" for order_number, _ in bills]
+
+    def save_orders(self, entries, bills, sync=True):
+        """Store history entries and bills in one transaction (both or neither)."""
+        rows = [(e["order_number"], e.get("date", ""), e.get("customer_name", ""),
+                 json.dumps(e, ensure_ascii=False)) for e in entries]
+        bills = list(bills)
+        timestamp = datetime.datetime.now()
+        with self._lock:
+            self.conn.execute("BEGIN")
+            try:
+                self.conn.executemany(
+                    "INSERT INTO orders (order_number, date, customer_name, data) VALUES (?, ?, ?, ?)",
+                    rows)
+                self.conn.executemany(
+                    "INSERT INTO bills (order_number, created, content) VALUES (?, ?, ?)",
+                    [(order_number, timestamp.isoformat(), content) for order_number, content in bills])
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return [f"{self.path} ({bill_filename(order_number, timestamp)})" for order_number, _ in bills]
+
+    def get_bill(self, order_number):
+        """Return the most recently saved bill text for ``order_number`` or None."""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT content FROM bills WHERE order_number = ? ORDER BY id DESC LIMIT 1",
+                (order_number,)).fetchone()
+        return row[0] if row else None
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+# --------------------------- Factory --------------------------- #
+def open_storage(spec="json"):
+    """Create a storage backend from a spec such as ``json`` or ``sqlite:restaurant.db``."""
+    kind, _, target = spec.partition(":")
+    if kind == "json":
+        return JsonFileStorage()
+    if kind == "sqlite":
+        return SQLiteStorage(target or "restaurant.db")
+    raise ValueError(f"Unknown storage backend: {spec!r}")
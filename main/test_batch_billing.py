@@ -0,0 +1,106 @@
+# ====================================================================== #
+#                          Batch Billing Tests                           #
+#     Batch totals must match calculate_total, rules and exports too     #
+# ====================================================================== #
+
+import os
+import shutil
+import tempfile
+import unittest
+from array import array
+
+import batch_billing
+from batch_billing import BatchBiller, amounts_to_paisa
+from history_export import RETIRED_ITEM_ID
+from order_book import OrderBook
+from pricing_rules import PricingRules
+from restaurant_backend import RestaurantManager, entry_amounts
+from storage import SQLiteStorage
+
+
+class BatchBillerTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.storage = SQLiteStorage(os.path.join(self.directory, "restaurant.db"))
+        manager = RestaurantManager(self.storage)
+        self.menu_index = manager.menu_index
+        first, second, third = list(self.menu_index)[:3]
+        rules = PricingRules([
+            {"type": "combo", "name": "Combo", "price": first.price + second.price - 100,
+             "items": {first.key: 1, second.key: 1}},
+            {"type": "buy_x_get_y", "name": "Offer", "item": third.key, "buy": 2, "get": 1},
+            {"type": "tax", "category": first.key.split(":", 1)[0], "rate": 16},
+        ])
+        self.manager = RestaurantManager(self.storage, pricing=rules)
+        self.ids = [first.item_id, second.item_id, third.item_id]
+        # Exercise the pure Python path too, whether or not NumPy is installed
+        self.paths = [batch_billing.np, None] if batch_billing.np is not None else [None]
+
+    def tearDown(self):
+        batch_billing.np = self.paths[0]
+        self.storage.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def each_path(self):
+        for np in self.paths:
+            batch_billing.np = np
+            yield BatchBiller(self.menu_index, pricing=self.manager.pricing_plan)
+
+    def open_orders(self, book=None):
+        book = book if book is not None else OrderBook(self.manager)
+        quantities = [(1, 1, 0), (2, 1, 3), (0, 0, 3), (1, 0, 0), (3, 3, 6)]
+        orders = []
+        for position, counts in enumerate(quantities):
+            order = book.open(f"table {position}")
+            for item_id, qty in zip(self.ids, counts):
+                order.add_item(item_id, qty)
+            orders.append(order)
+        return orders
+
+    def assert_matches(self, result, expected):
+        for k, amounts in enumerate(expected):
+            self.assertEqual({field: int(result[field][k]) for field in amounts}, amounts)
+
+    def test_compute_matches_calculate_total_with_rules(self):
+        orders = self.open_orders()
+        expected = [amounts_to_paisa(order.calculate_total(25, 10)) for order in orders]
+        self.assertTrue(any(amounts["promotion_amount"] for amounts in expected))
+        for biller in self.each_path():
+            for source in (orders, [order.items() for order in orders],
+                           [order.history_items() for order in orders]):
+                self.assert_matches(biller.compute(source, discounts=10, tips=25), expected)
+
+    def test_compute_history_replays_recorded_promotions(self):
+        book = OrderBook(self.manager)
+        entries = [book.build_history_entry(order.ticket, tip=50, discount=5)
+                   for order in self.open_orders(book)]
+        self.assertTrue(all("taxes" in entry for entry in entries))
+        expected = [amounts_to_paisa(entry_amounts(entry, self.menu_index)[1]) for entry in entries]
+        for biller in self.each_path():
+            self.assert_matches(biller.compute_history(entries), expected)
+
+    def test_repeated_item_in_lines_is_summed(self):
+        price = self.menu_index.items[self.ids[0]].price
+        for np in self.paths:
+            batch_billing.np = np
+            result = BatchBiller(self.menu_index).compute_lines(
+                array("q", [2]), array("q", [self.ids[0], self.ids[0]]), array("q", [2, 1]))
+            self.assertEqual(int(result["subtotal"][0]), 3 * price * 100)
+
+    def test_exported_retired_lines_bill_at_their_saved_price(self):
+        price = self.menu_index.items[self.ids[0]].price
+        lengths = array("q", [2])
+        item_ids = array("q", [RETIRED_ITEM_ID, self.ids[0]])
+        quantities = array("q", [2, 1])
+        for np in self.paths:
+            batch_billing.np = np
+            biller = BatchBiller(self.menu_index)
+            with self.assertRaises(ValueError):
+                biller.compute_lines(lengths, item_ids, quantities)
+            result = biller.compute_lines(lengths, item_ids, quantities,
+                                          line_prices=array("q", [50000, price * 100]))
+            self.assertEqual(int(result["subtotal"][0]), 100000 + price * 100)
+
+
+if __name__ == "__main__":
+    unittest.main()
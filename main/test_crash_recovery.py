@@ -0,0 +1,106 @@
+# ====================================================================== #
+#                       Crash Recovery On-Disk Tests                     #
+#    Torn writes, interrupted migrations & several tills per directory   #
+# ====================================================================== #
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from bill_archive import BillArchive
+from history_segments import SegmentedHistory
+
+
+def _entry(number, date="2020-01-01T10:00:00"):
+    return {"order_number": number, "date": date, "items": {}, "tip": 0, "discount": 0}
+
+
+class _DirectoryTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def path(self, *names):
+        return os.path.join(self.directory, *names)
+
+
+# --------------------------- Daily Segments --------------------------- #
+class SegmentedHistoryTest(_DirectoryTest):
+    def test_torn_line_does_not_swallow_the_next_order(self):
+        history = SegmentedHistory(self.path("history"), legacy_path=None)
+        history.append(_entry(1))
+        with open(self.path("history", "2020-01-01.jsonl"), "ab") as f:
+            f.write(b'{"order_number": 2, "da')
+        history.append(_entry(3))
+        self.assertEqual([entry["order_number"] for entry in history.iter_entries()], [1, 3])
+
+        history.seal()
+        self.assertEqual(history.get_order(3)["order_number"], 3)
+
+    def test_interrupted_migration_is_redone(self):
+        log_path = self.path("order_history.jsonl")
+        with open(log_path, "w", encoding="utf-8") as f:
+            for number in range(1, 6):
+                f.write(json.dumps(_entry(number, f"2020-01-0{number}T10:00:00")) + "\n")
+        # A crash mid-import leaves the marker and a partial, torn day file
+        os.makedirs(self.path("history"))
+        with open(self.path("history", "migration.pending"), "wb"):
+            pass
+        with open(self.path("history", "2020-01-01.jsonl"), "w", encoding="utf-8") as f:
+            f.write(json.dumps(_entry(1)) + "\n" + '{"order_n')
+
+        history = SegmentedHistory(self.path("history"), legacy_path=log_path)
+        self.assertEqual([entry["order_number"] for entry in history.iter_entries()], [1, 2, 3, 4, 5])
+        self.assertFalse(os.path.exists(history.migration_path))
+        self.assertTrue(os.path.exists(log_path + ".migrated"))
+
+    def test_readonly_open_writes_nothing(self):
+        os.makedirs(self.path("history"))
+        with open(self.path("history", "2020-01-01.jsonl"), "w", encoding="utf-8") as f:
+            f.write(json.dumps(_entry(1)) + "\n")
+        history = SegmentedHistory(self.path("history"), readonly=True)
+        self.assertEqual([entry["order_number"] for entry in history.iter_entries()], [1])
+        self.assertEqual(os.listdir(self.path("history")), ["2020-01-01.jsonl"])
+        with self.assertRaises(ValueError):
+            history.append(_entry(2))
+
+
+# --------------------------- Bill Archive --------------------------- #
+class BillArchiveTest(_DirectoryTest):
+    def test_resave_by_another_instance_is_picked_up(self):
+        first, second = BillArchive(self.directory), BillArchive(self.directory)
+        first.save(3, "first copy")
+        self.assertEqual(first.get(3), "first copy")
+        second.save(3, "second copy")
+        self.assertEqual(first.get(3), "second copy")
+
+    def test_torn_record_is_cut_off_on_open(self):
+        archive = BillArchive(self.directory)
+        archive.save(1, "one")
+        container = self.path(archive.days()[-1] + ".bills")
+        size = os.path.getsize(container)
+        with open(container, "ab") as f:
+            f.write(b"BILL\x05\x00\x00\xff\xfe torn")
+
+        archive = BillArchive(self.directory)
+        self.assertEqual(os.path.getsize(container), size)
+        archive.save(2, "two")
+        self.assertEqual(archive.get(2), "two")
+        self.assertEqual([content for _, _, content in archive.iter_bills()], ["one", "two"])
+
+    def test_iter_bills_skips_bytes_between_records(self):
+        archive = BillArchive(self.directory)
+        archive.save(1, "one")
+        # An archive written before torn tails were cut can hold garbage mid-file
+        with open(self.path(archive.days()[-1] + ".bills"), "ab") as f:
+            f.write(b"\xff\xfe garbage")
+        archive.save(2, "two")
+        self.assertEqual([content for _, _, content in archive.iter_bills()], ["one", "two"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+# ====================================================================== #
+#                     Order Book & API Saving Tests                      #
+#      History before bill, and a failed save keeps the order open       #
+# ====================================================================== #
+
+import asyncio
+import os
+import shutil
+import tempfile
+import unittest
+
+from history_segments import SegmentedHistory
+from order_api import APIError, OrderAPIServer
+from order_book import OrderBook
+from restaurant_backend import RestaurantManager
+from storage import BillSaveError, JsonFileStorage
+
+
+class _Failure(Exception):
+    pass
+
+
+# --------------------------- Helpers --------------------------- #
+class _SavingTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        path = lambda name: os.path.join(self.directory, name)
+        self.storage = JsonFileStorage(path("order_counter.json"),
+                                       SegmentedHistory(path("order_history"), legacy_path=None),
+                                       self.directory)
+
+    def tearDown(self):
+        self.storage.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def fail_once(self, name):
+        """Make storage method ``name`` raise on its next call only."""
+        method = getattr(self.storage, name)
+
+        def failing(*args, **kwargs):
+            setattr(self.storage, name, method)
+            raise _Failure("disk full")
+        setattr(self.storage, name, failing)
+
+    def history_numbers(self):
+        return [entry["order_number"] for entry in self.storage.iter_orders()]
+
+
+# --------------------------- Order Book --------------------------- #
+class OrderBookSaveTest(_SavingTest):
+    def setUp(self):
+        super().setUp()
+        self.book = OrderBook(RestaurantManager(self.storage))
+        self.order = self.book.open("table 1")
+        self.order.add_item(0, 2)
+
+    def test_history_failure_keeps_the_order_and_writes_no_bill(self):
+        self.fail_once("append_orders")
+        with self.assertRaises(_Failure):
+            self.book.close("table 1")
+        self.assertIn("table 1", self.book)
+        self.assertIsNone(self.storage.get_bill(self.order.order_number))
+
+        self.book.close("table 1")
+        self.assertNotIn("table 1", self.book)
+        self.assertEqual(self.history_numbers(), [self.order.order_number])
+
+    def test_bill_failure_retry_does_not_duplicate_history(self):
+        self.fail_once("save_bills")
+        with self.assertRaises(BillSaveError):
+            self.book.close("table 1")
+        self.assertIn("table 1", self.book)
+        self.assertEqual(self.history_numbers(), [self.order.order_number])
+
+        bill = self.book.close("table 1")
+        self.assertEqual(self.history_numbers(), [self.order.order_number])
+        self.assertEqual(self.storage.get_bill(self.order.order_number), bill)
+
+
+# --------------------------- Order API --------------------------- #
+class OrderAPISaveTest(_SavingTest):
+    def run_api(self, steps):
+        async def main():
+            server = OrderAPIServer(self.storage, port=0, menu_poll_interval=0)
+            await server.start()
+            try:
+                order = server.book.open()
+                order.add_item(0, 2)
+                await steps(server, order)
+            finally:
+                await server.stop()
+        asyncio.run(main())
+
+    def test_history_failure_keeps_the_order_open(self):
+        async def steps(server, order):
+            self.fail_once("append_orders")
+            with self.assertRaises(APIError) as raised:
+                await server.bill_order(str(order.order_number), {}, {"save": True})
+            self.assertEqual(raised.exception.status, 503)
+            self.assertIn(order.ticket, server.book)
+            self.assertFalse(order.suspended)
+            self.assertIsNone(self.storage.get_bill(order.order_number))
+
+            status, payload = await server.bill_order(str(order.order_number), {}, {"save": True})
+            self.assertEqual(status, 200)
+            self.assertNotIn(order.ticket, server.book)
+            self.assertEqual(self.history_numbers(), [order.order_number])
+        self.run_api(steps)
+
+    def test_bill_failure_retry_does_not_duplicate_history(self):
+        async def steps(server, order):
+            self.fail_once("save_bills")
+            with self.assertRaises(APIError) as raised:
+                await server.bill_order(str(order.order_number), {}, {"save": True})
+            self.assertEqual(raised.exception.status, 503)
+            self.assertIn(order.ticket, server.book)
+            self.assertEqual(self.history_numbers(), [order.order_number])
+
+            status, payload = await server.bill_order(str(order.order_number), {}, {"save": True})
+            self.assertEqual(status, 200)
+            self.assertEqual(self.history_numbers(), [order.order_number])
+            self.assertEqual(self.storage.get_bill(order.order_number), payload["bill"])
+        self.run_api(steps)
+
+
+if __name__ == "__main__":
+    unittest.main()
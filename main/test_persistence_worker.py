@@ -0,0 +1,113 @@
+# ====================================================================== #
+#                    Persistence Worker Failure Tests                    #
+#      A failed save must never duplicate history or orphan a bill       #
+# ====================================================================== #
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from history_segments import SegmentedHistory
+from persistence_worker import PersistenceWorker
+from restaurant_backend import RestaurantManager
+from storage import BillSaveError, JsonFileStorage, SQLiteStorage
+
+
+class _Failure(Exception):
+    pass
+
+
+# --------------------------- Helpers --------------------------- #
+class _WorkerTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.storage = self.make_storage()
+        self.manager = RestaurantManager(self.storage)
+        self.worker = PersistenceWorker(self.manager)
+        self.results = []
+
+    def tearDown(self):
+        self.worker.close()
+        self.storage.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def save(self, bill="bill text"):
+        entry = self.manager.build_history_entry("Ali", tip=0, discount=0)
+        self.worker.save_order(self.manager.order_number, bill, entry,
+                               on_done=lambda location: self.results.append(("done", location)),
+                               on_error=lambda error: self.results.append(("error", error)))
+        self.worker.wait()
+        return self.results[-1]
+
+    def history_numbers(self):
+        return [entry["order_number"] for entry in self.storage.iter_orders()]
+
+
+# --------------------------- JSON Files --------------------------- #
+class JsonStorageTest(_WorkerTest):
+    def make_storage(self):
+        path = lambda name: os.path.join(self.directory, name)
+        return JsonFileStorage(path("order_counter.json"),
+                               SegmentedHistory(path("order_history"), legacy_path=None),
+                               self.directory)
+
+    def test_bill_failure_after_history_is_not_duplicated_on_retry(self):
+        self.manager.add_item_by_id(0, 2)
+        save_many = self.storage.bills.save_many
+
+        def fail_once(*args, **kwargs):
+            self.storage.bills.save_many = save_many
+            raise _Failure("disk full")
+
+        self.storage.bills.save_many = fail_once
+        status, error = self.save()
+        self.assertEqual(status, "error")
+        self.assertIsInstance(error, BillSaveError)
+        self.assertEqual(self.history_numbers(), [self.manager.order_number])
+        self.assertIsNone(self.storage.get_bill(self.manager.order_number))
+
+        status, _ = self.save()
+        self.assertEqual(status, "done")
+        self.assertEqual(self.history_numbers(), [self.manager.order_number])
+        self.assertEqual(self.storage.get_bill(self.manager.order_number), "bill text")
+
+    def test_history_failure_writes_no_bill(self):
+        self.manager.add_item_by_id(0, 1)
+        append_many = self.storage.history.append_many
+
+        def fail_once(*args, **kwargs):
+            self.storage.history.append_many = append_many
+            raise _Failure("disk full")
+
+        self.storage.history.append_many = fail_once
+        status, error = self.save()
+        self.assertEqual(status, "error")
+        self.assertNotIsInstance(error, BillSaveError)
+        self.assertEqual(self.history_numbers(), [])
+        self.assertIsNone(self.storage.get_bill(self.manager.order_number))
+
+        self.assertEqual(self.save()[0], "done")
+        self.assertEqual(self.history_numbers(), [self.manager.order_number])
+
+
+# --------------------------- SQLite --------------------------- #
+class SQLiteStorageTest(_WorkerTest):
+    def make_storage(self):
+        return SQLiteStorage(os.path.join(self.directory, "restaurant.db"))
+
+    def test_bill_failure_rolls_back_history(self):
+        self.manager.add_item_by_id(0, 2)
+        self.storage.conn.execute("DROP TABLE bills")
+        status, error = self.save()
+        self.assertEqual(status, "error")
+        self.assertEqual(self.history_numbers(), [])
+
+        self.storage.conn.executescript(SQLiteStorage.SCHEMA)
+        self.assertEqual(self.save()[0], "done")
+        self.assertEqual(self.history_numbers(), [self.manager.order_number])
+        self.assertEqual(self.storage.get_bill(self.manager.order_number), "bill text")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,176 @@
+# ====================================================================== #
+#                       Virtualized Menu Item List                       #
+#        Fixed pool of recycled row widgets for very large menus         #
+# ====================================================================== #
+
+import tkinter as tk
+from tkinter import ttk
+
+
+# --------------------------- Pooled Row --------------------------- #
+class _Row:
+    """One recycled row of widgets and the list index it currently shows."""
+
+    __slots__ = ("frame", "name_label", "price_label", "qty_var", "window", "index")
+
+    def __init__(self, frame, name_label, price_label, qty_var, window):
+        self.frame = frame
+        self.name_label = name_label
+        self.price_label = price_label
+        self.qty_var = qty_var
+        self.window = window
+        self.index = None
+
+
+# --------------------------- Virtual Item List --------------------------- #
+class VirtualItemList:
+    """Scrollable category list that only creates widgets for visible rows.
+
+    The canvas scroll region covers every item, but only enough row widgets
+    to fill the viewport exist. Row ``k`` of the pool shows the items whose
+    index is ``k`` modulo the pool size, so scrolling by one row rebinds a
+    single row of widgets. Quantities are read from and written back through
+    callbacks; the rows themselves hold no order state.
+    """
+
+    ROW_HEIGHT = 80
+    HEADER_HEIGHT = 90
+    PADDING = 20
+
+    def __init__(self, parent, title, records, quantity_of, on_change):
+        self.records = records              # MenuItem objects in display order
+        self.quantity_of = quantity_of      # item_id -> current quantity
+        self.on_change = on_change          # (item_id, quantity) after an edit
+        self.rows = []
+
+        self.canvas = tk.Canvas(parent, bg="#ecf0f1", highlightthickness=0, yscrollincrement=20)
+        self.scrollbar = ttk.Scrollbar(parent, orient="vertical", command=self.yview)
+        self.canvas.configure(yscrollcommand=self.scrollbar.set)
+
+        # Category Header
+        header_frame = tk.Frame(self.canvas, bg="#3498db", pady=15)
+        tk.Label(header_frame,
+                 text=title,
+                 font=("Segoe UI", 18, "bold"),
+                 bg="#3498db", fg="white").pack()
+        self.header = self.canvas.create_window(self.PADDING, self.PADDING, window=header_frame,
+                                                anchor="nw")
+
+        self.canvas.pack(side="left", fill="both", expand=True)
+        self.scrollbar.pack(side="right", fill="y")
+        self.canvas.bind("<Configure>", self._on_configure)
+
+    # --------------------------- Row Pool --------------------------- #
+    def _create_row(self, width):
+        """Build one reusable item row (same look as the original item frames)."""
+        canvas = self.canvas
+        item_frame = tk.Frame(canvas, bg="white", relief="ridge", bd=2)
+
+        # Item Info
+        info_frame = tk.Frame(item_frame, bg="white")
+        info_frame.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=15, pady=10)
+        name_label = tk.Label(info_frame, font=("Segoe UI", 14, "bold"), bg="white", fg="#2c3e50")
+        name_label.pack(anchor="w")
+        price_label = tk.Label(info_frame, font=("Segoe UI", 12), bg="white", fg="#e74c3c")
+        price_label.pack(anchor="w")
+
+        # Quantity Controls
+        qty_frame = tk.Frame(item_frame, bg="white")
+        qty_frame.pack(side=tk.RIGHT, padx=15, pady=10)
+        qty_var = tk.StringVar(value="0")
+        window = canvas.create_window(self.PADDING, 0, window=item_frame, anchor="nw",
+                                      width=width, height=self.ROW_HEIGHT - 10, state="hidden")
+        row = _Row(item_frame, name_label, price_label, qty_var, window)
+
+        tk.Button(qty_frame, text="−", font=("Segoe UI", 12, "bold"),
+                  bg="#e74c3c", fg="white", width=3,
+                  command=lambda: self._step(row, -1)).pack(side=tk.LEFT)
+        qty_entry = tk.Entry(qty_frame, textvariable=qty_var,
+                             font=("Segoe UI", 12), width=5, justify="center")
+        qty_entry.pack(side=tk.LEFT, padx=5)
+        qty_entry.bind('<KeyRelease>', lambda e: self._typed(row))
+        tk.Button(qty_frame, text="+", font=("Segoe UI", 12, "bold"),
+                  bg="#27ae60", fg="white", width=3,
+                  command=lambda: self._step(row, 1)).pack(side=tk.LEFT)
+        return row
+
+    def _on_configure(self, event):
+        """Resize rows and grow the pool to cover the visible height."""
+        width = max(1, event.width - 2 * self.PADDING)
+        needed = min(len(self.records), event.height // self.ROW_HEIGHT + 2)
+        if len(self.rows) < needed:
+            while len(self.rows) < needed:
+                self.rows.append(self._create_row(width))
+            for row in self.rows:  # pool size changed: every row maps to new indices
+                row.index = None
+        self.canvas.itemconfigure(self.header, width=width)
+        for row in self.rows:
+            self.canvas.itemconfigure(row.window, width=width)
+        height = self.HEADER_HEIGHT + len(self.records) * self.ROW_HEIGHT + self.PADDING
+        self.canvas.configure(scrollregion=(0, 0, event.width, height))
+        self._layout()
+
+    # --------------------------- Scrolling --------------------------- #
+    def yview(self, *args):
+        self.canvas.yview(*args)
+        self._layout()
+
+    def scroll(self, units):
+        self.canvas.yview_scroll(units, "units")
+        self._layout()
+
+    def _layout(self):
+        """Position pooled rows over the visible part of the list."""
+        if not self.rows:
+            return
+        canvas = self.canvas
+        pool = len(self.rows)
+        top = canvas.canvasy(0)
+        first = max(0, int((top - self.HEADER_HEIGHT) // self.ROW_HEIGHT))
+        last = min(len(self.records), first + pool)
+
+        shown = set()
+        for index in range(first, last):
+            row = self.rows[index % pool]
+            shown.add(index % pool)
+            if row.index != index:
+                self._bind(row, index)
+                canvas.coords(row.window, self.PADDING, self.HEADER_HEIGHT + index * self.ROW_HEIGHT)
+                canvas.itemconfigure(row.window, state="normal")
+        for slot, row in enumerate(self.rows):
+            if slot not in shown:
+                row.index = None
+                canvas.itemconfigure(row.window, state="hidden")
+
+    def _bind(self, row, index):
+        record = self.records[index]
+        row.index = index
+        row.name_label.config(text=record.name)
+        row.price_label.config(text=f"Rs. {record.price}")
+        row.qty_var.set(str(self.quantity_of(record.item_id)))
+
+    # --------------------------- Quantities --------------------------- #
+    def _step(self, row, change):
+        """Increase or decrease the quantity shown in a row."""
+        if row.index is None:
+            return
+        item_id = self.records[row.index].item_id
+        qty = max(0, self.quantity_of(item_id) + change)
+        row.qty_var.set(str(qty))
+        self.on_change(item_id, qty)
+
+    def _typed(self, row):
+        """Apply a typed quantity; text that is mid-edit counts as 0."""
+        if row.index is None:
+            return
+        try:
+            qty = max(0, int(row.qty_var.get()))
+        except ValueError:
+            qty = 0
+        self.on_change(self.records[row.index].item_id, qty)
+
+    def refresh(self):
+        """Re-read the quantities of the visible rows (e.g. after clearing the order)."""
+        for row in self.rows:
+            if row.index is not None:
+                row.qty_var.set(str(self.quantity_of(self.records[row.index].item_id)))